@@ -18,17 +18,21 @@ Support: https://support.aemdpc.com
 import os
 import json
 import sqlite3
-import subprocess
 import hashlib
 import time
 from datetime import datetime, timedelta
-from flask import Flask, request, jsonify, g
+from flask import Flask, Response, request, jsonify, g
 from flask_jwt_extended import JWTManager, jwt_required, create_access_token, get_jwt_identity
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 from flask_cors import CORS
 import logging
 
+from key_registry import ApiKeyRegistry
+from rate_limiter import create_rate_limiter
+from script_executor import ScriptExecutor, QueueFullError
+from system_sampler import SystemSampler
+
 # Initialize Flask app
 app = Flask(__name__)
 CORS(app)
@@ -45,6 +49,41 @@ limiter = Limiter(app, key_func=get_remote_address)
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# API keys are served from an in-memory index that reloads on file change
+API_KEYS_FILE = 'auth/api_keys.json'
+key_registry = ApiKeyRegistry(API_KEYS_FILE)
+
+API_CONFIG_FILE = 'api_config.json'
+RATE_LIMIT_DB = 'auth/rate_limits.db'
+
+def load_api_config():
+    """Load API configuration file"""
+    try:
+        with open(API_CONFIG_FILE, 'r') as f:
+            return json.load(f)
+    except:
+        return {}
+
+api_config = load_api_config()
+
+# Helper scripts run on a bounded pool instead of the request thread
+executor_config = api_config.get('executor', {})
+script_executor = ScriptExecutor(
+    max_workers=executor_config.get('max_workers', 8),
+    max_queue=executor_config.get('max_queue', 100),
+    default_timeout=executor_config.get('default_timeout', 300),
+    default_script_limit=executor_config.get('default_script_limit', 4),
+    script_limits=executor_config.get('script_limits', {})
+)
+
+# System metrics are sampled from /proc in the background and served from memory
+sampler_config = api_config.get('system_sampler', {})
+system_sampler = SystemSampler(
+    interval=sampler_config.get('interval', 5),
+    disk_paths=sampler_config.get('disk_paths', ['/'])
+)
+system_sampler.start()
+
 #########################################################################
 # Authentication Functions
 #########################################################################
@@ -52,18 +91,14 @@ logger = logging.getLogger(__name__)
 def load_api_keys():
     """Load API keys from configuration file"""
     try:
-        with open('auth/api_keys.json', 'r') as f:
+        with open(API_KEYS_FILE, 'r') as f:
             return json.load(f)
     except:
         return {"api_keys": []}
 
 def validate_api_key(api_key):
     """Validate API key and return permissions"""
-    keys_data = load_api_keys()
-    for key_data in keys_data.get('api_keys', []):
-        if key_data['key'] == api_key and key_data['active']:
-            return key_data
-    return None
+    return key_registry.lookup(api_key)
 
 def check_permission(key_data, required_permission):
     """Check if API key has required permission"""
@@ -76,7 +111,7 @@ def check_permission(key_data, required_permission):
 
 def init_rate_limit_db():
     """Initialize rate limiting database"""
-    conn = sqlite3.connect('auth/rate_limits.db')
+    conn = sqlite3.connect(RATE_LIMIT_DB)
     conn.execute('''
         CREATE TABLE IF NOT EXISTS rate_limits (
             api_key TEXT PRIMARY KEY,
@@ -87,38 +122,19 @@ def init_rate_limit_db():
     conn.commit()
     conn.close()
 
+# Backend is selected by api.rate_limiting.backend: "memory" (default,
+# per process), "shared" (mmap file shared by gunicorn workers) or "sqlite"
+# (in memory, counters flushed to rate_limits.db in the background)
+rate_limit_config = api_config.get('api', {}).get('rate_limiting', {})
+if rate_limit_config.get('backend') == 'sqlite':
+    init_rate_limit_db()
+rate_limiter = create_rate_limiter(rate_limit_config, RATE_LIMIT_DB)
+
 def check_rate_limit(api_key, limit_per_minute=100):
     """Check if API key is within rate limits"""
-    conn = sqlite3.connect('auth/rate_limits.db')
-    cursor = conn.cursor()
-    
-    current_time = int(time.time())
-    window_start = current_time - (current_time % 60)  # Start of current minute
-    
-    # Get current usage
-    cursor.execute('SELECT requests, window_start FROM rate_limits WHERE api_key = ?', (api_key,))
-    result = cursor.fetchone()
-    
-    if result:
-        requests, last_window = result
-        if last_window == window_start:
-            if requests >= limit_per_minute:
-                conn.close()
-                return False
-            # Increment counter
-            cursor.execute('UPDATE rate_limits SET requests = requests + 1 WHERE api_key = ?', (api_key,))
-        else:
-            # New window, reset counter
-            cursor.execute('UPDATE rate_limits SET requests = 1, window_start = ? WHERE api_key = ?', 
-                         (window_start, api_key))
-    else:
-        # First request for this key
-        cursor.execute('INSERT INTO rate_limits (api_key, requests, window_start) VALUES (?, 1, ?)', 
-                     (api_key, window_start))
-    
-    conn.commit()
-    conn.close()
-    return True
+    if rate_limiter is None:
+        return True
+    return rate_limiter.allow(api_key, limit_per_minute)
 
 #########################################################################
 # API Authentication Decorator
@@ -157,6 +173,48 @@ def api_auth_required(permission=None):
         return decorated_function
     return decorator
 
+#########################################################################
+# Helper Script Jobs
+#########################################################################
+
+def queue_full_response():
+    """Response for requests rejected because the executor is saturated"""
+    return jsonify({'error': 'Too many queued operations', 'retry_after': '30'}), 503
+
+def submit_job(job_type, cmd, data, success_message, failure_message):
+    """Queue a mutating helper script and return 202 with the job ID"""
+    job = script_executor.submit(
+        job_type, cmd,
+        owner=g.api_key_data.get('id'),
+        data=data,
+        success_message=success_message,
+        failure_message=failure_message
+    )
+    return jsonify({
+        'success': True,
+        'message': f'Job {job.id} queued',
+        'data': {'job_id': job.id, 'status': job.status, 'status_url': f'/api/v1/jobs/{job.id}'}
+    }), 202
+
+@app.route('/api/v1/jobs/<job_id>', methods=['GET'])
+@api_auth_required()
+def get_job(job_id):
+    """Get the status of a queued helper script job"""
+    job = script_executor.get_job(job_id)
+    key_data = g.api_key_data
+
+    # Jobs are only visible to the key that created them, or to admin keys
+    if not job or (job.owner != key_data.get('id') and not check_permission(key_data, '*')):
+        return jsonify({'error': 'Job not found'}), 404
+
+    return jsonify({'success': True, 'data': job.to_dict()})
+
+@app.route('/api/v1/system/executor', methods=['GET'])
+@api_auth_required('monitoring:read')
+def executor_metrics():
+    """Get helper script executor queue metrics"""
+    return jsonify({'success': True, 'data': script_executor.metrics()})
+
 #########################################################################
 # Site Management Endpoints
 #########################################################################
@@ -167,8 +225,7 @@ def list_sites():
     """List all WordPress sites"""
     try:
         # Execute shell command to get sites
-        result = subprocess.run(['bash', '../helpers/wp/wp_helpers.sh', 'list_sites'], 
-                              capture_output=True, text=True)
+        result = script_executor.run('list_sites', ['bash', '../helpers/wp/wp_helpers.sh', 'list_sites'])
         
         if result.returncode == 0:
             sites = []
@@ -184,6 +241,8 @@ def list_sites():
         else:
             return jsonify({'error': 'Failed to retrieve sites'}), 500
     
+    except QueueFullError:
+        return queue_full_response()
     except Exception as e:
         logger.error(f"Error listing sites: {str(e)}")
         return jsonify({'error': 'Internal server error'}), 500
@@ -201,18 +260,16 @@ def create_site():
             return jsonify({'error': 'Domain and email are required'}), 400
         
         # Execute site creation
-        result = subprocess.run(['bash', '../component_manager.sh', 'install_wordpress', domain, email],
-                              capture_output=True, text=True)
-        
-        if result.returncode == 0:
-            return jsonify({
-                'success': True,
-                'message': f'Site {domain} created successfully',
-                'data': {'domain': domain, 'email': email}
-            })
-        else:
-            return jsonify({'error': 'Failed to create site'}), 500
+        return submit_job(
+            'create_site',
+            ['bash', '../component_manager.sh', 'install_wordpress', domain, email],
+            {'domain': domain, 'email': email},
+            f'Site {domain} created successfully',
+            'Failed to create site'
+        )
     
+    except QueueFullError:
+        return queue_full_response()
     except Exception as e:
         logger.error(f"Error creating site: {str(e)}")
         return jsonify({'error': 'Internal server error'}), 500
@@ -223,17 +280,16 @@ def delete_site(domain):
     """Delete a WordPress site"""
     try:
         # Execute site deletion
-        result = subprocess.run(['bash', '../helpers/wp/wp_helpers.sh', 'delete_site', domain],
-                              capture_output=True, text=True)
-        
-        if result.returncode == 0:
-            return jsonify({
-                'success': True,
-                'message': f'Site {domain} deleted successfully'
-            })
-        else:
-            return jsonify({'error': 'Failed to delete site'}), 500
+        return submit_job(
+            'delete_site',
+            ['bash', '../helpers/wp/wp_helpers.sh', 'delete_site', domain],
+            {'domain': domain},
+            f'Site {domain} deleted successfully',
+            'Failed to delete site'
+        )
     
+    except QueueFullError:
+        return queue_full_response()
     except Exception as e:
         logger.error(f"Error deleting site: {str(e)}")
         return jsonify({'error': 'Internal server error'}), 500
@@ -247,8 +303,7 @@ def delete_site(domain):
 def list_backups():
     """List all backups"""
     try:
-        result = subprocess.run(['bash', '../helpers/utils/backup_helpers.sh', 'list_backups'],
-                              capture_output=True, text=True)
+        result = script_executor.run('list_backups', ['bash', '../helpers/utils/backup_helpers.sh', 'list_backups'])
         
         if result.returncode == 0:
             backups = []
@@ -264,6 +319,8 @@ def list_backups():
         else:
             return jsonify({'error': 'Failed to retrieve backups'}), 500
     
+    except QueueFullError:
+        return queue_full_response()
     except Exception as e:
         logger.error(f"Error listing backups: {str(e)}")
         return jsonify({'error': 'Internal server error'}), 500
@@ -281,18 +338,16 @@ def create_backup():
             return jsonify({'error': 'Domain is required'}), 400
         
         # Execute backup creation
-        result = subprocess.run(['bash', '../helpers/utils/backup_helpers.sh', 'create_backup', domain, backup_type],
-                              capture_output=True, text=True)
-        
-        if result.returncode == 0:
-            return jsonify({
-                'success': True,
-                'message': f'Backup for {domain} created successfully',
-                'data': {'domain': domain, 'type': backup_type}
-            })
-        else:
-            return jsonify({'error': 'Failed to create backup'}), 500
+        return submit_job(
+            'create_backup',
+            ['bash', '../helpers/utils/backup_helpers.sh', 'create_backup', domain, backup_type],
+            {'domain': domain, 'type': backup_type},
+            f'Backup for {domain} created successfully',
+            'Failed to create backup'
+        )
     
+    except QueueFullError:
+        return queue_full_response()
     except Exception as e:
         logger.error(f"Error creating backup: {str(e)}")
         return jsonify({'error': 'Internal server error'}), 500
@@ -301,54 +356,37 @@ def create_backup():
 # System Monitoring Endpoints
 #########################################################################
 
+def snapshot_response(body, etag, cache_control):
+    """Serve a pre-serialised snapshot, or 304 if the client already has it"""
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = cache_control
+    return response
+
 @app.route('/api/v1/system/status', methods=['GET'])
 @limiter.limit("200 per minute")
 def system_status():
     """Get system status"""
-    try:
-        # Get system information
-        result = subprocess.run(['bash', '../helpers/monitoring/system_helpers.sh', 'get_system_info'],
-                              capture_output=True, text=True)
-        
-        if result.returncode == 0:
-            return jsonify({
-                'success': True,
-                'data': {
-                    'status': 'healthy',
-                    'timestamp': datetime.utcnow().isoformat(),
-                    'system_info': result.stdout.strip()
-                }
-            })
-        else:
-            return jsonify({'error': 'Failed to retrieve system status'}), 500
+    snapshot = system_sampler.snapshot
+    if snapshot is None:
+        return jsonify({'error': 'Failed to retrieve system status'}), 503
     
-    except Exception as e:
-        logger.error(f"Error getting system status: {str(e)}")
-        return jsonify({'error': 'Internal server error'}), 500
+    return snapshot_response(snapshot.status_body, snapshot.status_etag,
+                             f'public, max-age={int(system_sampler.interval)}')
 
 @app.route('/api/v1/system/metrics', methods=['GET'])
 @api_auth_required('monitoring:read')
 def system_metrics():
     """Get detailed system metrics"""
-    try:
-        # Get detailed metrics
-        result = subprocess.run(['bash', '../helpers/monitoring/system_helpers.sh', 'get_detailed_metrics'],
-                              capture_output=True, text=True)
-        
-        if result.returncode == 0:
-            return jsonify({
-                'success': True,
-                'data': {
-                    'metrics': result.stdout.strip(),
-                    'timestamp': datetime.utcnow().isoformat()
-                }
-            })
-        else:
-            return jsonify({'error': 'Failed to retrieve system metrics'}), 500
+    snapshot = system_sampler.snapshot
+    if snapshot is None:
+        return jsonify({'error': 'Failed to retrieve system metrics'}), 503
     
-    except Exception as e:
-        logger.error(f"Error getting system metrics: {str(e)}")
-        return jsonify({'error': 'Internal server error'}), 500
+    return snapshot_response(snapshot.metrics_body, snapshot.metrics_etag,
+                             f'private, max-age={int(system_sampler.interval)}')
 
 #########################################################################
 # Health Check Endpoint
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+LOMP Stack v3.0 - API Key Authentication Benchmark
+Compares per-request auth cost of the file-scan lookup and ApiKeyRegistry
+
+Author: Silviu Ilie <neosilviu@gmail.com>
+Company: aemdPC
+Version: 3.0.0
+Copyright © 2025 aemdPC. All rights reserved.
+License: MIT License
+
+Repository: https://github.com/aemdPC/lomp-stack-v3
+Documentation: https://docs.aemdpc.com/lomp-stack
+Support: https://support.aemdpc.com
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import secrets
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from key_registry import ApiKeyRegistry
+
+KEY_COUNTS = [10, 100, 1000, 10000, 100000]
+
+def write_keys_file(path, count):
+    """Write a keys file with `count` active keys and return one of them"""
+    keys = []
+    for i in range(count):
+        keys.append({
+            'id': f'bench-key-{i}',
+            'key': f'sk_live_{secrets.token_hex(16)}',
+            'name': f'Benchmark Key {i}',
+            'permissions': ['sites:read'],
+            'rate_limit': 100,
+            'active': True
+        })
+    with open(path, 'w') as f:
+        json.dump({'api_keys': keys}, f)
+    # Look up the last key so the linear scan hits its worst case
+    return keys[-1]['key']
+
+def legacy_validate(path, api_key):
+    """Original validate_api_key: parse the file and scan every entry"""
+    with open(path, 'r') as f:
+        keys_data = json.load(f)
+    for key_data in keys_data.get('api_keys', []):
+        if key_data['key'] == api_key and key_data['active']:
+            return key_data
+    return None
+
+def time_per_call(func, iterations):
+    """Average wall time of func() in microseconds"""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+def run_benchmark():
+    print("LOMP Stack v3.0 - API Key Auth Benchmark")
+    print("=" * 60)
+    print(f"{'keys':>8} {'legacy (us/req)':>18} {'registry (us/req)':>20}")
+
+    work_dir = tempfile.mkdtemp(prefix='lomp_keys_bench_')
+    try:
+        for count in KEY_COUNTS:
+            path = os.path.join(work_dir, f'api_keys_{count}.json')
+            api_key = write_keys_file(path, count)
+
+            # Keep the legacy run short for large files, it is O(n) per call
+            legacy_iterations = max(5, 20000 // count)
+            legacy_us = time_per_call(lambda: legacy_validate(path, api_key), legacy_iterations)
+
+            registry = ApiKeyRegistry(path)
+            registry.lookup(api_key)  # initial load is not part of per-request cost
+            registry_us = time_per_call(lambda: registry.lookup(api_key), 20000)
+
+            assert registry.lookup(api_key) is not None
+            print(f"{count:>8} {legacy_us:>18.1f} {registry_us:>20.2f}")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+if __name__ == '__main__':
+    run_benchmark()
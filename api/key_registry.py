@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+LOMP Stack v3.0 - API Key Registry
+In-memory, hash-indexed view of auth/api_keys.json for request authentication
+
+Author: Silviu Ilie <neosilviu@gmail.com>
+Company: aemdPC
+Version: 3.0.0
+Copyright © 2025 aemdPC. All rights reserved.
+License: MIT License
+
+Repository: https://github.com/aemdPC/lomp-stack-v3
+Documentation: https://docs.aemdpc.com/lomp-stack
+Support: https://support.aemdpc.com
+"""
+
+import os
+import json
+import time
+import threading
+import logging
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+class ApiKeyRegistry:
+    """Keeps API keys indexed by key value and reloads them when the file changes.
+
+    The keys file is only re-parsed when its (inode, mtime, size) signature
+    changes. The admin dashboard writes the file atomically (temp file +
+    rename), so every save produces a new inode and is picked up on the next
+    lookup. In-process writers can call invalidate() to force a reload.
+    """
+
+    def __init__(self, keys_file: str, check_interval: float = 0.0):
+        self.keys_file = keys_file
+        self.check_interval = check_interval
+        self._index: Dict[str, Dict] = {}
+        self._signature: Optional[Tuple[int, int, int]] = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+        self.reload_count = 0
+
+    def _file_signature(self) -> Optional[Tuple[int, int, int]]:
+        """Return (inode, mtime_ns, size) of the keys file, or None if missing"""
+        try:
+            st = os.stat(self.keys_file)
+        except OSError:
+            return None
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def _build_index(self) -> Dict[str, Dict]:
+        """Parse the keys file into a key -> key_data map"""
+        with open(self.keys_file, 'r') as f:
+            keys_data = json.load(f)
+
+        index = {}
+        for key_data in keys_data.get('api_keys', []):
+            key = key_data.get('key')
+            if key:
+                index[key] = key_data
+        return index
+
+    def _refresh(self) -> None:
+        """Reload the index if the keys file signature changed"""
+        signature = self._file_signature()
+        if signature == self._signature:
+            return
+
+        with self._lock:
+            # Another thread may have reloaded while we waited for the lock
+            signature = self._file_signature()
+            if signature == self._signature:
+                return
+
+            if signature is None:
+                self._index = {}
+            else:
+                try:
+                    self._index = self._build_index()
+                except (OSError, ValueError) as e:
+                    # Keep serving the last good index until the file is readable again
+                    logger.warning(f"Failed to reload API keys from {self.keys_file}: {str(e)}")
+                    return
+
+            self._signature = signature
+            self.reload_count += 1
+
+    def invalidate(self) -> None:
+        """Force a reload on the next lookup"""
+        self._signature = None
+        self._next_check = 0.0
+
+    def lookup(self, api_key: str) -> Optional[Dict]:
+        """Return key data for an active API key, or None"""
+        if self.check_interval <= 0:
+            self._refresh()
+        else:
+            now = time.monotonic()
+            if now >= self._next_check:
+                self._next_check = now + self.check_interval
+                self._refresh()
+
+        key_data = self._index.get(api_key)
+        if key_data and key_data.get('active'):
+            return key_data
+        return None
+
+    def __len__(self) -> int:
+        return len(self._index)
@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""
+LOMP Stack v3.0 - API Rate Limiting Backends
+Token bucket rate limiters used by api_server.check_rate_limit
+
+Author: Silviu Ilie <neosilviu@gmail.com>
+Company: aemdPC
+Version: 3.0.0
+Copyright © 2025 aemdPC. All rights reserved.
+License: MIT License
+
+Repository: https://github.com/aemdPC/lomp-stack-v3
+Documentation: https://docs.aemdpc.com/lomp-stack
+Support: https://support.aemdpc.com
+"""
+
+import os
+import mmap
+import time
+import struct
+import sqlite3
+import hashlib
+import tempfile
+import threading
+import logging
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+#########################################################################
+# Token Bucket
+#########################################################################
+
+def bucket_params(limit_per_minute: int, burst_limit: Optional[int]) -> Tuple[float, float]:
+    """Return (refill rate per second, bucket capacity) for a key
+
+    The bucket refills at the key's per-minute rate. Without a burst limit
+    the capacity equals one minute of traffic, which matches the old
+    fixed-window behaviour.
+    """
+    rate = max(limit_per_minute, 1) / 60.0
+    capacity = float(burst_limit) if burst_limit else float(max(limit_per_minute, 1))
+    return rate, capacity
+
+def take_token(tokens: float, updated: float, now: float,
+               rate: float, capacity: float) -> Tuple[bool, float]:
+    """Refill a bucket up to `now` and try to take one token"""
+    tokens = min(capacity, tokens + (now - updated) * rate)
+    if tokens >= 1.0:
+        return True, tokens - 1.0
+    return False, tokens
+
+#########################################################################
+# Backends
+#########################################################################
+
+class MemoryRateLimiter:
+    """Per-process token buckets kept in a dict
+
+    Only the dict update is done under the lock, there is no I/O on the
+    request path.
+    """
+
+    def __init__(self, burst_limit: Optional[int] = None):
+        self.burst_limit = burst_limit
+        self._buckets: Dict[str, list] = {}
+        self._lock = threading.Lock()
+
+    def allow(self, api_key: str, limit_per_minute: int = 100) -> bool:
+        """Consume one request for api_key, return False if over the limit"""
+        rate, capacity = bucket_params(limit_per_minute, self.burst_limit)
+        now = time.monotonic()
+
+        with self._lock:
+            bucket = self._buckets.get(api_key)
+            if bucket is None:
+                bucket = self._buckets[api_key] = [capacity, now]
+            allowed, bucket[0] = take_token(bucket[0], bucket[1], now, rate, capacity)
+            bucket[1] = now
+            self._on_request(api_key, allowed)
+
+        return allowed
+
+    def _on_request(self, api_key: str, allowed: bool) -> None:
+        """Hook for subclasses, called with the lock held"""
+        pass
+
+    def close(self) -> None:
+        pass
+
+class SharedMemoryRateLimiter:
+    """Token buckets in a memory-mapped file shared by all gunicorn workers
+
+    The file is split into fixed-size slots addressed by a stable hash of the
+    API key. Each operation locks only the byte range of the slots it probes
+    with fcntl.lockf, so workers contend per key rather than globally. Record
+    locks are per process, so threads inside a worker also share a lock.
+    """
+
+    SLOT = struct.Struct('<Qdd')  # key hash, tokens, updated (epoch seconds)
+    PROBE = 8
+
+    def __init__(self, path: Optional[str] = None, slots: int = 4096,
+                 burst_limit: Optional[int] = None):
+        import fcntl  # POSIX only
+
+        self._fcntl = fcntl
+        self.burst_limit = burst_limit
+        self.slots = slots
+        if path is None:
+            shm_dir = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+            path = os.path.join(shm_dir, 'lomp_api_rate_limits')
+        self.path = path
+
+        size = self.SLOT.size * slots
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        if os.fstat(self._fd).st_size < size:
+            os.ftruncate(self._fd, size)
+        self._map = mmap.mmap(self._fd, size)
+        self._thread_lock = threading.Lock()
+
+    @staticmethod
+    def _key_hash(api_key: str) -> int:
+        # Python's hash() is randomised per process, workers need a stable one
+        digest = hashlib.blake2b(api_key.encode('utf-8'), digest_size=8).digest()
+        return int.from_bytes(digest, 'little') or 1
+
+    def _lock_range(self, first: int, count: int, lock_type: int) -> None:
+        offset = first * self.SLOT.size
+        length = count * self.SLOT.size
+        self._fcntl.lockf(self._fd, lock_type, length, offset)
+
+    def allow(self, api_key: str, limit_per_minute: int = 100) -> bool:
+        """Consume one request for api_key, return False if over the limit"""
+        rate, capacity = bucket_params(limit_per_minute, self.burst_limit)
+        key_hash = self._key_hash(api_key)
+        first = key_hash % (self.slots - self.PROBE + 1)
+        now = time.time()
+
+        with self._thread_lock:
+            return self._allow_locked(key_hash, first, now, rate, capacity)
+
+    def _allow_locked(self, key_hash: int, first: int, now: float,
+                      rate: float, capacity: float) -> bool:
+        self._lock_range(first, self.PROBE, self._fcntl.LOCK_EX)
+        try:
+            slot, stalest, stalest_time = None, first, None
+            for index in range(first, first + self.PROBE):
+                stored_hash, tokens, updated = self.SLOT.unpack_from(self._map, index * self.SLOT.size)
+                if stored_hash == key_hash:
+                    slot = index
+                    break
+                if stored_hash == 0:
+                    slot, tokens, updated = index, capacity, now
+                    break
+                if stalest_time is None or updated < stalest_time:
+                    stalest, stalest_time = index, updated
+
+            if slot is None:
+                # Probe window is full, recycle the least recently used slot
+                slot, tokens, updated = stalest, capacity, now
+
+            allowed, tokens = take_token(tokens, updated, now, rate, capacity)
+            self.SLOT.pack_into(self._map, slot * self.SLOT.size, key_hash, tokens, now)
+        finally:
+            self._lock_range(first, self.PROBE, self._fcntl.LOCK_UN)
+
+        return allowed
+
+    def close(self) -> None:
+        self._map.close()
+        os.close(self._fd)
+
+class BatchedSQLiteRateLimiter(MemoryRateLimiter):
+    """In-memory token buckets with per-minute counters flushed to SQLite
+
+    Decisions are made in memory. A background thread writes the request
+    counters to the rate_limits table every `flush_interval` seconds in one
+    transaction, and buckets are seeded from the current window on startup so
+    a restart does not hand out a fresh minute of traffic.
+    """
+
+    def __init__(self, db_path: str, flush_interval: float = 5.0,
+                 burst_limit: Optional[int] = None):
+        super().__init__(burst_limit)
+        self.db_path = db_path
+        self.flush_interval = flush_interval
+        self._counters: Dict[str, list] = {}
+        self._dirty = set()
+        self._seeded: Dict[str, int] = self._load_current_window()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._flush_loop, name='rate-limit-flush', daemon=True)
+        self._thread.start()
+
+    @staticmethod
+    def _window_start(now: Optional[float] = None) -> int:
+        current_time = int(now if now is not None else time.time())
+        return current_time - (current_time % 60)
+
+    def _load_current_window(self) -> Dict[str, int]:
+        """Read request counts already recorded for the current minute"""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            cursor.execute('SELECT api_key, requests FROM rate_limits WHERE window_start = ?',
+                           (self._window_start(),))
+            rows = dict(cursor.fetchall())
+            conn.close()
+            return rows
+        except sqlite3.Error as e:
+            logger.warning(f"Could not load rate limit counters: {str(e)}")
+            return {}
+
+    def allow(self, api_key: str, limit_per_minute: int = 100) -> bool:
+        seeded = self._seeded.pop(api_key, None) if self._seeded else None
+        if seeded:
+            rate, capacity = bucket_params(limit_per_minute, self.burst_limit)
+            with self._lock:
+                if api_key not in self._buckets:
+                    self._buckets[api_key] = [max(capacity - seeded, 0.0), time.monotonic()]
+                    self._counters[api_key] = [self._window_start(), seeded]
+        return super().allow(api_key, limit_per_minute)
+
+    def _on_request(self, api_key: str, allowed: bool) -> None:
+        if not allowed:
+            return
+        window_start = self._window_start()
+        counter = self._counters.get(api_key)
+        if counter is None or counter[0] != window_start:
+            self._counters[api_key] = [window_start, 1]
+        else:
+            counter[1] += 1
+        self._dirty.add(api_key)
+
+    def flush(self) -> None:
+        """Write dirty counters to SQLite in a single transaction"""
+        with self._lock:
+            if not self._dirty:
+                return
+            rows = [(key, self._counters[key][1], self._counters[key][0]) for key in self._dirty]
+            self._dirty = set()
+
+        try:
+            conn = sqlite3.connect(self.db_path)
+            conn.executemany('''
+                INSERT INTO rate_limits (api_key, requests, window_start) VALUES (?, ?, ?)
+                ON CONFLICT(api_key) DO UPDATE SET
+                    requests = excluded.requests, window_start = excluded.window_start
+            ''', rows)
+            conn.commit()
+            conn.close()
+        except sqlite3.Error as e:
+            logger.error(f"Failed to flush rate limit counters: {str(e)}")
+            with self._lock:
+                self._dirty.update(row[0] for row in rows)
+
+    def _flush_loop(self) -> None:
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def close(self) -> None:
+        self._stop.set()
+        self._thread.join(timeout=self.flush_interval)
+        self.flush()
+
+#########################################################################
+# Factory
+#########################################################################
+
+def create_rate_limiter(rate_config: Dict, db_path: str = 'auth/rate_limits.db'):
+    """Create the backend selected by the api.rate_limiting config section
+
+    Returns None when rate limiting is disabled.
+    """
+    if not rate_config.get('enabled', True):
+        return None
+
+    backend = rate_config.get('backend', 'memory')
+    burst_limit = rate_config.get('burst_limit')
+
+    if backend == 'memory':
+        return MemoryRateLimiter(burst_limit=burst_limit)
+    if backend == 'shared':
+        return SharedMemoryRateLimiter(
+            path=rate_config.get('shared_path'),
+            slots=rate_config.get('shared_slots', 4096),
+            burst_limit=burst_limit
+        )
+    if backend == 'sqlite':
+        return BatchedSQLiteRateLimiter(
+            db_path,
+            flush_interval=rate_config.get('flush_interval', 5),
+            burst_limit=burst_limit
+        )
+
+    raise ValueError(f"Unknown rate limiting backend: {backend}")
@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+LOMP Stack v3.0 - Helper Script Executor
+Bounded worker pool for running helper scripts outside the request thread
+
+Author: Silviu Ilie <neosilviu@gmail.com>
+Company: aemdPC
+Version: 3.0.0
+Copyright © 2025 aemdPC. All rights reserved.
+License: MIT License
+
+Repository: https://github.com/aemdPC/lomp-stack-v3
+Documentation: https://docs.aemdpc.com/lomp-stack
+Support: https://support.aemdpc.com
+"""
+
+import os
+import signal
+import secrets
+import threading
+import subprocess
+import logging
+from collections import deque, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Keep at most this much output per stream on a job
+OUTPUT_TAIL_CHARS = 4096
+
+class QueueFullError(Exception):
+    """Raised when the executor queue is at capacity"""
+    pass
+
+class Job:
+    """A helper script invocation tracked by the executor"""
+
+    def __init__(self, job_type: str, cmd: List[str], timeout: float,
+                 owner: Optional[str] = None, data: Optional[Dict] = None,
+                 success_message: str = '', failure_message: str = ''):
+        self.id = secrets.token_hex(8)
+        self.type = job_type
+        self.cmd = cmd
+        self.script = cmd[1] if len(cmd) > 1 else cmd[0]
+        self.timeout = timeout
+        self.owner = owner
+        self.data = data or {}
+        self.success_message = success_message
+        self.failure_message = failure_message
+        self.status = 'queued'
+        self.created_at = datetime.utcnow()
+        self.started_at = None
+        self.finished_at = None
+        self.returncode = None
+        self.stdout = ''
+        self.stderr = ''
+        self._done = threading.Event()
+
+    @property
+    def finished(self) -> bool:
+        return self._done.is_set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._done.wait(timeout)
+
+    def to_dict(self) -> Dict:
+        job = {
+            'id': self.id,
+            'type': self.type,
+            'status': self.status,
+            'data': self.data,
+            'created_at': self.created_at.isoformat(),
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'returncode': self.returncode
+        }
+        if self.status == 'succeeded':
+            job['message'] = self.success_message
+        elif self.status in ('failed', 'timeout'):
+            job['message'] = self.failure_message
+            job['error'] = self.stderr[-OUTPUT_TAIL_CHARS:]
+        return job
+
+class ScriptExecutor:
+    """Runs helper scripts on a bounded thread pool
+
+    Every script has a concurrency cap (script_limits, falling back to
+    default_script_limit). Jobs over the cap wait in a per-script queue and
+    are handed to the pool when a slot frees up, so a burst of slow backups
+    never occupies every pool thread. The total number of queued and running
+    jobs is capped by max_queue. A job counts as running once a pool thread
+    has picked it up; jobs handed to the pool while every thread is busy
+    are reported as waiting for a thread.
+    """
+
+    def __init__(self, max_workers: int = 8, max_queue: int = 100,
+                 default_timeout: float = 300, default_script_limit: int = 4,
+                 script_limits: Optional[Dict[str, int]] = None,
+                 job_retention: int = 1000):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.default_timeout = default_timeout
+        self.default_script_limit = default_script_limit
+        self.script_limits = script_limits or {}
+        self.job_retention = job_retention
+
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='helper-script')
+        self._lock = threading.Lock()
+        self._jobs: 'OrderedDict[str, Job]' = OrderedDict()
+        self._dispatched: Dict[str, int] = {}
+        self._running: Dict[str, int] = {}
+        self._waiting: Dict[str, deque] = {}
+        self._pending = 0
+        self._completed = 0
+        self._failed = 0
+        self._timed_out = 0
+        self._rejected = 0
+
+    #####################################################################
+    # Submission
+    #####################################################################
+
+    def submit(self, job_type: str, cmd: List[str], timeout: Optional[float] = None,
+               **job_options) -> Job:
+        """Queue a script and return its Job immediately"""
+        job = Job(job_type, cmd, timeout or self.default_timeout, **job_options)
+
+        with self._lock:
+            if self._pending >= self.max_queue:
+                self._rejected += 1
+                raise QueueFullError(f'Executor queue is full ({self.max_queue} jobs)')
+
+            self._pending += 1
+            self._jobs[job.id] = job
+            self._prune_jobs()
+
+            limit = self.script_limits.get(job.script, self.default_script_limit)
+            if self._dispatched.get(job.script, 0) < limit:
+                self._dispatch(job)
+            else:
+                self._waiting.setdefault(job.script, deque()).append(job)
+
+        return job
+
+    def run(self, job_type: str, cmd: List[str], timeout: Optional[float] = None) -> Job:
+        """Queue a script and wait for it to finish"""
+        job = self.submit(job_type, cmd, timeout)
+        job.wait()
+        return job
+
+    def get_job(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    #####################################################################
+    # Execution
+    #####################################################################
+
+    def _dispatch(self, job: Job) -> None:
+        """Hand a job to the pool, called with the lock held"""
+        self._dispatched[job.script] = self._dispatched.get(job.script, 0) + 1
+        self._pool.submit(self._execute, job)
+
+    def _execute(self, job: Job) -> None:
+        with self._lock:
+            self._running[job.script] = self._running.get(job.script, 0) + 1
+        job.status = 'running'
+        job.started_at = datetime.utcnow()
+
+        try:
+            # New session so a timeout can kill the script and its children
+            process = subprocess.Popen(
+                job.cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                text=True, start_new_session=(os.name != 'nt')
+            )
+            try:
+                stdout, stderr = process.communicate(timeout=job.timeout)
+                job.returncode = process.returncode
+                job.status = 'succeeded' if process.returncode == 0 else 'failed'
+            except subprocess.TimeoutExpired:
+                self._kill(process)
+                stdout, stderr = process.communicate()
+                job.returncode = process.returncode
+                job.status = 'timeout'
+                stderr = (stderr or '') + f'\nTimed out after {job.timeout} seconds'
+
+            job.stdout = stdout or ''
+            job.stderr = (stderr or '')[-OUTPUT_TAIL_CHARS:]
+
+        except Exception as e:
+            logger.error(f"Error running helper script {job.script}: {str(e)}")
+            job.status = 'failed'
+            job.stderr = str(e)
+
+        finally:
+            job.finished_at = datetime.utcnow()
+            self._finish(job)
+
+    @staticmethod
+    def _kill(process: subprocess.Popen) -> None:
+        try:
+            if os.name != 'nt':
+                os.killpg(process.pid, signal.SIGKILL)
+            else:
+                process.kill()
+        except (ProcessLookupError, PermissionError):
+            pass
+
+    def _finish(self, job: Job) -> None:
+        with self._lock:
+            self._pending -= 1
+            self._dispatched[job.script] -= 1
+            self._running[job.script] -= 1
+            if job.status == 'succeeded':
+                self._completed += 1
+            elif job.status == 'timeout':
+                self._timed_out += 1
+            else:
+                self._failed += 1
+
+            waiting = self._waiting.get(job.script)
+            if waiting:
+                self._dispatch(waiting.popleft())
+
+        job._done.set()
+
+    def _prune_jobs(self) -> None:
+        """Forget the oldest finished jobs beyond job_retention"""
+        excess = len(self._jobs) - self.job_retention
+        if excess <= 0:
+            return
+        for job_id in list(self._jobs):
+            if excess <= 0:
+                break
+            if self._jobs[job_id].finished:
+                del self._jobs[job_id]
+                excess -= 1
+
+    #####################################################################
+    # Metrics
+    #####################################################################
+
+    def metrics(self) -> Dict:
+        """Queue depth and per-script concurrency"""
+        with self._lock:
+            scripts = {}
+            for script in set(self._dispatched) | set(self._waiting):
+                running = self._running.get(script, 0)
+                scripts[script] = {
+                    'running': running,
+                    'waiting_for_thread': self._dispatched.get(script, 0) - running,
+                    'queued': len(self._waiting.get(script, ())),
+                    'limit': self.script_limits.get(script, self.default_script_limit)
+                }
+
+            dispatched = sum(self._dispatched.values())
+            running = sum(self._running.values())
+            return {
+                'max_workers': self.max_workers,
+                'max_queue': self.max_queue,
+                'pending': self._pending,
+                'running': running,
+                'waiting_for_thread': dispatched - running,
+                'queued': self._pending - dispatched,
+                'completed': self._completed,
+                'failed': self._failed,
+                'timed_out': self._timed_out,
+                'rejected': self._rejected,
+                'scripts': scripts
+            }
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._pool.shutdown(wait=wait)
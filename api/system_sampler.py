@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+LOMP Stack v3.0 - System Metrics Sampler
+Background collector for CPU, memory, load and disk metrics read from /proc
+
+Author: Silviu Ilie <neosilviu@gmail.com>
+Company: aemdPC
+Version: 3.0.0
+Copyright © 2025 aemdPC. All rights reserved.
+License: MIT License
+
+Repository: https://github.com/aemdPC/lomp-stack-v3
+Documentation: https://docs.aemdpc.com/lomp-stack
+Support: https://support.aemdpc.com
+"""
+
+import os
+import json
+import time
+import hashlib
+import threading
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+CPU_STATES = ['user', 'nice', 'system', 'idle', 'iowait', 'irq', 'softirq', 'steal']
+
+#########################################################################
+# /proc readers
+#########################################################################
+
+def read_cpu_times(proc_root: str = '/proc') -> Optional[List[int]]:
+    """Return aggregate CPU jiffies from /proc/stat in CPU_STATES order"""
+    try:
+        with open(os.path.join(proc_root, 'stat'), 'r') as f:
+            fields = f.readline().split()
+        if fields[0] != 'cpu':
+            return None
+        values = [int(v) for v in fields[1:len(CPU_STATES) + 1]]
+        return values + [0] * (len(CPU_STATES) - len(values))
+    except (OSError, ValueError, IndexError):
+        return None
+
+def cpu_usage(previous: List[int], current: List[int]) -> Dict:
+    """CPU utilisation between two /proc/stat readings"""
+    deltas = [c - p for c, p in zip(current, previous)]
+    total = sum(deltas)
+    if total <= 0:
+        return {'percent': 0.0}
+
+    usage = {state: round(delta * 100.0 / total, 1) for state, delta in zip(CPU_STATES, deltas)}
+    idle = deltas[CPU_STATES.index('idle')] + deltas[CPU_STATES.index('iowait')]
+    usage['percent'] = round((total - idle) * 100.0 / total, 1)
+    return usage
+
+def read_meminfo(proc_root: str = '/proc') -> Optional[Dict]:
+    """Memory usage from /proc/meminfo, in bytes"""
+    try:
+        values = {}
+        with open(os.path.join(proc_root, 'meminfo'), 'r') as f:
+            for line in f:
+                name, _, rest = line.partition(':')
+                values[name] = int(rest.split()[0]) * 1024
+    except (OSError, ValueError, IndexError):
+        return None
+
+    total = values.get('MemTotal', 0)
+    available = values.get('MemAvailable', values.get('MemFree', 0))
+    swap_total = values.get('SwapTotal', 0)
+    swap_free = values.get('SwapFree', 0)
+    return {
+        'total': total,
+        'available': available,
+        'used': total - available,
+        'percent': round((total - available) * 100.0 / total, 1) if total else 0.0,
+        'cached': values.get('Cached', 0),
+        'swap_total': swap_total,
+        'swap_used': swap_total - swap_free
+    }
+
+def read_loadavg(proc_root: str = '/proc') -> Optional[Dict]:
+    """Load averages and process counts from /proc/loadavg"""
+    try:
+        with open(os.path.join(proc_root, 'loadavg'), 'r') as f:
+            fields = f.read().split()
+        running, total = fields[3].split('/')
+        return {
+            'load_1m': float(fields[0]),
+            'load_5m': float(fields[1]),
+            'load_15m': float(fields[2]),
+            'running_processes': int(running),
+            'total_processes': int(total)
+        }
+    except (OSError, ValueError, IndexError):
+        return None
+
+def read_uptime(proc_root: str = '/proc') -> Optional[float]:
+    try:
+        with open(os.path.join(proc_root, 'uptime'), 'r') as f:
+            return float(f.read().split()[0])
+    except (OSError, ValueError, IndexError):
+        return None
+
+def read_disk(path: str) -> Optional[Dict]:
+    """Filesystem usage for path via statvfs, in bytes"""
+    try:
+        st = os.statvfs(path)
+    except (OSError, AttributeError):
+        return None
+
+    total = st.f_blocks * st.f_frsize
+    free = st.f_bavail * st.f_frsize
+    used = total - st.f_bfree * st.f_frsize
+    return {
+        'total': total,
+        'used': used,
+        'free': free,
+        'percent': round(used * 100.0 / (used + free), 1) if used + free else 0.0
+    }
+
+#########################################################################
+# Sampler
+#########################################################################
+
+class Snapshot:
+    """Pre-serialised metrics for one sampling interval"""
+
+    def __init__(self, metrics: Dict, status: Dict):
+        self.metrics = metrics
+        self.status = status
+        self.metrics_body, self.metrics_etag = self._encode(metrics)
+        self.status_body, self.status_etag = self._encode(status)
+
+    @staticmethod
+    def _encode(data: Dict) -> Tuple[bytes, str]:
+        body = json.dumps({'success': True, 'data': data}).encode('utf-8')
+        return body, hashlib.sha1(body).hexdigest()
+
+class SystemSampler:
+    """Samples system metrics on a background thread
+
+    Requests read the latest Snapshot, whose JSON bodies and ETags are built
+    once per interval, so serving them costs a dictionary lookup.
+    """
+
+    def __init__(self, interval: float = 5.0, disk_paths: Optional[List[str]] = None,
+                 proc_root: str = '/proc'):
+        self.interval = interval
+        self.disk_paths = disk_paths or ['/']
+        self.proc_root = proc_root
+        self._cpu_times = None
+        self._snapshot: Optional[Snapshot] = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def snapshot(self) -> Optional[Snapshot]:
+        return self._snapshot
+
+    def start(self) -> None:
+        """Take a first sample synchronously, then keep sampling in the background"""
+        if self._thread is not None:
+            return
+        self._cpu_times = read_cpu_times(self.proc_root)
+        time.sleep(0.1)
+        self.sample()
+
+        self._thread = threading.Thread(target=self._run, name='system-sampler', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval)
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.sample()
+            except Exception as e:
+                logger.error(f"Error sampling system metrics: {str(e)}")
+
+    def sample(self) -> Snapshot:
+        """Collect metrics and publish a new snapshot"""
+        timestamp = datetime.utcnow().isoformat()
+
+        cpu = None
+        cpu_times = read_cpu_times(self.proc_root)
+        if cpu_times is not None:
+            if self._cpu_times is not None:
+                cpu = cpu_usage(self._cpu_times, cpu_times)
+                cpu['count'] = os.cpu_count()
+            self._cpu_times = cpu_times
+
+        memory = read_meminfo(self.proc_root)
+        load = read_loadavg(self.proc_root)
+        disks = {path: read_disk(path) for path in self.disk_paths}
+
+        metrics = {
+            'timestamp': timestamp,
+            'interval': self.interval,
+            'uptime_seconds': read_uptime(self.proc_root),
+            'cpu': cpu,
+            'memory': memory,
+            'load': load,
+            'disk': disks
+        }
+
+        status = {
+            'status': 'healthy',
+            'timestamp': timestamp,
+            'system_info': {
+                'hostname': os.uname().nodename if hasattr(os, 'uname') else None,
+                'uptime_seconds': metrics['uptime_seconds'],
+                'cpu_percent': cpu['percent'] if cpu else None,
+                'memory_percent': memory['percent'] if memory else None,
+                'load_1m': load['load_1m'] if load else None,
+                'disk_percent': {path: disk['percent'] for path, disk in disks.items() if disk}
+            }
+        }
+
+        snapshot = Snapshot({'metrics': metrics, 'timestamp': timestamp}, status)
+        self._snapshot = snapshot
+        return snapshot
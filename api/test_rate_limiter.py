@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+test_rate_limiter.py - Part of LOMP Stack v3.0
+Part of LOMP Stack v3.0
+
+Author: Silviu Ilie <neosilviu@gmail.com>
+Company: aemdPC
+Version: 3.0.0
+Copyright © 2025 aemdPC. All rights reserved.
+License: MIT License
+
+Repository: https://github.com/aemdPC/lomp-stack-v3
+Documentation: https://docs.aemdpc.com/lomp-stack
+Support: https://support.aemdpc.com
+"""
+
+
+"""
+LOMP Stack v3.0 - API Rate Limiter Test
+Token exhaustion and refill for every rate limiting backend
+"""
+
+import os
+import sys
+import sqlite3
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import rate_limiter
+from rate_limiter import (BatchedSQLiteRateLimiter, MemoryRateLimiter, SharedMemoryRateLimiter,
+                          create_rate_limiter)
+
+class FakeClock:
+    """Stands in for the time module so buckets refill on demand"""
+
+    def __init__(self, now=1_700_000_000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+    def monotonic(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limiter, 'time', clock)
+    return clock
+
+def make_sqlite_db(path):
+    conn = sqlite3.connect(path)
+    conn.execute('''
+        CREATE TABLE rate_limits (
+            api_key TEXT PRIMARY KEY,
+            requests INTEGER DEFAULT 0,
+            window_start INTEGER
+        )
+    ''')
+    conn.commit()
+    conn.close()
+
+@pytest.fixture(params=['memory', 'shared', 'sqlite'])
+def limiter(request, tmp_path, clock):
+    """Each backend with a burst of 3 requests"""
+    if request.param == 'memory':
+        limiter = MemoryRateLimiter(burst_limit=3)
+    elif request.param == 'shared':
+        if os.name == 'nt':
+            pytest.skip('fcntl is POSIX only')
+        limiter = SharedMemoryRateLimiter(path=str(tmp_path / 'rate_limits'), slots=64, burst_limit=3)
+    else:
+        db_path = str(tmp_path / 'rate_limits.db')
+        make_sqlite_db(db_path)
+        limiter = BatchedSQLiteRateLimiter(db_path, flush_interval=3600, burst_limit=3)
+    yield limiter
+    limiter.close()
+
+def test_bucket_exhausts_after_burst(limiter):
+    assert [limiter.allow('key', 60) for _ in range(4)] == [True, True, True, False]
+
+def test_bucket_refills_at_rate(limiter, clock):
+    for _ in range(3):
+        limiter.allow('key', 60)
+    assert not limiter.allow('key', 60)
+
+    # 60 per minute is one token per second
+    clock.advance(1.0)
+    assert limiter.allow('key', 60)
+    assert not limiter.allow('key', 60)
+
+    # Refill stops at the bucket capacity
+    clock.advance(3600)
+    assert [limiter.allow('key', 60) for _ in range(4)] == [True, True, True, False]
+
+def test_keys_have_separate_buckets(limiter):
+    for _ in range(3):
+        limiter.allow('first', 60)
+    assert not limiter.allow('first', 60)
+    assert limiter.allow('second', 60)
+
+def test_shared_buckets_are_seen_by_other_processes(tmp_path, clock):
+    if os.name == 'nt':
+        pytest.skip('fcntl is POSIX only')
+    path = str(tmp_path / 'rate_limits')
+    first = SharedMemoryRateLimiter(path=path, slots=64, burst_limit=2)
+    second = SharedMemoryRateLimiter(path=path, slots=64, burst_limit=2)
+    try:
+        assert first.allow('key', 60)
+        assert second.allow('key', 60)
+        assert not first.allow('key', 60)
+    finally:
+        first.close()
+        second.close()
+
+def test_sqlite_counters_survive_restart(tmp_path, clock):
+    db_path = str(tmp_path / 'rate_limits.db')
+    make_sqlite_db(db_path)
+
+    limiter = BatchedSQLiteRateLimiter(db_path, flush_interval=3600, burst_limit=3)
+    assert limiter.allow('key', 60)
+    assert limiter.allow('key', 60)
+    limiter.close()
+
+    conn = sqlite3.connect(db_path)
+    assert conn.execute('SELECT requests FROM rate_limits WHERE api_key = ?', ('key',)).fetchone() == (2,)
+    conn.close()
+
+    # A restart within the same minute only has what is left of the burst
+    restarted = BatchedSQLiteRateLimiter(db_path, flush_interval=3600, burst_limit=3)
+    try:
+        assert [restarted.allow('key', 60) for _ in range(2)] == [True, False]
+    finally:
+        restarted.close()
+
+def test_factory_selects_backend(tmp_path):
+    assert create_rate_limiter({'enabled': False}) is None
+    assert isinstance(create_rate_limiter({}), MemoryRateLimiter)
+    with pytest.raises(ValueError):
+        create_rate_limiter({'backend': 'redis'})
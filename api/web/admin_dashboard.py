@@ -19,14 +19,19 @@ import json
 import sqlite3
 import hashlib
 import secrets
+import threading
 import requests
 from datetime import datetime, timedelta
-from flask import Flask, render_template, request, jsonify, session, redirect, url_for, flash
+from flask import Flask, render_template, request, jsonify, session, redirect, url_for, flash, Response, stream_with_context
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 import subprocess
 import logging
 
+from bulk_jobs import BulkJobRunner
+from log_stream import compile_filter, stream_file, stream_journal
+from log_tail import scan_lines, tail_lines
+
 # Initialize Flask app
 app = Flask(__name__)
 app.secret_key = secrets.token_hex(32)
@@ -45,6 +50,7 @@ STACK_ROOT = os.path.dirname(API_DIR)
 CONFIG_FILE = os.path.join(API_DIR, 'api_config.json')
 API_KEYS_FILE = os.path.join(API_DIR, 'auth', 'api_keys.json')
 ADMIN_DB = os.path.join(API_DIR, 'auth', 'admin_users.db')
+LOG_FILE = os.path.join(API_DIR, '..', 'tmp', 'api_management.log')
 
 # Logging setup
 logging.basicConfig(level=logging.INFO)
@@ -168,8 +174,40 @@ def load_api_keys():
 
 def save_api_keys(keys_data):
     """Save API keys"""
-    with open(API_KEYS_FILE, 'w') as f:
+    # Write to a temp file and rename it over the original. The rename gives
+    # the file a new inode, which signals the API server's key registry to
+    # reload, and readers never see a half-written file.
+    tmp_file = f"{API_KEYS_FILE}.tmp"
+    with open(tmp_file, 'w') as f:
         json.dump(keys_data, f, indent=4)
+    os.replace(tmp_file, API_KEYS_FILE)
+    update_api_key_counts(keys_data, api_keys_signature())
+
+# Key counts for the overview pages, recounted only when the keys file changes
+_api_key_counts = {'signature': None, 'total_keys': 0, 'active_keys': 0}
+
+def api_keys_signature():
+    try:
+        st = os.stat(API_KEYS_FILE)
+    except OSError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+def update_api_key_counts(keys_data, signature):
+    global _api_key_counts
+    keys = keys_data.get('api_keys', [])
+    _api_key_counts = {
+        'signature': signature,
+        'total_keys': len(keys),
+        'active_keys': len([k for k in keys if k.get('active', False)])
+    }
+
+def get_api_key_counts():
+    """Total and active API keys; a stat() call unless the file was replaced"""
+    signature = api_keys_signature()
+    if signature != _api_key_counts['signature']:
+        update_api_key_counts(load_api_keys(), signature)
+    return _api_key_counts
 
 def get_system_stats():
     """Get system statistics"""
@@ -186,10 +224,9 @@ def get_system_stats():
             'disk_usage': '23%'
         }
         
-        # Load API keys
-        keys_data = load_api_keys()
-        stats['total_keys'] = len(keys_data.get('api_keys', []))
-        stats['active_keys'] = len([k for k in keys_data.get('api_keys', []) if k.get('active', False)])
+        key_counts = get_api_key_counts()
+        stats['total_keys'] = key_counts['total_keys']
+        stats['active_keys'] = key_counts['active_keys']
         
         return stats
     except:
@@ -252,10 +289,9 @@ def dashboard():
     """Main dashboard"""
     stats = get_system_stats()
     
-    # Check for updates if needed
+    # Serve the cached status; a stale one is refreshed in the background
     if should_check_updates():
-        update_info = check_for_updates()
-        save_update_status(update_info)
+        update_checker.refresh_async()
     
     # Get update status and notifications
     update_status = get_update_status()
@@ -287,21 +323,61 @@ def monitoring():
     stats = get_system_stats()
     return render_template('monitoring.html', stats=stats)
 
+def read_log_page(args):
+    """A page of the API log for the ?lines=, ?before=, ?level= and ?q= arguments"""
+    lines = max(1, min(args.get('lines', 100, type=int), 1000))
+    before = args.get('before', type=int)
+    levels = args.getlist('level')
+    keyword = args.get('q', '').strip()
+    if levels or keyword:
+        return scan_lines(LOG_FILE, lines, before, levels, keyword)
+    return tail_lines(LOG_FILE, lines, before)
+
 @app.route('/logs')
 @login_required
 def logs():
     """System logs page"""
+    page = {'lines': [], 'start': 0, 'end': 0, 'has_more': False}
     try:
-        log_file = os.path.join(API_DIR, '..', 'tmp', 'api_management.log')
-        if os.path.exists(log_file):
-            with open(log_file, 'r') as f:
-                logs = f.readlines()[-100:]  # Last 100 lines
+        if os.path.exists(LOG_FILE):
+            page = read_log_page(request.args)
+            logs = page['lines']
         else:
             logs = ['No logs found']
     except:
         logs = ['Error reading logs']
     
-    return render_template('logs.html', logs=logs)
+    return render_template('logs.html', logs=logs, log_offset=page['end'],
+                           log_start=page['start'], log_has_more=page['has_more'])
+
+@app.route('/api/logs', methods=['GET'])
+@login_required
+def api_get_logs():
+    """Page backwards through the API log; pass `start` back as ?before= for older lines"""
+    if not os.path.exists(LOG_FILE):
+        return jsonify({"success": True, "lines": [], "start": 0, "end": 0, "has_more": False})
+    
+    try:
+        return jsonify({"success": True, **read_log_page(request.args)})
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+def stream_response(events):
+    """Wrap a server-sent event generator in a streaming response"""
+    return Response(stream_with_context(events), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/api/logs/stream', methods=['GET'])
+@login_required
+def api_stream_logs():
+    """Stream the API management log: the last ?lines= lines, then new lines as written"""
+    lines = min(request.args.get('lines', 100, type=int), 1000)
+    pattern = compile_filter(request.args.get('grep'))
+    # Resume from the offset of the last line the client received
+    offset = request.headers.get('Last-Event-ID', request.args.get('offset'))
+    offset = int(offset) if offset and offset.isdigit() else None
+    
+    return stream_response(stream_file(LOG_FILE, lines, pattern, offset))
 
 #########################################################################
 # API Routes - AJAX endpoints
@@ -422,19 +498,149 @@ def api_stats():
 try:
     from hosting_management import (
         get_all_services, manage_service, get_service_config,
-        get_all_sites, create_new_site, get_wp_sites, install_wordpress,
-        get_all_domains, add_domain, SITES_DB_PATH, DOMAINS_DB_PATH, SERVICES_DB_PATH,
-        get_python_apps, create_python_app, manage_python_app, get_python_app_logs
+        create_new_site, get_wp_sites, install_wordpress,
+        get_all_domains, add_domain,
+        query_sites, get_site_counts, get_service_counts, get_domain_counts,
+        sites_db, domains_db,
+        get_python_apps, create_python_app, manage_python_app, manage_python_apps, get_python_app_logs,
+        get_python_app_service, parse_site_manifest, provision_sites,
+        update_wordpress_site, backup_wordpress_site, enable_site_ssl,
+        renew_domain_ssl, check_domain_dns, SYSTEMCTL_ACTIONS, helpers, wp_core_cache
     )
     HOSTING_ENABLED = True
 except ImportError:
     HOSTING_ENABLED = False
     print("Warning: Hosting management features not available")
 
+#########################################################################
+# Bulk Jobs
+#########################################################################
+
+# Shared by every bulk endpoint, so concurrent bulk requests stay within one worker limit
+bulk_runner = BulkJobRunner(max_workers=8)
+
+def submit_bulk_job(kind, action, items, handler=None, batch_handler=None, pipeline=None):
+    """Queue a bulk action and answer with its job id straight away"""
+    job = bulk_runner.submit(kind, action, items, handler=handler, batch_handler=batch_handler, pipeline=pipeline)
+    return jsonify({
+        "success": True,
+        "job_id": job.id,
+        "total": len(job.items),
+        "message": f"{kind.capitalize()} {action} queued for {len(job.items)} items",
+        "status_url": url_for('api_get_bulk_job', job_id=job.id),
+        "stream_url": url_for('api_stream_bulk_job', job_id=job.id)
+    }), 202
+
+def parse_id_list(values):
+    """Row ids sent by the pages (numbers or numeric strings) as unique ints; None if any is invalid"""
+    if not isinstance(values, list):
+        return None
+    ids = []
+    for value in values:
+        if isinstance(value, str) and value.strip().isdigit():
+            value = int(value)
+        if not isinstance(value, int) or isinstance(value, bool):
+            return None
+        ids.append(value)
+    return list(dict.fromkeys(ids))
+
+@app.route('/api/jobs', methods=['GET'])
+@login_required
+def api_list_bulk_jobs():
+    """List recent bulk jobs"""
+    return jsonify({"success": True, "jobs": bulk_runner.list_jobs()})
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+@login_required
+def api_get_bulk_job(job_id):
+    """Progress of a bulk job, with item results from ?since=<index> onwards"""
+    job = bulk_runner.get(job_id)
+    if not job:
+        return jsonify({"error": "Job not found"}), 404
+
+    since = request.args.get('since', 0, type=int)
+    return jsonify({"success": True, **job.snapshot(max(since, 0))})
+
+@app.route('/api/jobs/<job_id>/stream', methods=['GET'])
+@login_required
+def api_stream_bulk_job(job_id):
+    """Stream item results of a bulk job as server-sent events"""
+    job = bulk_runner.get(job_id)
+    if not job:
+        return jsonify({"error": "Job not found"}), 404
+
+    since = request.args.get('since', 0, type=int)
+
+    def generate():
+        position = max(since, 0)
+        while True:
+            job.wait(position, timeout=15)
+            snapshot = job.snapshot(position)
+            for result in snapshot['results']:
+                yield f"event: item\ndata: {json.dumps(result)}\n\n"
+            position = snapshot['next']
+            progress = {key: value for key, value in snapshot.items() if key != 'results'}
+            yield f"event: progress\ndata: {json.dumps(progress)}\n\n"
+            if job.done and position >= len(job.events):
+                yield f"event: done\ndata: {json.dumps(progress)}\n\n"
+                return
+
+    return stream_response(generate())
+
+#########################################################################
+# Helper Script Runs
+#########################################################################
+
+# Longest a status request may block waiting for new output
+HELPER_RUN_MAX_WAIT = 30
+
+@app.route('/api/helper-runs', methods=['GET'])
+@login_required
+def api_list_helper_runs():
+    """List recent helper script runs"""
+    if not HOSTING_ENABLED or not helpers:
+        return jsonify({"error": "Helper scripts not available"}), 503
+    return jsonify({"success": True, "runs": helpers.list_helper_runs()})
+
+@app.route('/api/helper-runs/<run_id>', methods=['GET'])
+@login_required
+def api_get_helper_run(run_id):
+    """Status, progress and output of a helper run from line ?since=<seq> onwards
+
+    With ?wait=<seconds> the request blocks until new output arrives or the run ends.
+    """
+    if not HOSTING_ENABLED or not helpers:
+        return jsonify({"error": "Helper scripts not available"}), 503
+
+    since = max(request.args.get('since', 0, type=int), 0)
+    wait = min(max(request.args.get('wait', 0, type=float), 0), HELPER_RUN_MAX_WAIT)
+    snapshot = helpers.get_helper_run(run_id, since, wait)
+    if snapshot is None:
+        return jsonify({"error": "Run not found"}), 404
+    return jsonify({"success": True, **snapshot})
+
 #########################################################################
 # Extended Hosting Routes
 #########################################################################
 
+SITES_PER_PAGE = 50
+
+def parse_site_query(args):
+    """Read site filters and sort order from query parameters"""
+    filters = {name: args.get(name) for name in ('status', 'web_server', 'site_type')}
+    
+    wp = args.get('wp_installed', args.get('wp', ''))
+    if wp in ('1', 'true', 'wp'):
+        filters['wp_installed'] = True
+    elif wp in ('0', 'false', 'non-wp'):
+        filters['wp_installed'] = False
+    elif wp:
+        raise ValueError(f'Invalid wp_installed filter: {wp}')
+    
+    sort = args.get('sort', 'created_at')
+    order = args.get('order', 'asc' if sort == 'domain' else 'desc')
+    return filters, sort, order
+
 @app.route('/services')
 @login_required
 def services():
@@ -454,8 +660,27 @@ def sites():
         flash('Hosting features not available', 'error')
         return redirect(url_for('dashboard'))
     
-    sites = get_all_sites()
-    return render_template('sites.html', sites=sites)
+    try:
+        filters, sort, order = parse_site_query(request.args)
+        page = max(int(request.args.get('page', 1)), 1)
+    except ValueError as e:
+        flash(str(e), 'error')
+        return redirect(url_for('sites'))
+    
+    per_page = SITES_PER_PAGE
+    result = query_sites(filters, sort, order, limit=per_page, offset=(page - 1) * per_page)
+    pagination = {
+        'page': page,
+        'per_page': per_page,
+        'total': result['total'],
+        'pages': max((result['total'] + per_page - 1) // per_page, 1)
+    }
+    
+    return render_template('sites.html',
+                         sites=result['sites'],
+                         site_counts=get_site_counts(),
+                         pagination=pagination,
+                         filters=request.args)
 
 @app.route('/wordpress')
 @login_required
@@ -500,23 +725,22 @@ def hosting():
         flash('Hosting features not available', 'error')
         return redirect(url_for('dashboard'))
     
-    services = get_all_services()
-    sites = get_all_sites()
-    domains = get_all_domains()
+    site_counts = get_site_counts()
+    service_counts = get_service_counts()
     
     hosting_stats = {
-        'total_sites': len(sites),
-        'active_sites': len([s for s in sites if s['status'] == 'active']),
-        'wp_sites': len([s for s in sites if s['wp_installed']]),
-        'total_domains': len(domains),
-        'active_services': len([s for s in services if s['status'] == 'active']),
-        'total_services': len(services)
+        'total_sites': site_counts['total'],
+        'active_sites': site_counts['active'],
+        'wp_sites': site_counts['wp'],
+        'total_domains': get_domain_counts()['total'],
+        'active_services': service_counts['by_status'].get('active', 0),
+        'total_services': service_counts['total']
     }
     
     return render_template('hosting.html', 
-                         services=services[:5],  # Show top 5 services
-                         sites=sites[:10],       # Show latest 10 sites
-                         domains=domains[:5],    # Show 5 domains
+                         services=get_all_services(limit=5),        # Show top 5 services
+                         sites=query_sites(limit=10)['sites'],      # Show latest 10 sites
+                         domains=get_all_domains(limit=5),          # Show 5 domains
                          stats=hosting_stats)
 
 #########################################################################
@@ -543,6 +767,27 @@ def api_get_service_config(service_name):
     config = get_service_config(service_name)
     return jsonify({"config": config})
 
+@app.route('/api/sites', methods=['GET'])
+@login_required
+def api_list_sites():
+    """List sites a page at a time; pass next_cursor back as ?cursor= for the next page"""
+    if not HOSTING_ENABLED:
+        return jsonify({"error": "Hosting features not available"}), 400
+    
+    try:
+        filters, sort, order = parse_site_query(request.args)
+        limit = int(request.args.get('limit', 50))
+        result = query_sites(filters, sort, order, limit=limit, cursor=request.args.get('cursor'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    return jsonify({
+        "success": True,
+        "sites": result['sites'],
+        "total": result['total'],
+        "next_cursor": result['next_cursor']
+    })
+
 @app.route('/api/sites', methods=['POST'])
 @login_required
 def api_create_site():
@@ -564,6 +809,35 @@ def api_create_site():
     result = create_new_site(domain, subdomain, php_version, web_server, install_wp)
     return jsonify(result)
 
+# Sites accepted in one bulk manifest
+BULK_SITES_LIMIT = 1000
+
+@app.route('/api/sites/bulk', methods=['POST'])
+@login_required
+def api_bulk_create_sites():
+    """Provision the sites of a manifest; per-site results stream from the returned job
+
+    Body: {"sites": [{"domain": ..., "subdomain": ..., "php_version": ...,
+    "web_server": ..., "install_wp": ...}], "defaults": {...}}
+    """
+    if not HOSTING_ENABLED:
+        return jsonify({"error": "Hosting features not available"}), 400
+    
+    data = request.get_json(silent=True) or {}
+    entries = data.get('sites')
+    if not isinstance(entries, list) or not entries:
+        return jsonify({"error": "A non-empty list of sites is required"}), 400
+    if len(entries) > BULK_SITES_LIMIT:
+        return jsonify({"error": f"At most {BULK_SITES_LIMIT} sites per request"}), 400
+    
+    sites, errors = parse_site_manifest(entries, data.get('defaults') or {})
+    if errors:
+        return jsonify({"error": "Invalid manifest", "details": errors}), 400
+    
+    by_domain = {site['full_domain']: site for site in sites}
+    return submit_bulk_job('sites', 'create', list(by_domain),
+                           pipeline=lambda items, record: provision_sites([by_domain[item] for item in items], record))
+
 @app.route('/api/domains', methods=['POST'])
 @login_required
 def api_add_domain():
@@ -591,12 +865,7 @@ def api_get_domain(domain_id):
         return jsonify({"error": "Hosting features not available"}), 400
     
     try:
-        conn = sqlite3.connect(DOMAINS_DB_PATH)
-        cursor = conn.cursor()
-        
-        cursor.execute('SELECT * FROM domains WHERE id = ?', (domain_id,))
-        row = cursor.fetchone()
-        conn.close()
+        row = domains_db.query_one('SELECT * FROM domains WHERE id = ?', (domain_id,))
         
         if not row:
             return jsonify({"error": "Domain not found"}), 404
@@ -631,29 +900,24 @@ def api_update_domain(domain_id):
     data = request.get_json()
     
     try:
-        conn = sqlite3.connect(DOMAINS_DB_PATH)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            UPDATE domains SET 
-                domain_name = ?, domain_type = ?, nameservers = ?, 
-                registrar = ?, expiry_date = ?, auto_renew = ?, 
-                cloudflare_enabled = ?, status = ?
-            WHERE id = ?
-        ''', (
-            data.get('domain_name'),
-            data.get('domain_type'),
-            data.get('nameservers'),
-            data.get('registrar'),
-            data.get('expiry_date'),
-            data.get('auto_renew', False),
-            data.get('cloudflare_enabled', False),
-            data.get('status'),
-            domain_id
-        ))
-        
-        conn.commit()
-        conn.close()
+        with domains_db.transaction() as conn:
+            conn.execute('''
+                UPDATE domains SET 
+                    domain_name = ?, domain_type = ?, nameservers = ?, 
+                    registrar = ?, expiry_date = ?, auto_renew = ?, 
+                    cloudflare_enabled = ?, status = ?
+                WHERE id = ?
+            ''', (
+                data.get('domain_name'),
+                data.get('domain_type'),
+                data.get('nameservers'),
+                data.get('registrar'),
+                data.get('expiry_date'),
+                data.get('auto_renew', False),
+                data.get('cloudflare_enabled', False),
+                data.get('status'),
+                domain_id
+            ))
         
         return jsonify({"success": True, "message": "Domain updated successfully"})
         
@@ -668,12 +932,8 @@ def api_delete_domain(domain_id):
         return jsonify({"error": "Hosting features not available"}), 400
     
     try:
-        conn = sqlite3.connect(DOMAINS_DB_PATH)
-        cursor = conn.cursor()
-        
-        cursor.execute('DELETE FROM domains WHERE id = ?', (domain_id,))
-        conn.commit()
-        conn.close()
+        with domains_db.transaction() as conn:
+            conn.execute('DELETE FROM domains WHERE id = ?', (domain_id,))
         
         return jsonify({"success": True, "message": "Domain deleted successfully"})
         
@@ -747,17 +1007,9 @@ def api_bulk_enable_cloudflare():
         return jsonify({"error": "No domains selected"}), 400
     
     try:
-        conn = sqlite3.connect(DOMAINS_DB_PATH)
-        cursor = conn.cursor()
-        
-        placeholders = ','.join(['?' for _ in domain_ids])
-        cursor.execute(f'''
-            UPDATE domains SET cloudflare_enabled = 1 
-            WHERE id IN ({placeholders})
-        ''', domain_ids)
-        
-        conn.commit()
-        conn.close()
+        with domains_db.transaction() as conn:
+            conn.executemany('UPDATE domains SET cloudflare_enabled = 1 WHERE id = ?',
+                             [(domain_id,) for domain_id in domain_ids])
         
         return jsonify({"success": True, "message": f"Cloudflare enabled for {len(domain_ids)} domains"})
         
@@ -772,13 +1024,14 @@ def api_bulk_renew_ssl():
         return jsonify({"error": "Hosting features not available"}), 400
     
     data = request.get_json()
-    domain_ids = data.get('domain_ids', [])
+    domain_ids = parse_id_list(data.get('domain_ids', []))
     
+    if domain_ids is None:
+        return jsonify({"error": "domain_ids must be a list of numeric ids"}), 400
     if not domain_ids:
         return jsonify({"error": "No domains selected"}), 400
     
-    # This would integrate with Let's Encrypt or other SSL providers
-    return jsonify({"success": True, "message": f"SSL renewal initiated for {len(domain_ids)} domains"})
+    return submit_bulk_job('domains', 'renew-ssl', domain_ids, handler=renew_domain_ssl)
 
 @app.route('/api/domains/bulk/check-dns', methods=['POST'])
 @login_required
@@ -788,13 +1041,14 @@ def api_bulk_check_dns():
         return jsonify({"error": "Hosting features not available"}), 400
     
     data = request.get_json()
-    domain_ids = data.get('domain_ids', [])
+    domain_ids = parse_id_list(data.get('domain_ids', []))
     
+    if domain_ids is None:
+        return jsonify({"error": "domain_ids must be a list of numeric ids"}), 400
     if not domain_ids:
         return jsonify({"error": "No domains selected"}), 400
     
-    # This would check DNS propagation and status
-    return jsonify({"success": True, "message": f"DNS check completed for {len(domain_ids)} domains"})
+    return submit_bulk_job('domains', 'check-dns', domain_ids, handler=check_domain_dns)
 
 @app.route('/api/wordpress/install', methods=['POST'])
 @login_required
@@ -847,12 +1101,7 @@ def api_get_wordpress_site(site_id):
     
     try:
         # Get site info
-        conn = sqlite3.connect(SITES_DB_PATH)
-        cursor = conn.cursor()
-        
-        cursor.execute('SELECT * FROM sites WHERE id = ?', (site_id,))
-        row = cursor.fetchone()
-        conn.close()
+        row = sites_db.query_one('SELECT * FROM sites WHERE id = ?', (site_id,))
         
         if not row:
             return jsonify({"error": "Site not found"}), 404
@@ -913,12 +1162,8 @@ def api_delete_wordpress_site(site_id):
         return jsonify({"error": "Hosting features not available"}), 400
     
     try:
-        conn = sqlite3.connect(SITES_DB_PATH)
-        cursor = conn.cursor()
-        
-        cursor.execute('DELETE FROM sites WHERE id = ?', (site_id,))
-        conn.commit()
-        conn.close()
+        with sites_db.transaction() as conn:
+            conn.execute('DELETE FROM sites WHERE id = ?', (site_id,))
         
         return jsonify({"success": True, "message": "WordPress site deleted successfully"})
         
@@ -975,6 +1220,15 @@ def api_check_wordpress_updates():
     # This would use WP-CLI to check for updates
     return jsonify({"success": True, "message": "Update check completed"})
 
+@app.route('/api/wordpress/core-cache', methods=['GET'])
+@login_required
+def api_wordpress_core_cache():
+    """Cached WordPress releases and the disk saved by sites sharing them"""
+    if not HOSTING_ENABLED:
+        return jsonify({"error": "Hosting features not available"}), 400
+    
+    return jsonify(wp_core_cache.dedup_report())
+
 @app.route('/api/wordpress/bulk/update', methods=['POST'])
 @login_required
 def api_bulk_update_wordpress():
@@ -983,13 +1237,14 @@ def api_bulk_update_wordpress():
         return jsonify({"error": "Hosting features not available"}), 400
     
     data = request.get_json()
-    site_ids = data.get('site_ids', [])
+    site_ids = parse_id_list(data.get('site_ids', []))
     
+    if site_ids is None:
+        return jsonify({"error": "site_ids must be a list of numeric ids"}), 400
     if not site_ids:
         return jsonify({"error": "No sites selected"}), 400
     
-    # This would use WP-CLI to update multiple sites
-    return jsonify({"success": True, "message": f"Updates initiated for {len(site_ids)} sites"})
+    return submit_bulk_job('wordpress', 'update', site_ids, handler=update_wordpress_site)
 
 @app.route('/api/wordpress/bulk/maintenance', methods=['POST'])
 @login_required
@@ -1015,13 +1270,14 @@ def api_bulk_enable_ssl():
         return jsonify({"error": "Hosting features not available"}), 400
     
     data = request.get_json()
-    site_ids = data.get('site_ids', [])
+    site_ids = parse_id_list(data.get('site_ids', []))
     
+    if site_ids is None:
+        return jsonify({"error": "site_ids must be a list of numeric ids"}), 400
     if not site_ids:
         return jsonify({"error": "No sites selected"}), 400
     
-    # This would enable SSL for multiple sites
-    return jsonify({"success": True, "message": f"SSL enabled for {len(site_ids)} sites"})
+    return submit_bulk_job('wordpress', 'enable-ssl', site_ids, handler=enable_site_ssl)
 
 @app.route('/api/wordpress/bulk/backup', methods=['POST'])
 @login_required
@@ -1031,13 +1287,14 @@ def api_bulk_backup_wordpress():
         return jsonify({"error": "Hosting features not available"}), 400
     
     data = request.get_json()
-    site_ids = data.get('site_ids', [])
+    site_ids = parse_id_list(data.get('site_ids', []))
     
+    if site_ids is None:
+        return jsonify({"error": "site_ids must be a list of numeric ids"}), 400
     if not site_ids:
         return jsonify({"error": "No sites selected"}), 400
     
-    # This would create backups for multiple sites
-    return jsonify({"success": True, "message": f"Backups initiated for {len(site_ids)} sites"})
+    return submit_bulk_job('wordpress', 'backup', site_ids, handler=backup_wordpress_site)
 
 #########################################################################
 # API Endpoints for Python Application Management
@@ -1075,18 +1332,12 @@ def api_get_python_app(app_id):
     
     try:
         # Get app info
-        conn = sqlite3.connect(SITES_DB_PATH)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
+        row = sites_db.query_one('''
             SELECT domain, subdomain, site_type, python_version, python_framework, 
                    python_venv_path, python_port, status, ssl_enabled, created_at
             FROM sites WHERE id = ? AND site_type = 'python'
         ''', (app_id,))
         
-        row = cursor.fetchone()
-        conn.close()
-        
         if not row:
             return jsonify({"error": "Python application not found"}), 404
         
@@ -1189,6 +1440,23 @@ def api_get_python_app_logs(app_id):
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/python/<int:app_id>/logs/stream', methods=['GET'])
+@login_required
+def api_stream_python_app_logs(app_id):
+    """Stream Python application logs from the journal as server-sent events"""
+    if not HOSTING_ENABLED:
+        return jsonify({"error": "Hosting features not available"}), 400
+    
+    service_name = get_python_app_service(app_id)
+    if not service_name:
+        return jsonify({"error": "Service not found"}), 404
+    
+    lines = min(request.args.get('lines', 50, type=int), 1000)
+    pattern = compile_filter(request.args.get('grep'))
+    cursor = request.headers.get('Last-Event-ID') or request.args.get('cursor')
+    
+    return stream_response(stream_journal(service_name, lines, pattern, cursor))
+
 @app.route('/api/python/<int:app_id>/deploy', methods=['POST'])
 @login_required
 def api_deploy_python_app_update(app_id):
@@ -1235,26 +1503,19 @@ def api_python_bulk_action(action):
         return jsonify({"error": "Hosting features not available"}), 400
     
     data = request.get_json()
-    app_ids = data.get('app_ids', [])
+    app_ids = parse_id_list(data.get('app_ids', []))
     
+    if app_ids is None:
+        return jsonify({"error": "app_ids must be a list of numeric ids"}), 400
     if not app_ids:
         return jsonify({"error": "No applications selected"}), 400
     
-    success_count = 0
-    error_count = 0
+    if action not in SYSTEMCTL_ACTIONS:
+        return jsonify({"error": f"Invalid action '{action}'"}), 400
     
-    for app_id in app_ids:
-        try:
-            result = manage_python_app(app_id, action)
-            if result['success']:
-                success_count += 1
-            else:
-                error_count += 1
-        except Exception:
-            error_count += 1
-    
-    message = f"Action '{action}' completed: {success_count} successful, {error_count} failed"
-    return jsonify({"success": error_count == 0, "message": message})
+    # One systemctl call per batch of units instead of one per app
+    return submit_bulk_job('python', action, app_ids,
+                           batch_handler=lambda ids: manage_python_apps(ids, action))
 
 #########################################################################
 # Update System Functions
@@ -1336,47 +1597,129 @@ def check_for_updates():
             'last_checked': datetime.now().isoformat()
         }
 
+class UpdateChecker:
+    """In-memory update status, refreshed off the request path
+    
+    Pages read the cached status and never wait on the network. Once the
+    status is older than check_interval_hours the stale copy is still
+    served while a single background refresh runs (stale-while-revalidate).
+    A scheduler thread also refreshes on the interval, so the status is
+    usually current before anyone opens the dashboard.
+    """
+    
+    def __init__(self, status_file, poll_interval=300):
+        self.status_file = status_file
+        self.poll_interval = poll_interval
+        self._status = None
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self._thread = None
+        self._stop = threading.Event()
+    
+    def status(self):
+        """Return a copy of the cached status, loading the file on first use"""
+        if self._status is None:
+            status = {
+                'update_available': False,
+                'last_checked': None,
+                'current_version': UPDATE_CONFIG['current_version']
+            }
+            try:
+                if os.path.exists(self.status_file):
+                    with open(self.status_file, 'r') as f:
+                        status = json.load(f)
+            except:
+                pass
+            self._status = status
+        return dict(self._status)
+    
+    def save(self, status):
+        """Replace the cached status and persist it for the next process"""
+        self._status = dict(status)
+        try:
+            tmp_file = f"{self.status_file}.tmp"
+            with open(tmp_file, 'w') as f:
+                json.dump(status, f, indent=4)
+            os.replace(tmp_file, self.status_file)
+        except Exception as e:
+            logger.error(f"Error saving update status: {e}")
+    
+    def is_stale(self):
+        """Check if it's time to check for updates based on interval"""
+        if not UPDATE_CONFIG['auto_check_enabled']:
+            return False
+        
+        last_checked = self.status().get('last_checked')
+        if not last_checked:
+            return True
+        
+        try:
+            last_check_time = datetime.fromisoformat(last_checked.replace('Z', '+00:00'))
+            check_interval = timedelta(hours=UPDATE_CONFIG['check_interval_hours'])
+            return datetime.now() > last_check_time + check_interval
+        except:
+            return True
+    
+    def refresh(self):
+        """Check for updates now and cache the result"""
+        update_info = check_for_updates()
+        # Record the attempt even when an update was found or the check
+        # failed, so an offline node retries once per interval
+        update_info.setdefault('last_checked', datetime.now().isoformat())
+        self.save(update_info)
+        return update_info
+    
+    def refresh_async(self):
+        """Start a background refresh unless one is already running"""
+        with self._lock:
+            if self._refreshing:
+                return False
+            self._refreshing = True
+        
+        def run():
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"Error refreshing update status: {e}")
+            finally:
+                self._refreshing = False
+        
+        threading.Thread(target=run, name='update-check', daemon=True).start()
+        return True
+    
+    def start(self):
+        """Start the interval scheduler once per process"""
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name='update-scheduler', daemon=True)
+            self._thread.start()
+    
+    def stop(self):
+        self._stop.set()
+    
+    def _run(self):
+        while True:
+            if self.is_stale():
+                self.refresh_async()
+            if self._stop.wait(self.poll_interval):
+                return
+
+update_checker = UpdateChecker(os.path.join(API_DIR, '.update_status.json'))
+
 def get_update_status():
     """Get current update status and cached information"""
-    try:
-        update_file = os.path.join(API_DIR, '.update_status.json')
-        if os.path.exists(update_file):
-            with open(update_file, 'r') as f:
-                return json.load(f)
-    except:
-        pass
-    
-    return {
-        'update_available': False,
-        'last_checked': None,
-        'current_version': UPDATE_CONFIG['current_version']
-    }
+    return update_checker.status()
 
 def save_update_status(status):
     """Save update status to cache file"""
-    try:
-        update_file = os.path.join(API_DIR, '.update_status.json')
-        with open(update_file, 'w') as f:
-            json.dump(status, f, indent=4)
-    except Exception as e:
-        logger.error(f"Error saving update status: {e}")
+    update_checker.save(status)
 
 def should_check_updates():
     """Check if it's time to check for updates based on interval"""
-    status = get_update_status()
-    if not UPDATE_CONFIG['auto_check_enabled']:
-        return False
-    
-    last_checked = status.get('last_checked')
-    if not last_checked:
-        return True
-    
-    try:
-        last_check_time = datetime.fromisoformat(last_checked.replace('Z', '+00:00'))
-        check_interval = timedelta(hours=UPDATE_CONFIG['check_interval_hours'])
-        return datetime.now() > last_check_time + check_interval
-    except:
-        return True
+    return update_checker.is_stale()
 
 def perform_update():
     """Execute the update process using the update script"""
@@ -1441,14 +1784,19 @@ def get_update_notifications():
 # Update System Routes
 #########################################################################
 
+@app.before_request
+def start_update_scheduler():
+    """Start the background update check with the first request"""
+    if UPDATE_CONFIG['auto_check_enabled']:
+        update_checker.start()
+
 @app.route('/updates')
 @login_required
 def updates_page():
     """Updates management page"""
     if should_check_updates():
-        # Perform automatic check
-        update_info = check_for_updates()
-        save_update_status(update_info)
+        # Serve the cached status; the check runs in the background
+        update_checker.refresh_async()
     
     status = get_update_status()
     return render_template('updates.html', 
@@ -1461,8 +1809,7 @@ def updates_page():
 def api_check_updates():
     """Manually check for updates"""
     try:
-        update_info = check_for_updates()
-        save_update_status(update_info)
+        update_info = update_checker.refresh()
         return jsonify({
             'success': True,
             'data': update_info
@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+"""
+LOMP Stack v3.0 - Application Metrics Collector
+Per-application CPU, memory and IO metrics from cgroup v2 and /proc
+
+Author: Silviu Ilie <neosilviu@gmail.com>
+Company: aemdPC
+Version: 3.0.0
+Copyright © 2025 aemdPC. All rights reserved.
+License: MIT License
+
+Repository: https://github.com/aemdPC/lomp-stack-v3
+Documentation: https://docs.aemdpc.com/lomp-stack
+Support: https://support.aemdpc.com
+"""
+
+import os
+import time
+import threading
+import logging
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+CLK_TCK = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+# Document roots are walked for disk usage only every Nth sample
+DISK_USAGE_EVERY = 12
+
+#########################################################################
+# cgroup and /proc readers
+#########################################################################
+
+def find_cgroup_root(candidates=('/sys/fs/cgroup', '/sys/fs/cgroup/unified')) -> Optional[str]:
+    """Return the cgroup v2 mount point, or None on cgroup v1 only hosts"""
+    for path in candidates:
+        if os.path.exists(os.path.join(path, 'cgroup.controllers')) or \
+                os.path.exists(os.path.join(path, 'system.slice', 'cgroup.procs')):
+            return path
+    return None
+
+def read_int(path: str) -> Optional[int]:
+    try:
+        with open(path, 'r') as f:
+            return int(f.read().split()[0])
+    except (OSError, ValueError, IndexError):
+        return None
+
+def read_cgroup_pids(cgroup_dir: str) -> List[int]:
+    """All pids in a cgroup, including its child cgroups"""
+    pids = []
+    for root, _, files in os.walk(cgroup_dir):
+        if 'cgroup.procs' not in files:
+            continue
+        try:
+            with open(os.path.join(root, 'cgroup.procs'), 'r') as f:
+                pids.extend(int(line) for line in f if line.strip())
+        except (OSError, ValueError):
+            continue
+    return pids
+
+def read_cgroup_stats(cgroup_dir: str) -> Dict:
+    """CPU time, memory and IO totals kept by the kernel for a cgroup"""
+    stats = {'cpu_usec': None, 'memory_bytes': read_int(os.path.join(cgroup_dir, 'memory.current')),
+             'io_read_bytes': None, 'io_write_bytes': None}
+    try:
+        with open(os.path.join(cgroup_dir, 'cpu.stat'), 'r') as f:
+            for line in f:
+                name, value = line.split()
+                if name == 'usage_usec':
+                    stats['cpu_usec'] = int(value)
+                    break
+    except (OSError, ValueError):
+        pass
+
+    try:
+        read_bytes = write_bytes = 0
+        with open(os.path.join(cgroup_dir, 'io.stat'), 'r') as f:
+            for line in f:
+                for field in line.split()[1:]:
+                    name, _, value = field.partition('=')
+                    if name == 'rbytes':
+                        read_bytes += int(value)
+                    elif name == 'wbytes':
+                        write_bytes += int(value)
+        stats['io_read_bytes'] = read_bytes
+        stats['io_write_bytes'] = write_bytes
+    except (OSError, ValueError):
+        pass
+    return stats
+
+def read_process(pid: int, proc_root: str = '/proc') -> Optional[Dict]:
+    """CPU ticks, RSS, start time and IO for one process"""
+    base = os.path.join(proc_root, str(pid))
+    try:
+        with open(os.path.join(base, 'stat'), 'r') as f:
+            # The command name may contain spaces; fields resume after ')'
+            fields = f.read().rpartition(')')[2].split()
+        with open(os.path.join(base, 'statm'), 'r') as f:
+            rss_pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+
+    process = {
+        'cpu_ticks': int(fields[11]) + int(fields[12]),
+        'start_ticks': int(fields[19]),
+        'rss_bytes': rss_pages * PAGE_SIZE,
+        'io_read_bytes': 0,
+        'io_write_bytes': 0
+    }
+    try:
+        with open(os.path.join(base, 'io'), 'r') as f:
+            for line in f:
+                name, _, value = line.partition(':')
+                if name == 'read_bytes':
+                    process['io_read_bytes'] = int(value)
+                elif name == 'write_bytes':
+                    process['io_write_bytes'] = int(value)
+    except (OSError, ValueError):
+        # /proc/<pid>/io is only readable by the process owner or root
+        pass
+    return process
+
+def scan_unit_pids(units: List[str], proc_root: str = '/proc') -> Dict[str, List[int]]:
+    """Map systemd units to their pids with one pass over /proc/*/cgroup
+
+    Used when the unit has no cgroup v2 directory, e.g. on cgroup v1 hosts.
+    """
+    wanted = {f'/{unit}': unit for unit in units}
+    found = {unit: [] for unit in units}
+    try:
+        entries = os.listdir(proc_root)
+    except OSError:
+        return found
+
+    for entry in entries:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(os.path.join(proc_root, entry, 'cgroup'), 'r') as f:
+                content = f.read()
+        except OSError:
+            continue
+        for line in content.splitlines():
+            path = line.rpartition(':')[2]
+            for suffix, unit in wanted.items():
+                if path.endswith(suffix) or f'{suffix}/' in path:
+                    found[unit].append(int(entry))
+                    break
+            else:
+                continue
+            break
+    return found
+
+def directory_size(path: str) -> int:
+    """Bytes used by files below path"""
+    total = 0
+    stack = [path]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        elif entry.is_file(follow_symlinks=False):
+                            total += entry.stat(follow_symlinks=False).st_blocks * 512
+                    except OSError:
+                        continue
+        except OSError:
+            continue
+    return total
+
+def read_boot_time(proc_root: str = '/proc') -> float:
+    try:
+        with open(os.path.join(proc_root, 'stat'), 'r') as f:
+            for line in f:
+                if line.startswith('btime'):
+                    return float(line.split()[1])
+    except (OSError, ValueError):
+        pass
+    return time.time()
+
+def format_uptime(seconds: float) -> str:
+    seconds = int(seconds)
+    days, seconds = divmod(seconds, 86400)
+    hours, seconds = divmod(seconds, 3600)
+    minutes, seconds = divmod(seconds, 60)
+    if days:
+        return f'{days} days {hours} hours'
+    if hours:
+        return f'{hours} hours {minutes} minutes'
+    if minutes:
+        return f'{minutes} minutes'
+    return f'{seconds} seconds'
+
+#########################################################################
+# Collector
+#########################################################################
+
+class AppMetricsCollector:
+    """Samples every registered application from one background loop
+
+    Each app is identified by its systemd unit. Workers are found through
+    the unit's cgroup, so gunicorn/uvicorn worker processes are summed
+    into one figure per app. CPU percentages come from the difference
+    between two samples. Sampling only happens on the background thread;
+    registering a new app wakes it so the first figures arrive promptly.
+    """
+
+    def __init__(self, interval: float = 5.0, proc_root: str = '/proc',
+                 cgroup_root: Optional[str] = None, idle_timeout: float = 600):
+        self.interval = interval
+        self.proc_root = proc_root
+        self.cgroup_root = cgroup_root if cgroup_root is not None else find_cgroup_root()
+        self.idle_timeout = idle_timeout
+        self.boot_time = read_boot_time(proc_root)
+        try:
+            with open(os.path.join(proc_root, 'meminfo'), 'r') as f:
+                self.mem_total = int(f.readline().split()[1]) * 1024
+        except (OSError, ValueError, IndexError):
+            self.mem_total = 0
+
+        self._apps: Dict[str, Dict] = {}
+        self._metrics: Dict[str, Dict] = {}
+        self._previous: Dict[str, Tuple[float, float]] = {}
+        self._disk: Dict[str, int] = {}
+        self._samples = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def register(self, key: str, unit: str, document_root: Optional[str] = None) -> None:
+        """Start tracking an app; `unit` is its systemd unit name"""
+        if not unit.endswith('.service'):
+            unit = f'{unit}.service'
+        with self._lock:
+            app = self._apps.get(key)
+            if app is None or app['unit'] != unit:
+                self._apps[key] = {'unit': unit, 'document_root': document_root}
+                self._previous.pop(key, None)
+                self._wake.set()
+            self._apps[key]['last_read'] = time.time()
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Latest metrics for an app, or None before its first sample"""
+        with self._lock:
+            if key in self._apps:
+                self._apps[key]['last_read'] = time.time()
+            return self._metrics.get(key)
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name='app-metrics', daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval)
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            try:
+                self.sample()
+            except Exception as e:
+                logger.error(f"Error sampling application metrics: {str(e)}")
+
+    def _unit_cgroup(self, unit: str) -> Optional[str]:
+        if not self.cgroup_root:
+            return None
+        path = os.path.join(self.cgroup_root, 'system.slice', unit)
+        return path if os.path.isdir(path) else None
+
+    def sample(self) -> None:
+        """Collect metrics for every registered app"""
+        now = time.time()
+        with self._lock:
+            # Forget apps nobody has looked at for a while
+            for key in [k for k, app in self._apps.items() if now - app['last_read'] > self.idle_timeout]:
+                del self._apps[key]
+                self._metrics.pop(key, None)
+                self._previous.pop(key, None)
+                self._disk.pop(key, None)
+            apps = {key: dict(app) for key, app in self._apps.items()}
+            previous = dict(self._previous)
+            self._samples += 1
+            refresh_disk = self._samples % DISK_USAGE_EVERY == 1
+
+        cgroups = {key: self._unit_cgroup(app['unit']) for key, app in apps.items()}
+        missing = [app['unit'] for key, app in apps.items() if cgroups[key] is None]
+        scanned = scan_unit_pids(missing, self.proc_root) if missing else {}
+
+        metrics = {}
+        cpu_totals = {}
+        for key, app in apps.items():
+            cgroup_dir = cgroups[key]
+            if cgroup_dir:
+                pids = read_cgroup_pids(cgroup_dir)
+                totals = read_cgroup_stats(cgroup_dir)
+            else:
+                pids = scanned.get(app['unit'], [])
+                totals = {}
+
+            metrics[key], cpu_totals[key] = self._build_metrics(
+                key, app, pids, totals, now, previous.get(key), refresh_disk)
+
+        with self._lock:
+            # Skip apps removed or re-registered under another unit meanwhile
+            for key, app in apps.items():
+                current = self._apps.get(key)
+                if current is None or current['unit'] != app['unit']:
+                    continue
+                self._metrics[key] = metrics[key]
+                self._previous[key] = (now, cpu_totals[key])
+
+    def _build_metrics(self, key: str, app: Dict, pids: List[int], totals: Dict, now: float,
+                       previous: Optional[Tuple[float, float]], refresh_disk: bool) -> Tuple[Dict, float]:
+        processes = [p for p in (read_process(pid, self.proc_root) for pid in pids) if p]
+
+        cpu_seconds = sum(p['cpu_ticks'] for p in processes) / CLK_TCK
+        if totals.get('cpu_usec') is not None:
+            cpu_seconds = totals['cpu_usec'] / 1e6
+
+        rss = sum(p['rss_bytes'] for p in processes)
+        memory_bytes = totals.get('memory_bytes') or rss
+        io_read = totals.get('io_read_bytes')
+        io_write = totals.get('io_write_bytes')
+        if io_read is None:
+            io_read = sum(p['io_read_bytes'] for p in processes)
+            io_write = sum(p['io_write_bytes'] for p in processes)
+
+        cpu_percent = 0.0
+        if previous and now > previous[0] and cpu_seconds >= previous[1]:
+            cpu_percent = round((cpu_seconds - previous[1]) * 100.0 / (now - previous[0]), 1)
+
+        uptime = '0 seconds'
+        if processes:
+            started = self.boot_time + min(p['start_ticks'] for p in processes) / CLK_TCK
+            uptime = format_uptime(now - started)
+
+        # _disk is only touched from the sampling thread
+        document_root = app.get('document_root')
+        if document_root and (refresh_disk or key not in self._disk):
+            self._disk[key] = directory_size(document_root)
+
+        return {
+            'status': 'active' if processes else 'inactive',
+            'cpu_usage': cpu_percent,
+            'memory_usage': round(memory_bytes * 100.0 / self.mem_total, 1) if self.mem_total else 0,
+            'memory_bytes': memory_bytes,
+            'rss_bytes': rss,
+            'disk_usage': self._disk.get(key, 0),
+            'io_read_bytes': io_read,
+            'io_write_bytes': io_write,
+            'workers': len(processes),
+            'pids': [pid for pid in pids],
+            'uptime': uptime,
+            'sampled_at': now
+        }, cpu_seconds
@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+LOMP Stack v3.0 - Application Response Prober
+Background health probes and rolling latency histograms for Python apps
+
+Author: Silviu Ilie <neosilviu@gmail.com>
+Company: aemdPC
+Version: 3.0.0
+Copyright © 2025 aemdPC. All rights reserved.
+License: MIT License
+
+Repository: https://github.com/aemdPC/lomp-stack-v3
+Documentation: https://docs.aemdpc.com/lomp-stack
+Support: https://support.aemdpc.com
+"""
+
+import time
+import threading
+import logging
+import http.client
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Health route generated for Flask and FastAPI apps by create_python_app
+PROBE_PATH = '/api/health'
+
+#########################################################################
+# Latency Histogram
+#########################################################################
+
+SUB_BUCKET_BITS = 5
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+MAX_LATENCY_US = 60 * 1000 * 1000
+
+def bucket_index(value: int) -> int:
+    """Log-linear bucket for a latency in microseconds (about 3% precision)"""
+    value = max(0, min(int(value), MAX_LATENCY_US))
+    if value < SUB_BUCKETS * 2:
+        return value
+    shift = value.bit_length() - SUB_BUCKET_BITS - 1
+    return SUB_BUCKETS * shift + (value >> shift)
+
+def bucket_value(index: int) -> int:
+    """Midpoint of a bucket, in microseconds"""
+    if index < SUB_BUCKETS * 2:
+        return index
+    shift = index // SUB_BUCKETS - 1
+    mantissa = index - SUB_BUCKETS * shift
+    return (mantissa << shift) + (1 << shift) // 2
+
+BUCKET_COUNT = bucket_index(MAX_LATENCY_US) + 1
+
+class LatencyHistogram:
+    """HDR-style histogram: fixed memory, constant-time record"""
+
+    def __init__(self):
+        self.counts = [0] * BUCKET_COUNT
+        self.total = 0
+
+    def record(self, latency_us: int) -> None:
+        self.counts[bucket_index(latency_us)] += 1
+        self.total += 1
+
+    def merge(self, other: 'LatencyHistogram') -> None:
+        for i, count in enumerate(other.counts):
+            if count:
+                self.counts[i] += count
+        self.total += other.total
+
+    def percentiles(self, quantiles=(50, 95, 99)) -> Dict[str, float]:
+        """Latency in milliseconds at each quantile, e.g. {'p50': 1.2, ...}"""
+        result = {f'p{q}': 0.0 for q in quantiles}
+        if not self.total:
+            return result
+        targets = sorted((max(1, -(-self.total * q // 100)), q) for q in quantiles)
+        seen = 0
+        position = 0
+        for i, count in enumerate(self.counts):
+            if not count:
+                continue
+            seen += count
+            while position < len(targets) and seen >= targets[position][0]:
+                result[f'p{targets[position][1]}'] = round(bucket_value(i) / 1000.0, 2)
+                position += 1
+            if position == len(targets):
+                break
+        return result
+
+class RollingHistogram:
+    """Ring of per-interval histograms covering the last `windows * window_seconds`"""
+
+    def __init__(self, windows: int = 10, window_seconds: float = 60):
+        self.window_seconds = window_seconds
+        self.slots = [LatencyHistogram() for _ in range(windows)]
+        self.slot_times = [0] * windows
+        self.errors = 0
+
+    def _slot(self, now: float) -> LatencyHistogram:
+        tick = int(now // self.window_seconds)
+        index = tick % len(self.slots)
+        if self.slot_times[index] != tick:
+            self.slots[index] = LatencyHistogram()
+            self.slot_times[index] = tick
+        return self.slots[index]
+
+    def record(self, latency_us: int, now: Optional[float] = None) -> None:
+        self._slot(now if now is not None else time.time()).record(latency_us)
+
+    def snapshot(self, now: Optional[float] = None) -> LatencyHistogram:
+        """Merged histogram of the slots still inside the window"""
+        tick = int((now if now is not None else time.time()) // self.window_seconds)
+        merged = LatencyHistogram()
+        for slot, slot_tick in zip(self.slots, self.slot_times):
+            if tick - slot_tick < len(self.slots):
+                merged.merge(slot)
+        return merged
+
+#########################################################################
+# Prober
+#########################################################################
+
+def probe_http(port: int, path: str = PROBE_PATH, timeout: float = 2.0, host: str = '127.0.0.1'):
+    """Time one GET against a local app; returns (latency_us, status) or (None, error)"""
+    start = time.perf_counter()
+    conn = http.client.HTTPConnection(host, port, timeout=timeout)
+    try:
+        conn.request('GET', path, headers={'User-Agent': 'LOMP-Prober/3.0', 'Connection': 'close'})
+        response = conn.getresponse()
+        response.read()
+        return int((time.perf_counter() - start) * 1000000), response.status
+    except (OSError, http.client.HTTPException) as e:
+        return None, str(e)
+    finally:
+        conn.close()
+
+class ResponseProber:
+    """Probes every registered app's local port concurrently on a fixed interval
+
+    Latencies go into a rolling histogram per app. mark_deploy() stores the
+    current tail latency as a baseline; once enough probes have run against
+    the new release, an app whose p95 or p99 grew past `regression_ratio`
+    (and by at least `regression_min_ms`) is flagged as regressed.
+    """
+
+    def __init__(self, interval: float = 10.0, timeout: float = 2.0, workers: int = 16,
+                 min_samples: int = 20, regression_ratio: float = 1.5,
+                 regression_min_ms: float = 20.0):
+        self.interval = interval
+        self.timeout = timeout
+        self.workers = workers
+        self.min_samples = min_samples
+        self.regression_ratio = regression_ratio
+        self.regression_min_ms = regression_min_ms
+
+        self._apps: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._executor = None
+
+    def register(self, key, port: int, path: str = PROBE_PATH) -> None:
+        """Start probing an app; re-registering with a new port resets its history"""
+        with self._lock:
+            app = self._apps.get(key)
+            if app is None or app['port'] != port or app['path'] != path:
+                self._apps[key] = {
+                    'port': port, 'path': path, 'histogram': RollingHistogram(),
+                    'baseline': None, 'deployed_at': None, 'regression': None,
+                    'last_status': None, 'last_probe': None
+                }
+
+    def unregister(self, key) -> None:
+        with self._lock:
+            self._apps.pop(key, None)
+
+    def mark_deploy(self, key) -> None:
+        """Record pre-deploy tail latency and start a fresh window for the new release"""
+        with self._lock:
+            app = self._apps.get(key)
+            if app is None:
+                return
+            before = app['histogram'].snapshot()
+            app['baseline'] = before.percentiles() if before.total >= self.min_samples else None
+            app['histogram'] = RollingHistogram()
+            app['deployed_at'] = time.time()
+            app['regression'] = None
+
+    def get(self, key) -> Optional[Dict]:
+        """Latency summary for an app, or None if it is not registered"""
+        with self._lock:
+            app = self._apps.get(key)
+            if app is None:
+                return None
+            histogram = app['histogram'].snapshot()
+            return {
+                **histogram.percentiles(),
+                'samples': histogram.total,
+                'errors': app['histogram'].errors,
+                'window_seconds': len(app['histogram'].slots) * app['histogram'].window_seconds,
+                'last_status': app['last_status'],
+                'last_probe': app['last_probe'],
+                'baseline': app['baseline'],
+                'deployed_at': app['deployed_at'],
+                'regression': app['regression']
+            }
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='app-probe')
+            self._thread = threading.Thread(target=self._run, name='app-prober', daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + self.timeout)
+            self._thread = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.probe_all()
+            except Exception as e:
+                logger.error(f"Error probing applications: {str(e)}")
+            self._stop.wait(self.interval)
+
+    def probe_all(self) -> None:
+        """Probe every registered app once, all in parallel"""
+        with self._lock:
+            targets = [(key, app['port'], app['path']) for key, app in self._apps.items()]
+        if not targets:
+            return
+
+        executor = self._executor or ThreadPoolExecutor(max_workers=self.workers)
+        futures = [(key, executor.submit(probe_http, port, path, self.timeout)) for key, port, path in targets]
+        results = [(key, future.result()) for key, future in futures]
+        if executor is not self._executor:
+            executor.shutdown()
+
+        now = time.time()
+        with self._lock:
+            for key, (latency_us, status) in results:
+                app = self._apps.get(key)
+                if app is None:
+                    continue
+                app['last_status'] = status
+                app['last_probe'] = now
+                if latency_us is None or status >= 500:
+                    app['histogram'].errors += 1
+                if latency_us is not None:
+                    app['histogram'].record(latency_us, now)
+                self._check_regression(app)
+
+    def _check_regression(self, app: Dict) -> None:
+        baseline = app['baseline']
+        if not baseline or app['regression']:
+            return
+        histogram = app['histogram'].snapshot()
+        if histogram.total < self.min_samples:
+            return
+        current = histogram.percentiles()
+        for quantile in ('p95', 'p99'):
+            before, after = baseline[quantile], current[quantile]
+            if after > before * self.regression_ratio and after - before >= self.regression_min_ms:
+                app['regression'] = {
+                    'percentile': quantile,
+                    'before_ms': before,
+                    'after_ms': after,
+                    'ratio': round(after / before, 2) if before else None,
+                    'detected_at': time.time()
+                }
+                logger.warning(f"Tail latency regression after deploy on port {app['port']}: "
+                               f"{quantile} {before}ms -> {after}ms")
+                return
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+LOMP Stack v3.0 - Hosting Database Benchmark
+Compares get_all_sites with a connection per call and with the shared SQLitePool
+
+Author: Silviu Ilie <neosilviu@gmail.com>
+Company: aemdPC
+Version: 3.0.0
+Copyright © 2025 aemdPC. All rights reserved.
+License: MIT License
+
+Repository: https://github.com/aemdPC/lomp-stack-v3
+Documentation: https://docs.aemdpc.com/lomp-stack
+Support: https://support.aemdpc.com
+"""
+
+import os
+import sys
+import time
+import shutil
+import sqlite3
+import tempfile
+import multiprocessing
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import hosting_management
+from db_pool import SQLitePool
+
+SITE_ROWS = 10000
+ITERATIONS = 20
+IDLE_ROUNDS = 5
+
+def populate(db_path):
+    """Create the sites schema in rollback-journal mode and insert SITE_ROWS rows"""
+    conn = sqlite3.connect(db_path)
+    hosting_management._create_sites_tables(conn)
+    conn.executemany('''
+        INSERT INTO sites (domain, subdomain, document_root, php_version, web_server,
+                           wp_installed, status)
+        VALUES (?, ?, ?, '8.1', 'ols', ?, 'active')
+    ''', [(f'site{i}.example.com', None, f'/var/www/site{i}.example.com', i % 2)
+          for i in range(SITE_ROWS)])
+    conn.commit()
+    conn.close()
+
+def legacy_get_all_sites(db_path):
+    """get_all_sites with a connection opened and closed per call, as before the pool
+
+    Same query and row building as hosting_management.get_all_sites, so the
+    two cases differ only in connection handling.
+    """
+    conn = sqlite3.connect(db_path)
+    try:
+        rows = conn.execute(f'''
+            SELECT {hosting_management.SITE_COLUMNS}
+            FROM sites ORDER BY created_at DESC, id DESC
+        ''').fetchall()
+    finally:
+        conn.close()
+    return [hosting_management._site_from_row(row) for row in rows]
+
+def run_writer(db_path, stop, pooled, commits):
+    """Keep updating one site's bandwidth counter, as a stats job would"""
+    if pooled:
+        pool = SQLitePool(db_path)
+        while not stop.is_set():
+            with pool.transaction() as conn:
+                conn.execute('UPDATE sites SET bandwidth_used = bandwidth_used + 1 WHERE id = 1')
+            commits.value += 1
+        pool.close_all()
+    else:
+        conn = sqlite3.connect(db_path, timeout=30)
+        while not stop.is_set():
+            conn.execute('UPDATE sites SET bandwidth_used = bandwidth_used + 1 WHERE id = 1')
+            conn.commit()
+            commits.value += 1
+        conn.close()
+
+def measure(func, iterations=ITERATIONS):
+    """Return (mean ms, median ms, worst ms, failed calls) for `iterations` calls of func()
+
+    One untimed call comes first, so opening the connection and warming the
+    page cache are not counted as per-call cost.
+    """
+    try:
+        func()
+    except sqlite3.OperationalError:
+        pass
+    timings = []
+    failures = 0
+    for _ in range(iterations):
+        start = time.perf_counter()
+        try:
+            sites = func()
+            assert len(sites) == SITE_ROWS
+        except sqlite3.OperationalError:
+            # "database is locked": the reader gave up waiting on the writer
+            failures += 1
+        timings.append((time.perf_counter() - start) * 1000)
+    timings_sorted = sorted(timings)
+    return sum(timings) / len(timings), timings_sorted[len(timings) // 2], max(timings), failures
+
+def run_benchmark():
+    print("LOMP Stack v3.0 - Hosting Database Benchmark")
+    print("=" * 60)
+    print(f"get_all_sites over {SITE_ROWS} rows, {ITERATIONS} calls per case")
+
+    work_dir = tempfile.mkdtemp(prefix='lomp_db_bench_')
+    try:
+        legacy_path = os.path.join(work_dir, 'legacy_sites.db')
+        pooled_path = os.path.join(work_dir, 'pooled_sites.db')
+        populate(legacy_path)
+        populate(pooled_path)
+
+        hosting_management.sites_db = SQLitePool(pooled_path)
+        cases = [
+            ('connect per call', legacy_path, False, lambda: legacy_get_all_sites(legacy_path)),
+            ('SQLitePool (WAL)', pooled_path, True, hosting_management.get_all_sites)
+        ]
+
+        # Idle runs alternate between the cases, so drift in machine load hits both alike
+        idle = {label: [] for label, _, _, _ in cases}
+        for _ in range(IDLE_ROUNDS):
+            for label, _, _, func in cases:
+                _, median, _, _ = measure(func)
+                idle[label].append(median)
+
+        print(f"{'':<18} {'idle med':>10} {'busy mean':>10} {'busy max':>10} {'failed':>7} {'writes/s':>9}")
+        for label, db_path, pooled, func in cases:
+            idle_median = sorted(idle[label])[IDLE_ROUNDS // 2]
+
+            # Separate process, so the writer does not compete for the GIL
+            stop = multiprocessing.Event()
+            commits = multiprocessing.Value('i', 0)
+            writer = multiprocessing.Process(target=run_writer, args=(db_path, stop, pooled, commits))
+            writer.start()
+            time.sleep(0.2)
+            start_commits = commits.value
+            start = time.perf_counter()
+            busy_mean, _, busy_max, failures = measure(func)
+            write_rate = (commits.value - start_commits) / (time.perf_counter() - start)
+            stop.set()
+            writer.join()
+
+            print(f"{label:<18} {idle_median:8.2f}ms {busy_mean:8.2f}ms {busy_max:8.2f}ms "
+                  f"{failures:>4}/{ITERATIONS} {write_rate:9.0f}")
+        print(f"idle med = median of {IDLE_ROUNDS} alternating rounds of {ITERATIONS} calls")
+        print("busy = while another process commits single-row updates in a loop")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+if __name__ == '__main__':
+    run_benchmark()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+LOMP Stack v3.0 - Helper Script Worker Pool Benchmark
+Compares helper function calls through pooled bash workers with a bash process per call
+
+Author: Silviu Ilie <neosilviu@gmail.com>
+Company: aemdPC
+Version: 3.0.0
+Copyright © 2025 aemdPC. All rights reserved.
+License: MIT License
+
+Repository: https://github.com/aemdPC/lomp-stack-v3
+Documentation: https://docs.aemdpc.com/lomp-stack
+Support: https://support.aemdpc.com
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from helper_pool import BashWorkerPool
+
+STACK_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+CALLS = 200
+THREADS = 4
+
+# Same preamble as the shipped helpers (web_actions.sh, wp_helpers.sh, ...)
+BENCH_HELPER = '''#!/bin/bash
+SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
+source "$SCRIPT_DIR/../utils/dependency_manager.sh"
+source "$SCRIPT_DIR/../utils/error_handler.sh"
+setup_error_handlers
+source_stack_helper "functions"
+source_stack_helper "lang"
+
+vhost_status() {
+  local domain="$1"
+  echo "vhost $domain ok"
+}
+'''
+
+def make_helper(work_dir):
+    """A helper script in a tree laid out like STACK_ROOT/helpers"""
+    helpers = os.path.join(work_dir, 'helpers')
+    os.makedirs(os.path.join(helpers, 'bench'))
+    os.symlink(os.path.join(STACK_ROOT, 'helpers', 'utils'), os.path.join(helpers, 'utils'))
+    script = os.path.join(helpers, 'bench', 'bench_helpers.sh')
+    with open(script, 'w') as f:
+        f.write(BENCH_HELPER)
+    return script
+
+def fork_call(script, work_dir, domain):
+    """One bash per call: source the helper and its dependencies, then call the function"""
+    result = subprocess.run(['bash', '-c', 'source "$0"; "$@"', script, 'vhost_status', domain],
+                            capture_output=True, text=True, cwd=work_dir)
+    return result.stdout
+
+def run_calls(call, threads):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        outputs = list(executor.map(call, [f"site{i}.example.com" for i in range(CALLS)]))
+    elapsed = time.perf_counter() - start
+    assert all(output.splitlines()[0] == f"vhost site{i}.example.com ok" for i, output in enumerate(outputs)), outputs[:3]
+    return CALLS / elapsed
+
+def run_benchmark():
+    print("LOMP Stack v3.0 - Helper Script Worker Pool Benchmark")
+    print("=" * 60)
+    print(f"{CALLS} calls of a helper function that sources functions.sh and lang.sh")
+
+    work_dir = tempfile.mkdtemp(prefix='lomp_helper_bench_')
+    pool = BashWorkerPool(work_dir, size=THREADS)
+    try:
+        script = make_helper(work_dir)
+        pooled = lambda domain: pool.call(script, ['vhost_status', domain])['stdout']
+        forked = lambda domain: fork_call(script, work_dir, domain)
+
+        for threads in (1, THREADS):
+            fork_rate = run_calls(forked, threads)
+            pool_rate = run_calls(pooled, threads)
+            print(f"{threads} thread(s): fork per call {fork_rate:8.1f} calls/s   "
+                  f"pooled workers {pool_rate:8.1f} calls/s   ({pool_rate / fork_rate:.1f}x)")
+    finally:
+        pool.close()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+if __name__ == '__main__':
+    run_benchmark()
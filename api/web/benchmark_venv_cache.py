@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+LOMP Stack v3.0 - Python Environment Provisioning Benchmark
+Compares a fresh venv + pip install per app with cloning a prebuilt template
+
+Author: Silviu Ilie <neosilviu@gmail.com>
+Company: aemdPC
+Version: 3.0.0
+Copyright © 2025 aemdPC. All rights reserved.
+License: MIT License
+
+Repository: https://github.com/aemdPC/lomp-stack-v3
+Documentation: https://docs.aemdpc.com/lomp-stack
+Support: https://support.aemdpc.com
+"""
+
+import os
+import sys
+import time
+import shutil
+import zipfile
+import hashlib
+import base64
+import tempfile
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from venv_cache import VenvTemplateCache
+
+APPS = 5
+PACKAGES = 4
+MODULES_PER_PACKAGE = 150
+
+def _record_hash(data):
+    digest = base64.urlsafe_b64encode(hashlib.sha256(data).digest()).rstrip(b'=').decode()
+    return f'sha256={digest},{len(data)}'
+
+def build_wheel(wheelhouse, name, version='1.0.0'):
+    """Write a pure-Python wheel with MODULES_PER_PACKAGE modules and a console script"""
+    dist_info = f'{name}-{version}.dist-info'
+    files = {f'{name}/__init__.py': b'VERSION = "1.0.0"\n\ndef main():\n    return 0\n'}
+    for i in range(MODULES_PER_PACKAGE):
+        files[f'{name}/module_{i}.py'] = (f'def handler_{i}(request):\n    return {i}\n' * 20).encode()
+    files[f'{dist_info}/METADATA'] = f'Metadata-Version: 2.1\nName: {name}\nVersion: {version}\n'.encode()
+    files[f'{dist_info}/WHEEL'] = b'Wheel-Version: 1.0\nGenerator: lomp-bench\nRoot-Is-Purelib: true\nTag: py3-none-any\n'
+    files[f'{dist_info}/entry_points.txt'] = f'[console_scripts]\n{name}-serve = {name}:main\n'.encode()
+    record = ''.join(f'{path},{_record_hash(data)}\n' for path, data in files.items())
+    files[f'{dist_info}/RECORD'] = (record + f'{dist_info}/RECORD,,\n').encode()
+
+    with zipfile.ZipFile(os.path.join(wheelhouse, f'{name}-{version}-py3-none-any.whl'), 'w') as wheel:
+        for path, data in files.items():
+            wheel.writestr(path, data)
+    return f'{name}=={version}'
+
+def legacy_provision(venv_path, requirements_file, wheelhouse):
+    """Original flow: new venv, then pip install (here from local wheels, not the index)"""
+    subprocess.run([sys.executable, '-m', 'venv', venv_path], check=True, capture_output=True)
+    subprocess.run([os.path.join(venv_path, 'bin', 'pip'), 'install', '--disable-pip-version-check',
+                    '--no-index', '--find-links', wheelhouse, '-r', requirements_file],
+                   check=True, capture_output=True)
+
+def disk_usage(path):
+    """Bytes allocated below path, counting hardlinked files once"""
+    seen = set()
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            st = os.lstat(os.path.join(root, name))
+            if (st.st_dev, st.st_ino) not in seen:
+                seen.add((st.st_dev, st.st_ino))
+                total += st.st_blocks * 512
+    return total
+
+def check_venv(venv_path):
+    subprocess.run([os.path.join(venv_path, 'bin', 'python'), '-c', 'import pkg0.module_1'], check=True)
+    subprocess.run([os.path.join(venv_path, 'bin', 'pkg0-serve')], check=True)
+
+def run_benchmark():
+    print("LOMP Stack v3.0 - Python Environment Provisioning Benchmark")
+    print("=" * 60)
+    print(f"{APPS} apps, {PACKAGES} packages x {MODULES_PER_PACKAGE} modules from a local wheelhouse")
+
+    work_dir = tempfile.mkdtemp(prefix='lomp_venv_bench_')
+    try:
+        wheelhouse = os.path.join(work_dir, 'cache', 'wheelhouse')
+        os.makedirs(wheelhouse)
+        requirements = '\n'.join(build_wheel(wheelhouse, f'pkg{i}') for i in range(PACKAGES)) + '\n'
+        requirements_file = os.path.join(work_dir, 'requirements.txt')
+        with open(requirements_file, 'w') as f:
+            f.write(requirements)
+
+        legacy_dir = os.path.join(work_dir, 'legacy')
+        start = time.perf_counter()
+        for i in range(APPS):
+            legacy_provision(os.path.join(legacy_dir, f'app{i}', 'venv'), requirements_file, wheelhouse)
+        legacy_time = time.perf_counter() - start
+        check_venv(os.path.join(legacy_dir, 'app0', 'venv'))
+
+        cache = VenvTemplateCache(os.path.join(work_dir, 'cache'), python=sys.executable)
+        cloned_dir = os.path.join(work_dir, 'cloned')
+        start = time.perf_counter()
+        first = cache.provision(os.path.join(cloned_dir, 'app0', 'venv'), 'bench', requirements)
+        build_time = time.perf_counter() - start
+        assert first['success'], first['message']
+        for i in range(1, APPS):
+            result = cache.provision(os.path.join(cloned_dir, f'app{i}', 'venv'), 'bench', requirements)
+            assert result['success'], result['message']
+        cloned_time = time.perf_counter() - start
+        check_venv(os.path.join(cloned_dir, f'app{APPS - 1}', 'venv'))
+
+        print(f"venv + pip install:  {legacy_time:6.2f}s  {legacy_time / APPS:5.2f}s per app  "
+              f"{disk_usage(legacy_dir) / 2**20:6.1f} MiB")
+        print(f"template clone:      {cloned_time:6.2f}s  {(cloned_time - build_time) / (APPS - 1):5.2f}s per app "
+              f"after a {build_time:.2f}s template build ({first['mode']})  "
+              f"{disk_usage(cloned_dir) / 2**20:6.1f} MiB")
+        print("Against the package index the first column also pays download and build time for every app.")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+if __name__ == '__main__':
+    run_benchmark()
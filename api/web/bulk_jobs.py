@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+LOMP Stack v3.0 - Bulk Job Runner
+Runs bulk site, domain and application actions in the background
+
+Author: Silviu Ilie <neosilviu@gmail.com>
+Company: aemdPC
+Version: 3.0.0
+Copyright © 2025 aemdPC. All rights reserved.
+License: MIT License
+
+Repository: https://github.com/aemdPC/lomp-stack-v3
+Documentation: https://docs.aemdpc.com/lomp-stack
+Support: https://support.aemdpc.com
+"""
+
+import time
+import uuid
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+#########################################################################
+# Bulk Job
+#########################################################################
+
+class BulkJob:
+    """Progress and per-item results of one bulk action
+
+    Every finished item appends an event; clients read events from an
+    index onwards, so polling and streaming both resume where they left off.
+    """
+
+    def __init__(self, kind: str, action: str, items: Sequence[Any]):
+        self.id = uuid.uuid4().hex[:16]
+        self.kind = kind
+        self.action = action
+        self.items = list(items)
+        self.events: List[Dict] = []
+        self.succeeded = 0
+        self.failed = 0
+        self.pending_units = 0
+        self.status = 'queued'
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.changed = threading.Condition()
+
+    @property
+    def done(self) -> bool:
+        return self.finished_at is not None
+
+    def record(self, item: Any, result: Dict) -> None:
+        success = bool(result.get('success'))
+        event = {
+            'item': item,
+            'success': success,
+            'message': result.get('message') or result.get('error') or result.get('stderr') or '',
+            'finished_at': time.time()
+        }
+        if result.get('site_id') is not None:
+            event['site_id'] = result['site_id']
+        with self.changed:
+            if self.started_at is None:
+                self.started_at = event['finished_at']
+                self.status = 'running'
+            self.events.append(event)
+            if success:
+                self.succeeded += 1
+            else:
+                self.failed += 1
+            self.changed.notify_all()
+
+    def unit_finished(self) -> None:
+        with self.changed:
+            self.pending_units -= 1
+            if self.pending_units == 0:
+                self.finished_at = time.time()
+                if not self.failed:
+                    self.status = 'completed'
+                elif not self.succeeded:
+                    self.status = 'failed'
+                else:
+                    self.status = 'completed_with_errors'
+            self.changed.notify_all()
+
+    def snapshot(self, since: int = 0) -> Dict:
+        with self.changed:
+            total = len(self.items)
+            finished = self.succeeded + self.failed
+            return {
+                'job_id': self.id,
+                'kind': self.kind,
+                'action': self.action,
+                'status': self.status,
+                'total': total,
+                'finished': finished,
+                'succeeded': self.succeeded,
+                'failed': self.failed,
+                'progress': round(finished * 100.0 / total, 1) if total else 100.0,
+                'created_at': self.created_at,
+                'started_at': self.started_at,
+                'finished_at': self.finished_at,
+                'results': self.events[since:],
+                'next': len(self.events)
+            }
+
+    def wait(self, since: int, timeout: float) -> None:
+        """Block until there are events past `since` or the job finishes"""
+        with self.changed:
+            if len(self.events) <= since and not self.done:
+                self.changed.wait(timeout)
+
+#########################################################################
+# Runner
+#########################################################################
+
+class BulkJobRunner:
+    """Executes bulk jobs on one bounded worker pool
+
+    A job is split into units: single items for `handler`, or chunks of
+    `batch_size` items for `batch_handler`, which returns a result per item
+    (used to restart many systemd units with one systemctl call). Units from
+    all jobs share `max_workers` threads, so a 500-site job cannot fork 500
+    processes at once.
+
+    A `pipeline` instead gets every item in one unit together with a
+    record(item, result) callback, for work that runs in stages of its own
+    and reports items as they finish.
+    """
+
+    def __init__(self, max_workers: int = 8, retention: float = 3600, max_jobs: int = 200):
+        self.max_workers = max_workers
+        self.retention = retention
+        self.max_jobs = max_jobs
+        self._jobs: Dict[str, BulkJob] = {}
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def submit(self, kind: str, action: str, items: Sequence[Any],
+               handler: Optional[Callable[[Any], Dict]] = None,
+               batch_handler: Optional[Callable[[List[Any]], Dict[Any, Dict]]] = None,
+               batch_size: int = 50,
+               pipeline: Optional[Callable[[List[Any], Callable[[Any, Dict], None]], None]] = None) -> BulkJob:
+        """Queue a bulk action and return its job straight away"""
+        if handler is None and batch_handler is None and pipeline is None:
+            raise ValueError('A handler, batch_handler or pipeline is required')
+
+        # Drop duplicates but keep the caller's order
+        job = BulkJob(kind, action, list(dict.fromkeys(items)))
+        if pipeline is not None:
+            units = [job.items] if job.items else []
+        elif batch_handler is not None:
+            units = [job.items[i:i + batch_size] for i in range(0, len(job.items), batch_size)]
+        else:
+            units = [[item] for item in job.items]
+        job.pending_units = len(units)
+
+        with self._lock:
+            self._prune()
+            self._jobs[job.id] = job
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                    thread_name_prefix='bulk-job')
+            executor = self._executor
+
+        if not units:
+            job.pending_units = 1
+            job.unit_finished()
+        for unit in units:
+            executor.submit(self._run_unit, job, unit, handler, batch_handler, pipeline)
+        return job
+
+    def get(self, job_id: str) -> Optional[BulkJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list_jobs(self) -> List[Dict]:
+        with self._lock:
+            jobs = sorted(self._jobs.values(), key=lambda job: job.created_at, reverse=True)
+        return [{key: value for key, value in job.snapshot(len(job.events)).items() if key != 'results'}
+                for job in jobs]
+
+    def _run_unit(self, job: BulkJob, unit: List[Any], handler, batch_handler, pipeline=None) -> None:
+        try:
+            if pipeline is not None:
+                recorded = set()
+                lock = threading.Lock()
+
+                def record(item, result):
+                    with lock:
+                        if item in recorded:
+                            return
+                        recorded.add(item)
+                    job.record(item, result)
+
+                error = 'No result returned'
+                try:
+                    pipeline(unit, record)
+                except Exception as e:
+                    logger.error(f"Bulk {job.kind} {job.action} pipeline failed: {str(e)}")
+                    error = str(e)
+                for item in unit:
+                    record(item, {'success': False, 'message': error})
+            elif batch_handler is not None:
+                try:
+                    results = batch_handler(unit) or {}
+                except Exception as e:
+                    logger.error(f"Bulk {job.kind} {job.action} batch failed: {str(e)}")
+                    results = {}
+                    error = str(e)
+                else:
+                    error = 'No result returned'
+                for item in unit:
+                    job.record(item, results.get(item, {'success': False, 'message': error}))
+            else:
+                for item in unit:
+                    try:
+                        result = handler(item)
+                    except Exception as e:
+                        result = {'success': False, 'message': str(e)}
+                    job.record(item, result)
+        finally:
+            job.unit_finished()
+
+    def _prune(self) -> None:
+        """Forget finished jobs past retention, and the oldest ones past max_jobs"""
+        now = time.time()
+        for job_id in [job_id for job_id, job in self._jobs.items()
+                       if job.done and now - job.finished_at > self.retention]:
+            del self._jobs[job_id]
+        finished = sorted((job for job in self._jobs.values() if job.done), key=lambda job: job.finished_at)
+        while len(self._jobs) >= self.max_jobs and finished:
+            del self._jobs[finished.pop(0).id]
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+LOMP Stack v3.0 - Application Environment Store
+Cached .env parsing, atomic writes and change classification for Python apps
+
+Author: Silviu Ilie <neosilviu@gmail.com>
+Company: aemdPC
+Version: 3.0.0
+Copyright © 2025 aemdPC. All rights reserved.
+License: MIT License
+
+Repository: https://github.com/aemdPC/lomp-stack-v3
+Documentation: https://docs.aemdpc.com/lomp-stack
+Support: https://support.aemdpc.com
+"""
+
+import os
+import re
+import tempfile
+import threading
+from typing import Dict, Optional, Tuple
+
+# Variables read by the server process itself rather than the app; changing them needs a restart
+RESTART_KEYS = {'PORT', 'HOST', 'WEB_CONCURRENCY', 'PATH', 'PYTHONPATH', 'PYTHONHOME',
+                'VIRTUAL_ENV', 'LD_PRELOAD', 'LD_LIBRARY_PATH', 'TZ'}
+RESTART_PREFIXES = ('GUNICORN_', 'UVICORN_')
+
+# Values that can be written without quotes
+PLAIN_VALUE = re.compile(r'^[A-Za-z0-9_./:@%+,=-]*$')
+
+#########################################################################
+# Parsing and formatting
+#########################################################################
+
+def _unquote(value: str) -> str:
+    if len(value) >= 2 and value[0] == value[-1] == "'":
+        return value[1:-1]
+    if len(value) >= 2 and value[0] == value[-1] == '"':
+        return re.sub(r'\\(["\\$`n])', lambda m: '\n' if m.group(1) == 'n' else m.group(1), value[1:-1])
+    # Unquoted values may carry a trailing " # comment"
+    return re.split(r'\s+#', value, 1)[0].strip()
+
+def parse_env(text: str) -> Dict[str, str]:
+    """KEY=value pairs of a .env file, in file order
+
+    Understands comments, blank lines, `export KEY=...` and single or
+    double quoted values, as python-dotenv does for the apps themselves.
+    """
+    values = {}
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith('#') or '=' not in line:
+            continue
+        key, value = line.split('=', 1)
+        key = key.strip()
+        if key.startswith('export '):
+            key = key[len('export '):].strip()
+        if key:
+            values[key] = _unquote(value.strip())
+    return values
+
+def format_value(value: str) -> str:
+    value = str(value)
+    if PLAIN_VALUE.match(value):
+        return value
+    escaped = value.replace('\\', '\\\\').replace('"', '\\"').replace('$', '\\$') \
+                   .replace('`', '\\`').replace('\n', '\\n')
+    return f'"{escaped}"'
+
+def format_env(values: Dict[str, str], header: str = '') -> str:
+    lines = [f"# {line}" for line in header.splitlines()]
+    if lines:
+        lines.append('')
+    lines.extend(f"{key}={format_value(value)}" for key, value in values.items())
+    return '\n'.join(lines) + '\n'
+
+def diff_env(old: Dict[str, str], new: Dict[str, str]) -> Dict:
+    return {
+        'added': sorted(set(new) - set(old)),
+        'removed': sorted(set(old) - set(new)),
+        'changed': sorted(key for key in set(old) & set(new) if old[key] != new[key])
+    }
+
+def needs_restart(diff: Dict) -> bool:
+    """True if a change touches variables the server process reads at start"""
+    keys = diff['added'] + diff['removed'] + diff['changed']
+    return any(key in RESTART_KEYS or key.startswith(RESTART_PREFIXES) for key in keys)
+
+#########################################################################
+# Store
+#########################################################################
+
+class EnvStore:
+    """Parsed .env files, re-read only when the file on disk changes"""
+
+    def __init__(self):
+        self._cache: Dict[str, Tuple[Tuple, Dict[str, str]]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _stamp(path: str) -> Optional[Tuple]:
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    def read(self, path: str) -> Dict[str, str]:
+        stamp = self._stamp(path)
+        if stamp is None:
+            return {}
+        with self._lock:
+            cached = self._cache.get(path)
+        if cached and cached[0] == stamp:
+            return dict(cached[1])
+
+        with open(path, 'r') as f:
+            values = parse_env(f.read())
+        with self._lock:
+            self._cache[path] = (stamp, values)
+        return dict(values)
+
+    def write(self, path: str, values: Dict[str, str], header: str = '') -> Dict:
+        """Replace the file's variables atomically and return what changed
+
+        The new content goes to a temporary file in the same directory that
+        is renamed over the old one, so the app never reads a partial file.
+        Nothing is written when the variables are unchanged.
+        """
+        values = {str(key).strip(): '' if value is None else str(value) for key, value in values.items()}
+        old = self.read(path)
+        diff = diff_env(old, values)
+        diff['modified'] = bool(diff['added'] or diff['removed'] or diff['changed'])
+        if not diff['modified']:
+            return diff
+
+        directory = os.path.dirname(path) or '.'
+        fd, temp_path = tempfile.mkstemp(prefix='.env.', dir=directory)
+        try:
+            with os.fdopen(fd, 'w') as f:
+                f.write(format_env(values, header))
+                f.flush()
+                os.fsync(f.fileno())
+            try:
+                stat = os.stat(path)
+                os.chmod(temp_path, stat.st_mode & 0o7777)
+                if hasattr(os, 'chown'):
+                    os.chown(temp_path, stat.st_uid, stat.st_gid)
+            except FileNotFoundError:
+                # Same mode the file got before it was written atomically; the app user must read it
+                os.chmod(temp_path, 0o644)
+            except PermissionError:
+                pass
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+
+        with self._lock:
+            self._cache[path] = (self._stamp(path), values)
+        return diff
@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+"""
+LOMP Stack v3.0 - Helper Script Worker Pool
+Long-lived bash processes that keep helper scripts sourced between calls
+
+Author: Silviu Ilie <neosilviu@gmail.com>
+Company: aemdPC
+Version: 3.0.0
+Copyright © 2025 aemdPC. All rights reserved.
+License: MIT License
+
+Repository: https://github.com/aemdPC/lomp-stack-v3
+Documentation: https://docs.aemdpc.com/lomp-stack
+Support: https://support.aemdpc.com
+"""
+
+import os
+import time
+import signal
+import select
+import atexit
+import logging
+import threading
+import subprocess
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Seconds a pooled helper call may run before its worker is killed
+HELPER_TIMEOUT = 900
+
+# Seconds allowed for a new worker to source its script
+SOURCE_TIMEOUT = 60
+
+# Bytes of stdout and of stderr returned per call; only the tail of longer output is kept
+OUTPUT_LIMIT = 256 * 1024
+
+# Worker side of the protocol. Requests are "<argc>\n" followed by
+# "<len>\n<bytes>" per argument (CPU seconds, address space KiB, function,
+# arguments; empty limits mean none); replies are
+# "<KIND> <status> <outlen> <errlen> <truncated>\n" followed by the output
+# bytes, cut to their last OUTPUT_LIMIT bytes each. The script is sourced once,
+# with $0 set to its path and no arguments, as FUNCTION_LAUNCHER in
+# helpers_integration does for forked calls, so helpers that locate their
+# dependencies through $0 load them either way. The shell options and traps
+# it leaves behind are saved and re-applied in a forked subshell for every
+# call, so `exit`, `set -e` or `cd` in a helper cannot break the worker or
+# leak into the next call. Worker state is kept in _lomp_ names so a sourced
+# helper cannot clobber it.
+WORKER_SCRIPT = r'''
+_lomp_script=$0 _lomp_root=$LOMP_HELPER_ROOT _lomp_limit=$LOMP_HELPER_OUTPUT_LIMIT
+unset LOMP_HELPER_ROOT LOMP_HELPER_OUTPUT_LIMIT
+_lomp_out=$(mktemp) _lomp_err=$(mktemp) _lomp_saved=$(mktemp) _lomp_tail=$(mktemp)
+_lomp_cleanup() { rm -f "$_lomp_out" "$_lomp_err" "$_lomp_saved" "$_lomp_tail"; }
+
+_lomp_reply() {
+    local LC_ALL=C o e f size truncated=0
+    for f in "$_lomp_out" "$_lomp_err"; do
+        size=$(wc -c <"$f")
+        if ((size > _lomp_limit)); then
+            tail -c "$_lomp_limit" "$f" >"$_lomp_tail" && cat "$_lomp_tail" >"$f"
+            truncated=1
+        fi
+    done
+    IFS= read -r -d '' o <"$_lomp_out"
+    IFS= read -r -d '' e <"$_lomp_err"
+    printf '%s %d %d %d %d\n%s%s' "$1" "$2" "${#o}" "${#e}" "$truncated" "$o" "$e"
+}
+
+_lomp_read_request() {
+    local LC_ALL=C count len arg i
+    IFS= read -r count || return 1
+    _lomp_args=()
+    for ((i = 0; i < count; i++)); do
+        IFS= read -r len || return 1
+        arg=
+        if ((len)); then
+            IFS= read -r -N "$len" arg || return 1
+        fi
+        _lomp_args+=("$arg")
+    done
+}
+
+cd -- "$_lomp_root" || exit 1
+set --
+source "$_lomp_script" >"$_lomp_out" 2>"$_lomp_err" </dev/null
+_lomp_status=$?
+_lomp_workdir=$PWD
+{ set +o; shopt -p; trap -p; } >"$_lomp_saved" 2>/dev/null || :
+IFS= read -r -d '' _lomp_state <"$_lomp_saved" || :
+set +euo pipefail
+trap - ERR INT TERM
+trap _lomp_cleanup EXIT
+cd -- "$_lomp_root"
+_lomp_reply READY "$_lomp_status"
+
+while _lomp_read_request; do
+    _lomp_cpu=${_lomp_args[0]} _lomp_memory=${_lomp_args[1]}
+    _lomp_args=("${_lomp_args[@]:2}")
+    if ! declare -F -- "${_lomp_args[0]}" >/dev/null; then
+        : >"$_lomp_out"; : >"$_lomp_err"
+        _lomp_reply NOFUNC 127
+        continue
+    fi
+    (
+        if [[ -n $_lomp_cpu ]]; then ulimit -t "$_lomp_cpu" 2>/dev/null; fi
+        if [[ -n $_lomp_memory ]]; then ulimit -v "$_lomp_memory" 2>/dev/null; fi
+        eval "$_lomp_state"
+        cd -- "$_lomp_workdir"
+        "${_lomp_args[@]}"
+    ) >"$_lomp_out" 2>"$_lomp_err" </dev/null
+    _lomp_reply DONE "$?"
+done
+'''
+
+class HelperWorkerError(Exception):
+    """A worker failed; `dispatched` tells whether the call had been sent to it"""
+
+    def __init__(self, message: str, dispatched: bool = False):
+        super().__init__(message)
+        self.dispatched = dispatched
+
+#########################################################################
+# Worker
+#########################################################################
+
+class BashWorker:
+    """One bash process with a single helper script sourced"""
+
+    def __init__(self, script_path: str, cwd: str, timeout: float = SOURCE_TIMEOUT):
+        self.script_path = script_path
+        self.calls = 0
+        self.last_used = time.monotonic()
+        self._buffer = b''
+        self.process = subprocess.Popen(
+            ['bash', '--noprofile', '--norc', '-c', WORKER_SCRIPT, script_path],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+            cwd=cwd, start_new_session=True,
+            env=dict(os.environ, LOMP_HELPER_ROOT=cwd, LOMP_HELPER_OUTPUT_LIMIT=str(OUTPUT_LIMIT))
+        )
+        try:
+            kind, status, _, stderr, _ = self._read_reply(time.monotonic() + timeout)
+        except (HelperWorkerError, TimeoutError) as e:
+            self.kill()
+            raise HelperWorkerError(f'Worker for {script_path} did not start: {str(e) or "timed out"}')
+        if status != 0:
+            logger.debug(f"Sourcing {script_path} returned {status}: {stderr.strip()}")
+
+    def _read(self, deadline: float) -> None:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutError()
+        ready, _, _ = select.select([self.process.stdout], [], [], remaining)
+        if not ready:
+            raise TimeoutError()
+        chunk = os.read(self.process.stdout.fileno(), 65536)
+        if not chunk:
+            raise HelperWorkerError(f'Worker for {self.script_path} exited')
+        self._buffer += chunk
+
+    def _read_reply(self, deadline: float) -> Tuple[str, int, str, str, bool]:
+        try:
+            while b'\n' not in self._buffer:
+                self._read(deadline)
+            header, self._buffer = self._buffer.split(b'\n', 1)
+            kind, status, out_length, err_length, truncated = header.decode().split()
+            size = int(out_length) + int(err_length)
+            while len(self._buffer) < size:
+                self._read(deadline)
+        except TimeoutError:
+            raise
+        except (ValueError, OSError) as e:
+            raise HelperWorkerError(f'Bad reply from worker for {self.script_path}: {str(e)}')
+
+        body, self._buffer = self._buffer[:size], self._buffer[size:]
+        stdout = body[:int(out_length)].decode('utf-8', errors='replace')
+        stderr = body[int(out_length):].decode('utf-8', errors='replace')
+        return kind, int(status), stdout, stderr, truncated == '1'
+
+    def call(self, args: List[str], timeout: float, limits: Optional[Dict] = None) -> Tuple[str, int, str, str, bool]:
+        limits = limits or {}
+        cpu = str(int(limits['cpu'])) if limits.get('cpu') else ''
+        memory = str(int(limits['memory_mb']) * 1024) if limits.get('memory_mb') else ''
+        encoded = [arg.encode() for arg in [cpu, memory] + [str(arg) for arg in args]]
+        if any(b'\0' in arg for arg in encoded):
+            raise ValueError('Helper arguments cannot contain NUL bytes')
+        request = f"{len(encoded)}\n".encode() + b''.join(f"{len(arg)}\n".encode() + arg for arg in encoded)
+
+        self.calls += 1
+        self.last_used = time.monotonic()
+        try:
+            self.process.stdin.write(request)
+            self.process.stdin.flush()
+        except OSError as e:
+            raise HelperWorkerError(f'Worker for {self.script_path} is gone: {str(e)}')
+        try:
+            return self._read_reply(time.monotonic() + timeout)
+        except HelperWorkerError as e:
+            raise HelperWorkerError(str(e), dispatched=True)
+
+    def kill(self) -> None:
+        """Stop the worker and anything its current call started"""
+        try:
+            os.killpg(self.process.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass
+        self.process.wait()
+        for stream in (self.process.stdin, self.process.stdout):
+            try:
+                stream.close()
+            except OSError:
+                pass
+
+#########################################################################
+# Pool
+#########################################################################
+
+class BashWorkerPool:
+    """Bounded set of bash workers, each bound to one helper script
+
+    A worker serves one script because several helpers define functions
+    with the same names (add_vhost exists for nginx, Apache and OLS).
+    Idle workers are reused for their script; when the pool is full the
+    least recently used idle worker is replaced. A worker is retired after
+    `max_calls` calls, on a timeout, or on any protocol error.
+    """
+
+    def __init__(self, cwd: str, size: int = 4, max_calls: int = 100, timeout: float = HELPER_TIMEOUT):
+        self.cwd = cwd
+        self.size = size
+        self.max_calls = max_calls
+        self.timeout = timeout
+        self._idle: Dict[str, List[BashWorker]] = {}
+        self._busy = 0
+        self._available = threading.Condition()
+        atexit.register(self.close)
+
+    def _idle_count(self) -> int:
+        return sum(len(workers) for workers in self._idle.values())
+
+    def _checkout(self, script_path: str) -> BashWorker:
+        with self._available:
+            while True:
+                workers = self._idle.get(script_path)
+                if workers:
+                    self._busy += 1
+                    return workers.pop()
+                if self._busy + self._idle_count() < self.size:
+                    break
+                if self._idle_count():
+                    oldest = min((worker for workers in self._idle.values() for worker in workers),
+                                 key=lambda worker: worker.last_used)
+                    self._idle[oldest.script_path].remove(oldest)
+                    oldest.kill()
+                    break
+                self._available.wait()
+            self._busy += 1
+
+        try:
+            return BashWorker(script_path, self.cwd)
+        except BaseException:
+            with self._available:
+                self._busy -= 1
+                self._available.notify()
+            raise
+
+    def _checkin(self, worker: BashWorker, healthy: bool) -> None:
+        if not healthy or worker.calls >= self.max_calls:
+            worker.kill()
+            worker = None
+        with self._available:
+            self._busy -= 1
+            if worker is not None:
+                self._idle.setdefault(worker.script_path, []).append(worker)
+            self._available.notify()
+
+    def call(self, script_path: str, args: List[str], timeout: Optional[float] = None,
+             limits: Optional[Dict] = None) -> Optional[Dict]:
+        """Run a function of a helper script; None if the script does not define args[0]
+
+        `limits` may set 'cpu' (seconds) and 'memory_mb' rlimits for the call.
+
+        Raises HelperWorkerError if no worker could take the call, in which
+        case nothing was executed.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        worker = self._checkout(script_path)
+        healthy = False
+        try:
+            kind, status, stdout, stderr, truncated = worker.call(args, timeout, limits)
+            healthy = True
+        except TimeoutError:
+            return {'success': False, 'stdout': '', 'stderr': '', 'returncode': -signal.SIGKILL,
+                    'error': f'Helper call {args[0]} timed out after {timeout}s'}
+        except HelperWorkerError as e:
+            if not e.dispatched:
+                raise
+            return {'success': False, 'stdout': '', 'stderr': '', 'returncode': -1, 'error': str(e)}
+        finally:
+            self._checkin(worker, healthy)
+
+        if kind == 'NOFUNC':
+            return None
+        return {'success': status == 0, 'stdout': stdout, 'stderr': stderr, 'returncode': status,
+                'truncated': truncated}
+
+    def close(self) -> None:
+        with self._available:
+            workers = [worker for workers in self._idle.values() for worker in workers]
+            self._idle = {}
+        for worker in workers:
+            worker.kill()
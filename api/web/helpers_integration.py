@@ -20,12 +20,48 @@ import json
 import logging
 from typing import Dict, List, Optional, Tuple
 
+from helper_pool import BashWorkerPool, HelperWorkerError
+from script_runner import ScriptRunner, SCRIPT_CLASSES
+
 logger = logging.getLogger(__name__)
 
+# Script class of helper functions (args[0]) and of scripts run without arguments; others are 'default'
+HELPER_CLASSES = {
+    'backup_wp': 'backup',
+    'create_backup': 'backup',
+    'restore_backup': 'backup',
+    'backup_db': 'backup',
+    'install_wp': 'install',
+    'update_wp': 'install',
+    'install_ssl': 'install',
+    'enable_firewall': 'install',
+    'install_redis.sh': 'install',
+    'install_monitoring.sh': 'install',
+    'update_system.sh': 'install',
+    'system_status': 'quick',
+    'show_stack_urls': 'quick',
+    'get_platform_info': 'quick',
+    'check_core_dependencies.sh': 'quick'
+}
+
+# Long running classes: never pooled, output streamed to a run log
+STREAMED_CLASSES = {'backup', 'install'}
+
+# Calls args[0] as a function of the sourced script, like a pooled worker does;
+# scripts that do not define it run as `bash script args`
+FUNCTION_LAUNCHER = '''script=$0 args=("$@")
+set --
+source "$script"
+if declare -F -- "${args[0]}" >/dev/null; then
+    "${args[@]}"
+else
+    exec bash "$script" "${args[@]}"
+fi'''
+
 class HelperScriptsIntegration:
     """Integration layer for calling LOMP Stack helper scripts from Python"""
     
-    def __init__(self, stack_root: str):
+    def __init__(self, stack_root: str, use_worker_pool: bool = True):
         self.stack_root = stack_root
         self.helpers_dir = os.path.join(stack_root, 'helpers')
         self.web_helpers_dir = os.path.join(self.helpers_dir, 'web')
@@ -34,9 +70,32 @@ class HelperScriptsIntegration:
         self.utils_helpers_dir = os.path.join(self.helpers_dir, 'utils')
         self.monitoring_helpers_dir = os.path.join(self.helpers_dir, 'monitoring')
         
+        # Bash workers that keep helper scripts sourced between function calls
+        self.worker_pool = BashWorkerPool(stack_root) if use_worker_pool and os.name != 'nt' else None
+        
+        # Timeouts, rlimits and bounded output capture for direct script runs
+        self.runner = ScriptRunner(log_dir=os.path.join(stack_root, 'tmp', 'helper_runs'))
+        
+    def _command(self, script_path: str, args: Optional[List[str]]) -> List[str]:
+        if not args:
+            return ['bash', script_path]
+        return ['bash', '-c', FUNCTION_LAUNCHER, script_path] + [str(arg) for arg in args]
+    
+    def _script_class(self, script_path: str, args: Optional[List[str]]) -> str:
+        name = args[0] if args else os.path.basename(script_path)
+        return HELPER_CLASSES.get(name, 'default')
+    
     def _run_helper_script(self, script_path: str, args: Optional[List[str]] = None, 
-                          capture_output: bool = True) -> Dict:
-        """Run a helper script with error handling"""
+                          capture_output: bool = True, timeout: Optional[float] = None,
+                          script_class: Optional[str] = None) -> Dict:
+        """Run a helper script with error handling
+        
+        When args[0] names a function the script defines, the call goes to
+        a pooled worker that already has the script sourced. Scripts run
+        without arguments (installers, checks) and long running classes
+        go through the script runner, which enforces the class timeout and
+        rlimits and keeps only the last lines of output.
+        """
         try:
             if not os.path.exists(script_path):
                 return {
@@ -44,23 +103,23 @@ class HelperScriptsIntegration:
                     'error': f'Helper script not found: {script_path}'
                 }
             
-            cmd = ['bash', script_path]
-            if args:
-                cmd.extend(args)
+            script_class = script_class or self._script_class(script_path, args)
+            limits = SCRIPT_CLASSES.get(script_class, SCRIPT_CLASSES['default'])
+            if timeout is None:
+                timeout = limits['timeout']
             
-            result = subprocess.run(
-                cmd,
-                capture_output=capture_output,
-                text=True,
-                cwd=self.stack_root
-            )
+            if self.worker_pool and args and script_class not in STREAMED_CLASSES:
+                try:
+                    result = self.worker_pool.call(script_path, args, timeout, limits)
+                    if result is not None:
+                        if not capture_output:
+                            result['stdout'] = result['stderr'] = ''
+                        return result
+                except HelperWorkerError as e:
+                    logger.warning(f"Helper worker unavailable, running {script_path} directly: {str(e)}")
             
-            return {
-                'success': result.returncode == 0,
-                'stdout': result.stdout if capture_output else '',
-                'stderr': result.stderr if capture_output else '',
-                'returncode': result.returncode
-            }
+            run = self.runner.run(self._command(script_path, args), script_class, cwd=self.stack_root, timeout=timeout)
+            return self._run_result(run, capture_output)
             
         except Exception as e:
             logger.error(f"Error running helper script {script_path}: {str(e)}")
@@ -69,6 +128,43 @@ class HelperScriptsIntegration:
                 'error': str(e)
             }
     
+    def _run_result(self, run, capture_output: bool = True) -> Dict:
+        snapshot = run.snapshot(run.line_count)
+        result = {
+            'success': run.status == 'completed',
+            'stdout': run.output('stdout') if capture_output else '',
+            'stderr': run.output('stderr') if capture_output else '',
+            'returncode': run.returncode,
+            'run_id': run.id,
+            'truncated': snapshot['truncated'],
+            'log_path': run.log_path
+        }
+        if run.error:
+            result['error'] = run.error
+        return result
+    
+    def start_helper_script(self, script_path: str, args: Optional[List[str]] = None,
+                            script_class: Optional[str] = None, timeout: Optional[float] = None) -> Dict:
+        """Start a helper script in the background; follow it with get_helper_run"""
+        if not os.path.exists(script_path):
+            return {'success': False, 'error': f'Helper script not found: {script_path}'}
+        
+        run = self.runner.start(self._command(script_path, args), script_class or self._script_class(script_path, args),
+                                cwd=self.stack_root, timeout=timeout)
+        return {'success': True, 'run_id': run.id, 'log_path': run.log_path}
+    
+    def get_helper_run(self, run_id: str, since: int = 0, wait: float = 0) -> Optional[Dict]:
+        """Status, progress and output lines after `since` of a helper run"""
+        run = self.runner.get(run_id)
+        if run is None:
+            return None
+        if wait:
+            run.wait(since, wait)
+        return run.snapshot(since)
+    
+    def list_helper_runs(self) -> List[Dict]:
+        return self.runner.list_runs()
+    
     # Web Server Management
     def create_nginx_vhost(self, domain: str, document_root: str, 
                           php_version: str = "8.1") -> Dict:
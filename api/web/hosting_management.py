@@ -16,20 +16,29 @@ Support: https://support.aemdpc.com
 
 import os
 import json
+import base64
 import subprocess
 import sqlite3
 import hashlib
 import secrets
 import re
+import socket
 from datetime import datetime, timedelta
 from flask import Flask, render_template, request, jsonify, session, redirect, url_for, flash
 from functools import wraps
+from concurrent.futures import ThreadPoolExecutor
 import logging
 
 # Import base Flask app
 import sys
 sys.path.append(os.path.dirname(__file__))
 
+from db_pool import get_pool
+from venv_cache import VenvTemplateCache
+from port_allocator import PortAllocator, create_port_tables
+from wp_core_cache import WordPressCoreCache
+from vhost_config import VhostManager, VhostTransaction, VHOST_NAME, render_php_vhost, render_python_proxy
+
 # Import existing dashboard components
 try:
     from admin_dashboard import app, SCRIPT_DIR, API_DIR, get_system_stats
@@ -57,6 +66,11 @@ SITES_DB_PATH = os.path.join(SCRIPT_DIR, 'sites.db')
 DOMAINS_DB_PATH = os.path.join(SCRIPT_DIR, 'domains.db')
 SERVICES_DB_PATH = os.path.join(SCRIPT_DIR, 'services.db')
 
+# Shared per-thread connections for the hosting databases
+sites_db = get_pool(SITES_DB_PATH)
+domains_db = get_pool(DOMAINS_DB_PATH)
+services_db = get_pool(SERVICES_DB_PATH)
+
 # Import helpers integration layer after STACK_ROOT is defined
 try:
     from helpers_integration import get_helpers_integration
@@ -70,18 +84,145 @@ WEB_HELPERS_DIR = os.path.join(STACK_ROOT, 'helpers', 'web')
 WP_HELPERS_DIR = os.path.join(STACK_ROOT, 'helpers', 'wp')
 SECURITY_HELPERS_DIR = os.path.join(STACK_ROOT, 'helpers', 'security')
 
+# Upper bound for one systemctl call, so a hung unit cannot block a request forever
+SYSTEMCTL_TIMEOUT = 90
+SYSTEMCTL_ACTIONS = ['start', 'stop', 'restart', 'reload']
+SYSTEMD_UNIT_DIR = '/etc/systemd/system'
+WP_BACKUP_DIR = '/var/backups/stack/wordpress'
+
+# Verified WordPress releases, shared by every site through hardlinks or reflinks
+WP_CORE_CACHE_DIR = '/var/cache/lomp/wordpress'
+wp_core_cache = WordPressCoreCache(WP_CORE_CACHE_DIR)
+
+# Prebuilt virtualenvs per framework, cloned for each new Python app
+PYTHON_CACHE_DIR = '/var/cache/lomp/python'
+venv_cache = VenvTemplateCache(PYTHON_CACHE_DIR)
+
+# Local ports handed to Python apps (sites.python_port)
+PYTHON_PORT_RANGE = (8000, 9000)
+python_ports = PortAllocator(sites_db, *PYTHON_PORT_RANGE)
+
+# Vhost files are written in transactions; each web server is tested and reloaded once per batch
+vhosts = VhostManager()
+
+# Bulk site provisioning: sites per DB transaction and vhost commit, and workers per stage
+SITE_BATCH_SIZE = 50
+SITE_FILE_WORKERS = 8
+WP_INSTALL_WORKERS = 4
+SITE_WEB_SERVERS = ('ols', 'nginx', 'apache')
+
 #########################################################################
 # Database Setup for Hosting Features
 #########################################################################
 
+SITE_INDEXES = {
+    'idx_sites_created': 'created_at, id',
+    'idx_sites_domain': 'domain, id',
+    'idx_sites_disk_usage': 'disk_usage, id',
+    'idx_sites_status': 'status, created_at, id',
+    'idx_sites_web_server': 'web_server, created_at, id',
+    'idx_sites_wp_installed': 'wp_installed, created_at, id',
+    'idx_sites_site_type': 'site_type, created_at, id'
+}
+
+# Summary counters kept by triggers: (counter name, amount) SQL over {row}
+SITE_COUNTERS = [
+    ("'total'", "1"),
+    ("'active'", "{row}.status = 'active'"),
+    ("'wp'", "{row}.wp_installed = 1"),
+    ("'ssl'", "{row}.ssl_enabled = 1"),
+    ("'status:' || COALESCE({row}.status, '')", "1"),
+    ("'web_server:' || COALESCE({row}.web_server, '')", "1"),
+    ("'site_type:' || COALESCE({row}.site_type, '')", "1")
+]
+DOMAIN_COUNTERS = [
+    ("'total'", "1"),
+    ("'cloudflare'", "{row}.cloudflare_enabled = 1"),
+    ("'status:' || COALESCE({row}.status, '')", "1")
+]
+SERVICE_COUNTERS = [
+    ("'total'", "1"),
+    ("'status:' || COALESCE({row}.status, '')", "1"),
+    ("'type:' || COALESCE({row}.service_type, '')", "1")
+]
+
 def init_hosting_databases():
     """Initialize hosting-related databases"""
     
     # Sites database
-    conn = sqlite3.connect(SITES_DB_PATH)
-    cursor = conn.cursor()
+    with sites_db.transaction() as conn:
+        _create_sites_tables(conn)
+        _create_stats_table(conn, 'sites', 'site_stats', SITE_COUNTERS,
+                            ['status', 'wp_installed', 'ssl_enabled', 'web_server', 'site_type'])
+    
+    # Domains database
+    with domains_db.transaction() as conn:
+        _create_domains_tables(conn)
+        _create_stats_table(conn, 'domains', 'domain_stats', DOMAIN_COUNTERS,
+                            ['status', 'cloudflare_enabled'])
+    
+    # Services database
+    with services_db.transaction() as conn:
+        _create_services_tables(conn)
+        _create_stats_table(conn, 'services', 'service_stats', SERVICE_COUNTERS,
+                            ['status', 'service_type'])
+
+def _create_stats_table(conn, table, stats_table, counters, watched_columns):
+    """Create a summary table kept current by triggers on `table`
     
-    cursor.execute('''
+    Every insert, delete or update of a watched column adjusts the named
+    counters, so overview pages read a handful of rows instead of
+    aggregating the whole table. The counters are rebuilt from the table
+    here, which also covers rows written before the triggers existed.
+    """
+    conn.execute(f'''
+        CREATE TABLE IF NOT EXISTS {stats_table} (
+            name TEXT PRIMARY KEY,
+            value INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    
+    def upsert(row, sign):
+        values = ', '.join(f"({name.format(row=row)}, {sign}COALESCE(({amount.format(row=row)}), 0))"
+                           for name, amount in counters)
+        return (f'INSERT INTO {stats_table} (name, value) VALUES {values} '
+                f'ON CONFLICT(name) DO UPDATE SET value = value + excluded.value;')
+    
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_{stats_table}_insert AFTER INSERT ON {table}
+        BEGIN {upsert('NEW', '+')} END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_{stats_table}_delete AFTER DELETE ON {table}
+        BEGIN {upsert('OLD', '-')} END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_{stats_table}_update
+        AFTER UPDATE OF {', '.join(watched_columns)} ON {table}
+        BEGIN {upsert('OLD', '-')} {upsert('NEW', '+')} END
+    ''')
+    
+    selects = ' UNION ALL '.join(
+        f"SELECT {name.format(row=table)} AS name, COALESCE(({amount.format(row=table)}), 0) AS value FROM {table}"
+        for name, amount in counters
+    )
+    conn.execute(f'DELETE FROM {stats_table}')
+    conn.execute(f'''
+        INSERT INTO {stats_table} (name, value)
+        SELECT name, SUM(value) FROM ({selects}) GROUP BY name
+    ''')
+
+def read_stats(pool, stats_table):
+    """Return the counters of a summary table as a dict"""
+    return dict(pool.query(f'SELECT name, value FROM {stats_table}'))
+
+def _group_counts(stats, prefix):
+    return {name[len(prefix):]: value for name, value in stats.items()
+            if name.startswith(prefix) and value}
+
+def _create_sites_tables(conn):
+    """Create the sites and site_backups tables"""
+    conn.execute('''
         CREATE TABLE IF NOT EXISTS sites (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             domain TEXT UNIQUE NOT NULL,
@@ -110,7 +251,22 @@ def init_hosting_databases():
         )
     ''')
     
-    cursor.execute('''
+    # Listing indexes: every sort and filter ends in id so keyset cursors are exact
+    for name, columns in SITE_INDEXES.items():
+        conn.execute(f'CREATE INDEX IF NOT EXISTS {name} ON sites ({columns})')
+    
+    # One app per port
+    try:
+        conn.execute('''
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_sites_python_port
+            ON sites (python_port) WHERE python_port IS NOT NULL
+        ''')
+    except sqlite3.IntegrityError:
+        logging.warning("Several Python apps share a port; python_port is indexed without the unique constraint")
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_sites_python_port_shared ON sites (python_port)')
+    create_port_tables(conn)
+    
+    conn.execute('''
         CREATE TABLE IF NOT EXISTS site_backups (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             site_id INTEGER,
@@ -121,15 +277,10 @@ def init_hosting_databases():
             FOREIGN KEY (site_id) REFERENCES sites (id)
         )
     ''')
-    
-    conn.commit()
-    conn.close()
-    
-    # Domains database
-    conn = sqlite3.connect(DOMAINS_DB_PATH)
-    cursor = conn.cursor()
-    
-    cursor.execute('''
+
+def _create_domains_tables(conn):
+    """Create the domains table"""
+    conn.execute('''
         CREATE TABLE IF NOT EXISTS domains (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             domain_name TEXT UNIQUE NOT NULL,
@@ -145,15 +296,10 @@ def init_hosting_databases():
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         )
     ''')
-    
-    conn.commit()
-    conn.close()
-    
-    # Services database
-    conn = sqlite3.connect(SERVICES_DB_PATH)
-    cursor = conn.cursor()
-    
-    cursor.execute('''
+
+def _create_services_tables(conn):
+    """Create the services table and seed the default services"""
+    conn.execute('''
         CREATE TABLE IF NOT EXISTS services (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             service_name TEXT UNIQUE NOT NULL,
@@ -185,33 +331,27 @@ def init_hosting_databases():
         ('certbot', 'ssl', 'active', 0, '/etc/letsencrypt/', '/var/log/letsencrypt/letsencrypt.log'),
     ]
     
-    for service in default_services:
-        cursor.execute('''
-            INSERT OR IGNORE INTO services 
-            (service_name, service_type, status, port, config_path, log_path)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', service)
-    
-    conn.commit()
-    conn.close()
+    conn.executemany('''
+        INSERT OR IGNORE INTO services 
+        (service_name, service_type, status, port, config_path, log_path)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', default_services)
 
 #########################################################################
 # Service Management Functions
 #########################################################################
 
-def get_all_services():
+def get_all_services(limit=None):
     """Get all services with their status"""
-    conn = sqlite3.connect(SERVICES_DB_PATH)
-    cursor = conn.cursor()
-    
-    cursor.execute('''
+    rows = services_db.query('''
         SELECT service_name, service_type, status, port, config_path, 
                memory_usage, cpu_usage, uptime, last_restart
         FROM services ORDER BY service_type, service_name
-    ''')
+        LIMIT ?
+    ''', (-1 if limit is None else limit,))
     
     services = []
-    for row in cursor.fetchall():
+    for row in rows:
         services.append({
             'name': row[0],
             'type': row[1],
@@ -224,9 +364,17 @@ def get_all_services():
             'last_restart': row[8]
         })
     
-    conn.close()
     return services
 
+def get_service_counts():
+    """Service totals, read from the service_stats summary"""
+    stats = read_stats(services_db, 'service_stats')
+    return {
+        'total': stats.get('total', 0),
+        'by_status': _group_counts(stats, 'status:'),
+        'by_type': _group_counts(stats, 'type:')
+    }
+
 def manage_service(service_name, action):
     """Manage service (start/stop/restart/reload)"""
     try:
@@ -239,20 +387,15 @@ def manage_service(service_name, action):
             
             if result.returncode == 0:
                 # Update status in database
-                conn = sqlite3.connect(SERVICES_DB_PATH)
-                cursor = conn.cursor()
-                
                 new_status = 'active' if action == 'start' else 'inactive' if action == 'stop' else 'active'
-                last_restart = datetime.now() if action in ['start', 'restart'] else None
-                
-                cursor.execute('''
-                    UPDATE services 
-                    SET status = ?, last_restart = ?
-                    WHERE service_name = ?
-                ''', (new_status, last_restart, service_name))
+                last_restart = datetime.now().isoformat(' ') if action in ['start', 'restart'] else None
                 
-                conn.commit()
-                conn.close()
+                with services_db.transaction() as conn:
+                    conn.execute('''
+                        UPDATE services 
+                        SET status = ?, last_restart = ?
+                        WHERE service_name = ?
+                    ''', (new_status, last_restart, service_name))
                 
                 return {'success': True, 'message': f'Service {service_name} {action}ed successfully'}
             else:
@@ -267,12 +410,7 @@ def manage_service(service_name, action):
 
 def get_service_config(service_name):
     """Get service configuration"""
-    conn = sqlite3.connect(SERVICES_DB_PATH)
-    cursor = conn.cursor()
-    
-    cursor.execute('SELECT config_path FROM services WHERE service_name = ?', (service_name,))
-    result = cursor.fetchone()
-    conn.close()
+    result = services_db.query_one('SELECT config_path FROM services WHERE service_name = ?', (service_name,))
     
     if result and os.path.exists(result[0]):
         try:
@@ -287,51 +425,136 @@ def get_service_config(service_name):
 # Site Management Functions
 #########################################################################
 
+SITE_COLUMNS = '''id, domain, subdomain, document_root, php_version, web_server,
+               ssl_enabled, wp_installed, wp_version, disk_usage, bandwidth_used,
+               status, created_at, site_type'''
+
+SITE_FILTERS = ('status', 'web_server', 'wp_installed', 'site_type')
+SITE_SORTS = ('created_at', 'domain', 'disk_usage')
+SITES_PAGE_LIMIT = 200
+
+def _site_from_row(row):
+    return {
+        'id': row[0],
+        'domain': row[1],
+        'subdomain': row[2],
+        'document_root': row[3],
+        'php_version': row[4],
+        'web_server': row[5],
+        'ssl_enabled': bool(row[6]),
+        'wp_installed': bool(row[7]),
+        'wp_version': row[8],
+        'disk_usage': row[9],
+        'bandwidth_used': row[10],
+        'status': row[11],
+        'created_at': row[12],
+        'site_type': row[13],
+        'full_domain': f"{row[2]}.{row[1]}" if row[2] else row[1]
+    }
+
 def get_all_sites():
     """Get all managed sites"""
-    conn = sqlite3.connect(SITES_DB_PATH)
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        SELECT id, domain, subdomain, document_root, php_version, web_server,
-               ssl_enabled, wp_installed, wp_version, disk_usage, bandwidth_used,
-               status, created_at
-        FROM sites ORDER BY created_at DESC
+    rows = sites_db.query(f'''
+        SELECT {SITE_COLUMNS}
+        FROM sites ORDER BY created_at DESC, id DESC
     ''')
     
-    sites = []
-    for row in cursor.fetchall():
-        sites.append({
-            'id': row[0],
-            'domain': row[1],
-            'subdomain': row[2],
-            'document_root': row[3],
-            'php_version': row[4],
-            'web_server': row[5],
-            'ssl_enabled': bool(row[6]),
-            'wp_installed': bool(row[7]),
-            'wp_version': row[8],
-            'disk_usage': row[9],
-            'bandwidth_used': row[10],
-            'status': row[11],
-            'created_at': row[12],
-            'full_domain': f"{row[2]}.{row[1]}" if row[2] else row[1]
-        })
-    
-    conn.close()
-    return sites
+    return [_site_from_row(row) for row in rows]
+
+def encode_sites_cursor(sort, order, value, site_id):
+    """Opaque continuation token for query_sites"""
+    token = json.dumps([sort, order, value, site_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(token.encode('utf-8')).decode('ascii').rstrip('=')
 
-def create_new_site(domain, subdomain=None, php_version='8.1', web_server='ols', install_wp=False):
-    """Create a new site"""
+def decode_sites_cursor(cursor, sort, order):
+    """Return the (value, id) position stored in a cursor, or raise ValueError"""
     try:
-        full_domain = f"{subdomain}.{domain}" if subdomain else domain
-        document_root = f"/var/www/{full_domain}"
-        
-        # Create document root directory
-        os.makedirs(document_root, exist_ok=True)
-        
-        # Create basic index.html
-        index_content = f"""<!DOCTYPE html>
+        padded = cursor + '=' * (-len(cursor) % 4)
+        cursor_sort, cursor_order, value, site_id = json.loads(base64.urlsafe_b64decode(padded))
+    except Exception:
+        raise ValueError('Invalid cursor')
+    if cursor_sort != sort or cursor_order != order:
+        raise ValueError('Cursor does not match the requested sort order')
+    return value, site_id
+
+def _sites_where(filters):
+    clauses = []
+    params = []
+    for name in SITE_FILTERS:
+        value = (filters or {}).get(name)
+        if value is None or value == '':
+            continue
+        if name == 'wp_installed':
+            value = 1 if value else 0
+        clauses.append(f'{name} = ?')
+        params.append(value)
+    return clauses, params
+
+def query_sites(filters=None, sort='created_at', order='desc', limit=50, cursor=None, offset=None):
+    """Get one page of sites, filtered and sorted in SQL
+    
+    filters may hold status, web_server, wp_installed (bool) and site_type.
+    Pages continue from `cursor` (keyset, as returned in next_cursor) or
+    from a row `offset` for numbered pages.
+    """
+    if sort not in SITE_SORTS:
+        raise ValueError(f'Unsupported sort field: {sort}')
+    if order not in ('asc', 'desc'):
+        raise ValueError(f'Unsupported sort order: {order}')
+    limit = max(1, min(int(limit), SITES_PAGE_LIMIT))
+    
+    clauses, params = _sites_where(filters)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+    total = sites_db.query_one(f'SELECT COUNT(*) FROM sites {where}', params)[0]
+    
+    page_clauses = list(clauses)
+    page_params = list(params)
+    if cursor:
+        value, site_id = decode_sites_cursor(cursor, sort, order)
+        page_clauses.append(f"({sort}, id) {'<' if order == 'desc' else '>'} (?, ?)")
+        page_params.extend([value, site_id])
+    page_where = f"WHERE {' AND '.join(page_clauses)}" if page_clauses else ''
+    
+    direction = order.upper()
+    sql = f'''
+        SELECT {SITE_COLUMNS}
+        FROM sites {page_where}
+        ORDER BY {sort} {direction}, id {direction}
+        LIMIT ?
+    '''
+    page_params.append(limit + 1)
+    if offset and not cursor:
+        sql += ' OFFSET ?'
+        page_params.append(int(offset))
+    
+    rows = sites_db.query(sql, page_params)
+    sites = [_site_from_row(row) for row in rows[:limit]]
+    
+    next_cursor = None
+    if len(rows) > limit:
+        last = sites[-1]
+        next_cursor = encode_sites_cursor(sort, order, last[sort], last['id'])
+    
+    return {'sites': sites, 'total': total, 'next_cursor': next_cursor}
+
+def get_site_counts():
+    """Site totals for overview cards, read from the site_stats summary"""
+    stats = read_stats(sites_db, 'site_stats')
+    return {
+        'total': stats.get('total', 0),
+        'active': stats.get('active', 0),
+        'wp': stats.get('wp', 0),
+        'ssl': stats.get('ssl', 0),
+        'by_status': _group_counts(stats, 'status:'),
+        'by_web_server': _group_counts(stats, 'web_server:'),
+        'by_site_type': _group_counts(stats, 'site_type:')
+    }
+
+def create_site_files(full_domain, document_root, web_server, php_version):
+    """Create the document root with a placeholder index page"""
+    os.makedirs(document_root, exist_ok=True)
+    
+    index_content = f"""<!DOCTYPE html>
 <html>
 <head>
     <title>Welcome to {full_domain}</title>
@@ -348,30 +571,45 @@ def create_new_site(domain, subdomain=None, php_version='8.1', web_server='ols',
     </div>
 </body>
 </html>"""
+    
+    with open(os.path.join(document_root, 'index.html'), 'w') as f:
+        f.write(index_content)
+
+def configure_site_vhost(web_server, full_domain, document_root, php_version, txn=None):
+    """Configure the virtual host of a PHP site on its web server"""
+    if web_server == 'ols':
+        return configure_ols_vhost(full_domain, document_root, php_version, txn)
+    elif web_server == 'nginx':
+        return configure_nginx_vhost(full_domain, document_root, php_version, txn)
+    elif web_server == 'apache':
+        return configure_apache_vhost(full_domain, document_root, php_version, txn)
+    return None
+
+def create_new_site(domain, subdomain=None, php_version='8.1', web_server='ols', install_wp=False, txn=None):
+    """Create a new site
+
+    Pass a vhost transaction as `txn` to stage the vhost with others and
+    commit them together; otherwise the vhost is committed on its own.
+    """
+    try:
+        full_domain = f"{subdomain}.{domain}" if subdomain else domain
+        document_root = f"/var/www/{full_domain}"
         
-        with open(os.path.join(document_root, 'index.html'), 'w') as f:
-            f.write(index_content)
+        # Create document root directory and basic index.html
+        create_site_files(full_domain, document_root, web_server, php_version)
         
         # Configure web server virtual host
-        if web_server == 'ols':
-            configure_ols_vhost(full_domain, document_root, php_version)
-        elif web_server == 'nginx':
-            configure_nginx_vhost(full_domain, document_root, php_version)
-        elif web_server == 'apache':
-            configure_apache_vhost(full_domain, document_root, php_version)
+        vhost_result = configure_site_vhost(web_server, full_domain, document_root, php_version, txn)
+        if vhost_result and not vhost_result['success']:
+            logging.warning(f"Vhost for {full_domain} not configured: {vhost_result['message']}")
         
         # Insert into database
-        conn = sqlite3.connect(SITES_DB_PATH)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT INTO sites (domain, subdomain, document_root, php_version, web_server, status)
-            VALUES (?, ?, ?, ?, ?, 'active')
-        ''', (domain, subdomain, document_root, php_version, web_server))
-        
-        site_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
+        with sites_db.transaction() as conn:
+            cursor = conn.execute('''
+                INSERT INTO sites (domain, subdomain, document_root, php_version, web_server, status)
+                VALUES (?, ?, ?, ?, ?, 'active')
+            ''', (domain, subdomain, document_root, php_version, web_server))
+            site_id = cursor.lastrowid
         
         # Install WordPress if requested
         if install_wp:
@@ -379,49 +617,163 @@ def create_new_site(domain, subdomain=None, php_version='8.1', web_server='ols',
             if not wp_result['success']:
                 return {'success': False, 'message': f'Site created but WordPress installation failed: {wp_result["message"]}'}
         
-        return {'success': True, 'message': f'Site {full_domain} created successfully', 'site_id': site_id}
+        return {'success': True, 'message': f'Site {full_domain} created successfully', 'site_id': site_id,
+                'vhost': vhost_result}
         
     except Exception as e:
         return {'success': False, 'message': f'Error creating site: {str(e)}'}
 
-def configure_ols_vhost(domain, document_root, php_version):
+def parse_site_manifest(entries, defaults=None):
+    """Validate a bulk site manifest; returns (sites, errors)
+
+    Each entry needs a domain and may set subdomain, php_version,
+    web_server and install_wp, falling back to `defaults`.
+    """
+    defaults = defaults or {}
+    sites, errors, seen = [], [], set()
+    for index, entry in enumerate(entries):
+        if not isinstance(entry, dict):
+            errors.append(f'Entry {index}: expected an object')
+            continue
+        domain = str(entry.get('domain') or '').strip().lower()
+        subdomain = str(entry.get('subdomain') or '').strip().lower() or None
+        php_version = str(entry.get('php_version', defaults.get('php_version', '8.1')))
+        web_server = entry.get('web_server', defaults.get('web_server', 'ols'))
+        full_domain = f"{subdomain}.{domain}" if subdomain else domain
+        
+        if not domain or not VHOST_NAME.match(full_domain) or '..' in full_domain:
+            errors.append(f'Entry {index}: invalid domain {full_domain!r}')
+        elif web_server not in SITE_WEB_SERVERS:
+            errors.append(f'Entry {index}: unsupported web server {web_server!r}')
+        elif not re.match(r'^\d+\.\d+$', php_version):
+            errors.append(f'Entry {index}: invalid PHP version {php_version!r}')
+        elif domain in seen:
+            # sites.domain is unique
+            errors.append(f'Entry {index}: duplicate domain {domain}')
+        else:
+            seen.add(domain)
+            sites.append({
+                'domain': domain,
+                'subdomain': subdomain,
+                'full_domain': full_domain,
+                'document_root': f"/var/www/{full_domain}",
+                'php_version': php_version,
+                'web_server': web_server,
+                'install_wp': bool(entry.get('install_wp', defaults.get('install_wp', False)))
+            })
+    return sites, errors
+
+def provision_sites(sites, record):
+    """Create many sites as a pipeline, calling record(full_domain, result) as each one finishes
+
+    Document roots are written by SITE_FILE_WORKERS threads ahead of the
+    rest. Sites then go through in batches of SITE_BATCH_SIZE: one DB
+    transaction inserts a batch, and its vhosts are committed together
+    with one config test per web server. WordPress installs start as soon
+    as their batch is committed and run on WP_INSTALL_WORKERS threads.
+    Each web server is reloaded once, after the last batch.
+    """
+    if not sites:
+        return
+    existing = set()
+    for start in range(0, len(sites), SITE_BATCH_SIZE):
+        domains = [site['domain'] for site in sites[start:start + SITE_BATCH_SIZE]]
+        existing.update(row[0] for row in sites_db.query(
+            'SELECT domain FROM sites WHERE domain IN (%s)' % ','.join('?' * len(domains)), domains))
+    
+    def write_files(site):
+        create_site_files(site['full_domain'], site['document_root'], site['web_server'], site['php_version'])
+    
+    def install(site, site_id):
+        wp_result = install_wordpress(site_id, site['full_domain'], site['document_root'])
+        if wp_result['success']:
+            record(site['full_domain'], {'success': True, 'site_id': site_id,
+                                         'message': f"Site {site['full_domain']} created with WordPress"})
+        else:
+            record(site['full_domain'], {'success': False, 'site_id': site_id,
+                                         'message': f'Site created but WordPress installation failed: {wp_result["message"]}'})
+    
+    reload_servers = set()
+    with ThreadPoolExecutor(max_workers=SITE_FILE_WORKERS, thread_name_prefix='site-files') as file_pool, \
+         ThreadPoolExecutor(max_workers=WP_INSTALL_WORKERS, thread_name_prefix='site-wp') as wp_pool:
+        pending = []
+        for site in sites:
+            if site['domain'] in existing:
+                record(site['full_domain'], {'success': False, 'message': f"Site {site['domain']} already exists"})
+            else:
+                pending.append((site, file_pool.submit(write_files, site)))
+        
+        for start in range(0, len(pending), SITE_BATCH_SIZE):
+            batch = []
+            for site, future in pending[start:start + SITE_BATCH_SIZE]:
+                try:
+                    future.result()
+                    batch.append(site)
+                except Exception as e:
+                    record(site['full_domain'], {'success': False, 'message': f'Error creating site files: {str(e)}'})
+            if not batch:
+                continue
+            
+            inserted = []
+            try:
+                with sites_db.transaction() as conn:
+                    for site in batch:
+                        cursor = conn.execute('''
+                            INSERT OR IGNORE INTO sites (domain, subdomain, document_root, php_version, web_server, status)
+                            VALUES (?, ?, ?, ?, ?, 'active')
+                        ''', (site['domain'], site['subdomain'], site['document_root'],
+                              site['php_version'], site['web_server']))
+                        if cursor.rowcount:
+                            inserted.append((site, cursor.lastrowid))
+                        else:
+                            record(site['full_domain'], {'success': False, 'message': f"Site {site['domain']} already exists"})
+            except Exception as e:
+                for site in batch:
+                    record(site['full_domain'], {'success': False, 'message': f'Error creating site: {str(e)}'})
+                continue
+            
+            txn = VhostTransaction(vhosts)
+            for site, _ in inserted:
+                configure_site_vhost(site['web_server'], site['full_domain'], site['document_root'],
+                                     site['php_version'], txn)
+            vhost_result = txn.commit(reload='none')
+            reload_servers.update(vhost_result.get('servers', {}))
+            
+            for site, site_id in inserted:
+                if not vhost_result['success']:
+                    record(site['full_domain'], {'success': False, 'site_id': site_id,
+                                                 'message': f"Site created but vhost configuration failed: {vhost_result['message']}"})
+                elif site['install_wp']:
+                    wp_pool.submit(install, site, site_id)
+                else:
+                    record(site['full_domain'], {'success': True, 'site_id': site_id,
+                                                 'message': f"Site {site['full_domain']} created successfully"})
+        
+        for server in reload_servers:
+            vhosts.request_reload(server, 'now')
+
+def stage_vhost(server, name, content, txn=None):
+    """Add a vhost to `txn`, or commit it in a transaction of its own"""
+    if os.name == 'nt':
+        return {'success': True, 'message': 'Web server configuration skipped on Windows', 'skipped': True}
+    if txn is not None:
+        txn.write(server, name, content)
+        return {'success': True, 'message': f'{server} vhost {name} staged', 'staged': True}
+    with vhosts.transaction() as own:
+        own.write(server, name, content)
+    return own.result
+
+def configure_ols_vhost(domain, document_root, php_version, txn=None):
     """Configure OpenLiteSpeed virtual host"""
-    if helpers:
-        return helpers.create_ols_vhost(domain, document_root, php_version)
-    else:
-        # Fallback to direct script execution
-        ols_helper = os.path.join(WEB_HELPERS_DIR, 'ols_helpers.sh')
-        if os.path.exists(ols_helper):
-            result = subprocess.run(['bash', ols_helper, 'add_vhost', domain, document_root, php_version], 
-                                  capture_output=True, text=True)
-            return {'success': result.returncode == 0, 'stdout': result.stdout, 'stderr': result.stderr}
-        return {'success': False, 'message': 'OLS helper not found'}
-
-def configure_nginx_vhost(domain, document_root, php_version):
+    return stage_vhost('ols', domain, render_php_vhost('ols', domain, document_root, php_version), txn)
+
+def configure_nginx_vhost(domain, document_root, php_version, txn=None):
     """Configure Nginx virtual host"""
-    if helpers:
-        return helpers.create_nginx_vhost(domain, document_root, php_version)
-    else:
-        # Fallback to direct script execution
-        nginx_helper = os.path.join(WEB_HELPERS_DIR, 'nginx_helpers.sh')
-        if os.path.exists(nginx_helper):
-            result = subprocess.run(['bash', nginx_helper, 'add_vhost', domain, document_root, php_version], 
-                                  capture_output=True, text=True)
-            return {'success': result.returncode == 0, 'stdout': result.stdout, 'stderr': result.stderr}
-        return {'success': False, 'message': 'Nginx helper not found'}
-
-def configure_apache_vhost(domain, document_root, php_version):
+    return stage_vhost('nginx', domain, render_php_vhost('nginx', domain, document_root, php_version), txn)
+
+def configure_apache_vhost(domain, document_root, php_version, txn=None):
     """Configure Apache virtual host"""
-    if helpers:
-        return helpers.create_apache_vhost(domain, document_root, php_version)
-    else:
-        # Fallback to direct script execution
-        apache_helper = os.path.join(WEB_HELPERS_DIR, 'apache_helpers.sh')
-        if os.path.exists(apache_helper):
-            result = subprocess.run(['bash', apache_helper, 'add_vhost', domain, document_root, php_version], 
-                                  capture_output=True, text=True)
-            return {'success': result.returncode == 0, 'stdout': result.stdout, 'stderr': result.stderr}
-        return {'success': False, 'message': 'Apache helper not found'}
+    return stage_vhost('apache', domain, render_php_vhost('apache', domain, document_root, php_version), txn)
 
 #########################################################################
 # WordPress Management Functions
@@ -440,6 +792,15 @@ def install_wordpress(site_id, domain, document_root):
         db_user = f"wp_{secrets.token_hex(4)}"
         db_pass = secrets.token_urlsafe(16)
         
+        # Core files from the shared cache; the helper only downloads them if that fails
+        core_version = None
+        if os.name != 'nt':
+            core_result = wp_core_cache.populate(document_root)
+            if core_result['success']:
+                core_version = core_result['version']
+            else:
+                logging.warning(f"WordPress core cache unavailable for {domain}: {core_result['message']}")
+        
         if helpers:
             # Use helpers integration
             wp_result = helpers.install_wordpress(
@@ -462,24 +823,20 @@ def install_wordpress(site_id, domain, document_root):
         
         if wp_result['success']:
             # Update database
-            conn = sqlite3.connect(SITES_DB_PATH)
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                UPDATE sites 
-                SET wp_installed = 1, wp_admin_user = ?, wp_admin_email = ?
-                WHERE id = ?
-            ''', (wp_admin_user, wp_admin_email, site_id))
-            
-            conn.commit()
-            conn.close()
+            with sites_db.transaction() as conn:
+                conn.execute('''
+                    UPDATE sites 
+                    SET wp_installed = 1, wp_admin_user = ?, wp_admin_email = ?
+                    WHERE id = ?
+                ''', (wp_admin_user, wp_admin_email, site_id))
             
             return {
                 'success': True, 
                 'message': 'WordPress installed successfully',
                 'admin_user': wp_admin_user,
                 'admin_password': wp_admin_pass,
-                'admin_email': wp_admin_email
+                'admin_email': wp_admin_email,
+                'core_version': core_version
             }
         else:
             error_msg = wp_result.get('stderr', 'WordPress installation failed')
@@ -490,16 +847,13 @@ def install_wordpress(site_id, domain, document_root):
 
 def get_wp_sites():
     """Get all WordPress sites"""
-    conn = sqlite3.connect(SITES_DB_PATH)
-    cursor = conn.cursor()
-    
-    cursor.execute('''
+    rows = sites_db.query('''
         SELECT id, domain, subdomain, wp_version, wp_admin_user, wp_admin_email, status
         FROM sites WHERE wp_installed = 1
     ''')
     
     wp_sites = []
-    for row in cursor.fetchall():
+    for row in rows:
         wp_sites.append({
             'id': row[0],
             'domain': row[1],
@@ -511,26 +865,86 @@ def get_wp_sites():
             'full_domain': f"{row[2]}.{row[1]}" if row[2] else row[1]
         })
     
-    conn.close()
     return wp_sites
 
+def _site_domain(site_id):
+    row = sites_db.query_one('SELECT domain, subdomain FROM sites WHERE id = ?', (site_id,))
+    if not row:
+        return None
+    return f"{row[1]}.{row[0]}" if row[1] else row[0]
+
+def update_wordpress_site(site_id):
+    """Update WordPress core for one site"""
+    domain = _site_domain(site_id)
+    if not domain:
+        return {'success': False, 'message': 'Site not found'}
+    if not helpers:
+        return {'success': False, 'message': 'Helpers integration not available'}
+    
+    # Sites installed from the core cache share read-only core files; switch them to the new release's
+    row = sites_db.query_one('SELECT document_root FROM sites WHERE id = ?', (site_id,))
+    if row and wp_core_cache.site_entry(row[0]):
+        core_result = wp_core_cache.update_site(row[0])
+        if not core_result['success']:
+            return {'success': False, 'message': core_result['message']}
+    
+    result = helpers.update_wordpress(domain)
+    if result['success']:
+        return {'success': True, 'message': f'WordPress updated for {domain}'}
+    return {'success': False, 'message': result.get('stderr') or result.get('error', 'Update failed')}
+
+def backup_wordpress_site(site_id):
+    """Back up one WordPress site and record it in site_backups"""
+    domain = _site_domain(site_id)
+    if not domain:
+        return {'success': False, 'message': 'Site not found'}
+    if not helpers:
+        return {'success': False, 'message': 'Helpers integration not available'}
+    
+    backup_path = os.path.join(WP_BACKUP_DIR, f"{domain}-{datetime.now().strftime('%Y%m%d%H%M%S')}.tar.gz")
+    result = helpers.backup_wordpress(domain, backup_path)
+    if not result['success']:
+        return {'success': False, 'message': result.get('stderr') or result.get('error', 'Backup failed')}
+    
+    backup_size = os.path.getsize(backup_path) if os.path.exists(backup_path) else None
+    with sites_db.transaction() as conn:
+        conn.execute('''
+            INSERT INTO site_backups (site_id, backup_path, backup_size)
+            VALUES (?, ?, ?)
+        ''', (site_id, backup_path, backup_size))
+    return {'success': True, 'message': f'Backup created at {backup_path}'}
+
+def enable_site_ssl(site_id, email=None):
+    """Issue an SSL certificate for one site"""
+    domain = _site_domain(site_id)
+    if not domain:
+        return {'success': False, 'message': 'Site not found'}
+    if not helpers:
+        return {'success': False, 'message': 'Helpers integration not available'}
+    
+    result = helpers.install_ssl_certificate(domain, email)
+    if not result['success']:
+        return {'success': False, 'message': result.get('stderr') or result.get('error', 'SSL setup failed')}
+    
+    with sites_db.transaction() as conn:
+        conn.execute('UPDATE sites SET ssl_enabled = 1 WHERE id = ?', (site_id,))
+    return {'success': True, 'message': f'SSL enabled for {domain}'}
+
 #########################################################################
 # Domain Management Functions
 #########################################################################
 
-def get_all_domains():
+def get_all_domains(limit=None):
     """Get all managed domains"""
-    conn = sqlite3.connect(DOMAINS_DB_PATH)
-    cursor = conn.cursor()
-    
-    cursor.execute('''
+    rows = domains_db.query('''
         SELECT domain_name, domain_type, nameservers, registrar, expiry_date,
                cloudflare_enabled, status, created_at
         FROM domains ORDER BY domain_name
-    ''')
+        LIMIT ?
+    ''', (-1 if limit is None else limit,))
     
     domains = []
-    for row in cursor.fetchall():
+    for row in rows:
         domains.append({
             'name': row[0],
             'type': row[1],
@@ -542,22 +956,25 @@ def get_all_domains():
             'created_at': row[7]
         })
     
-    conn.close()
     return domains
 
+def get_domain_counts():
+    """Domain totals, read from the domain_stats summary"""
+    stats = read_stats(domains_db, 'domain_stats')
+    return {
+        'total': stats.get('total', 0),
+        'cloudflare': stats.get('cloudflare', 0),
+        'by_status': _group_counts(stats, 'status:')
+    }
+
 def add_domain(domain_name, domain_type='primary', nameservers=None, registrar=None):
     """Add a new domain"""
     try:
-        conn = sqlite3.connect(DOMAINS_DB_PATH)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT INTO domains (domain_name, domain_type, nameservers, registrar)
-            VALUES (?, ?, ?, ?)
-        ''', (domain_name, domain_type, nameservers, registrar))
-        
-        conn.commit()
-        conn.close()
+        with domains_db.transaction() as conn:
+            conn.execute('''
+                INSERT INTO domains (domain_name, domain_type, nameservers, registrar)
+                VALUES (?, ?, ?, ?)
+            ''', (domain_name, domain_type, nameservers, registrar))
         
         return {'success': True, 'message': f'Domain {domain_name} added successfully'}
         
@@ -566,16 +983,42 @@ def add_domain(domain_name, domain_type='primary', nameservers=None, registrar=N
     except Exception as e:
         return {'success': False, 'message': f'Error adding domain: {str(e)}'}
 
+def _domain_name(domain_id):
+    row = domains_db.query_one('SELECT domain_name FROM domains WHERE id = ?', (domain_id,))
+    return row[0] if row else None
+
+def renew_domain_ssl(domain_id):
+    """Renew the SSL certificate of one domain"""
+    domain_name = _domain_name(domain_id)
+    if not domain_name:
+        return {'success': False, 'message': 'Domain not found'}
+    if not helpers:
+        return {'success': False, 'message': 'Helpers integration not available'}
+    
+    result = helpers.install_ssl_certificate(domain_name)
+    if result['success']:
+        return {'success': True, 'message': f'SSL renewed for {domain_name}'}
+    return {'success': False, 'message': result.get('stderr') or result.get('error', 'SSL renewal failed')}
+
+def check_domain_dns(domain_id):
+    """Resolve one domain and report the addresses it points to"""
+    domain_name = _domain_name(domain_id)
+    if not domain_name:
+        return {'success': False, 'message': 'Domain not found'}
+    
+    try:
+        addresses = sorted({info[4][0] for info in socket.getaddrinfo(domain_name, None)})
+    except socket.gaierror as e:
+        return {'success': False, 'message': f'{domain_name} does not resolve: {e.strerror}'}
+    return {'success': True, 'message': f"{domain_name} resolves to {', '.join(addresses)}"}
+
 #########################################################################
 # Python Application Management Functions
 #########################################################################
 
 def get_python_apps():
     """Get all Python applications"""
-    conn = sqlite3.connect(SITES_DB_PATH)
-    cursor = conn.cursor()
-    
-    cursor.execute('''
+    rows = sites_db.query('''
         SELECT domain, subdomain, site_type, python_version, python_framework, 
                python_venv_path, python_port, status, ssl_enabled, created_at
         FROM sites 
@@ -584,7 +1027,7 @@ def get_python_apps():
     ''')
     
     apps = []
-    for row in cursor.fetchall():
+    for row in rows:
         full_domain = row[0]
         if row[1]:  # subdomain
             full_domain = f"{row[0]}/{row[1]}"
@@ -603,7 +1046,6 @@ def get_python_apps():
             'created_at': row[9]
         })
     
-    conn.close()
     return apps
 
 def create_python_app(domain, subdomain, framework, python_version='3.11', git_repo=None):
@@ -619,23 +1061,22 @@ def create_python_app(domain, subdomain, framework, python_version='3.11', git_r
         
         venv_path = f"{document_root}/venv"
         
-        # Find available port for the Python app
-        import random
-        python_port = random.randint(8000, 9000)
-        
-        conn = sqlite3.connect(SITES_DB_PATH)
-        cursor = conn.cursor()
+        # Reserve a port no other app, lease or listening socket uses
+        python_port = python_ports.allocate(f"site:{full_domain}")
         
-        cursor.execute('''
-            INSERT INTO sites 
-            (domain, subdomain, document_root, site_type, python_version, 
-             python_framework, python_venv_path, python_port, web_server)
-            VALUES (?, ?, ?, 'python', ?, ?, ?, ?, 'nginx')
-        ''', (domain, subdomain, document_root, python_version, framework, venv_path, python_port))
-        
-        site_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
+        try:
+            with sites_db.transaction() as conn:
+                cursor = conn.execute('''
+                    INSERT INTO sites 
+                    (domain, subdomain, document_root, site_type, python_version, 
+                     python_framework, python_venv_path, python_port, web_server)
+                    VALUES (?, ?, ?, 'python', ?, ?, ?, ?, 'nginx')
+                ''', (domain, subdomain, document_root, python_version, framework, venv_path, python_port))
+                site_id = cursor.lastrowid
+        except Exception:
+            python_ports.release(python_port)
+            raise
+        python_ports.confirm(python_port)
         
         # Create directory structure
         result = setup_python_environment(site_id, framework, git_repo)
@@ -658,17 +1099,11 @@ def setup_python_environment(site_id, framework, git_repo=None):
     """Setup Python environment for the application"""
     try:
         # Get site info
-        conn = sqlite3.connect(SITES_DB_PATH)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
+        row = sites_db.query_one('''
             SELECT document_root, python_version, python_venv_path, python_port, domain, subdomain
             FROM sites WHERE id = ?
         ''', (site_id,))
         
-        row = cursor.fetchone()
-        conn.close()
-        
         if not row:
             return {'success': False, 'message': 'Site not found'}
         
@@ -679,41 +1114,46 @@ def setup_python_environment(site_id, framework, git_repo=None):
         os.makedirs(f"{document_root}/static", exist_ok=True)
         os.makedirs(f"{document_root}/templates", exist_ok=True)
         
-        # Create virtual environment
-        if os.name == 'nt':  # Windows
-            venv_cmd = ['python', '-m', 'venv', venv_path]
-            pip_path = f"{venv_path}\\Scripts\\pip"
-            python_path = f"{venv_path}\\Scripts\\python"
-        else:  # Linux/Unix
-            venv_cmd = ['python3', '-m', 'venv', venv_path]
-            pip_path = f"{venv_path}/bin/pip"
-            python_path = f"{venv_path}/bin/python"
-        
-        venv_result = subprocess.run(venv_cmd, capture_output=True, text=True)
-        
-        if venv_result.returncode != 0:
-            return {'success': False, 'message': f'Failed to create virtual environment: {venv_result.stderr}'}
-        
         # Create requirements.txt based on framework
         requirements_content = get_framework_requirements(framework)
         with open(f"{document_root}/requirements.txt", 'w') as f:
             f.write(requirements_content)
         
-        # Install requirements
-        pip_install = subprocess.run([
-            pip_path, "install", "-r", f"{document_root}/requirements.txt"
-        ], capture_output=True, text=True)
+        # Clone the framework's prebuilt environment; build from scratch if that is not possible
+        provisioned = False
+        if os.name != 'nt':
+            clone_result = venv_cache.provision(venv_path, framework, requirements_content)
+            provisioned = clone_result['success']
+            if not provisioned:
+                logging.warning(f"Environment template unavailable for {framework}: {clone_result['message']}")
         
-        if pip_install.returncode != 0:
-            return {'success': False, 'message': f'Failed to install requirements: {pip_install.stderr}'}
+        if not provisioned:
+            # Create virtual environment
+            if os.name == 'nt':  # Windows
+                venv_cmd = ['python', '-m', 'venv', venv_path]
+                pip_path = f"{venv_path}\\Scripts\\pip"
+            else:  # Linux/Unix
+                venv_cmd = ['python3', '-m', 'venv', venv_path]
+                pip_path = f"{venv_path}/bin/pip"
+            
+            venv_result = subprocess.run(venv_cmd, capture_output=True, text=True)
+            
+            if venv_result.returncode != 0:
+                return {'success': False, 'message': f'Failed to create virtual environment: {venv_result.stderr}'}
+            
+            # Install requirements
+            pip_install = subprocess.run([
+                pip_path, "install", "-r", f"{document_root}/requirements.txt"
+            ], capture_output=True, text=True)
+            
+            if pip_install.returncode != 0:
+                return {'success': False, 'message': f'Failed to install requirements: {pip_install.stderr}'}
         
         # Create application template
         create_app_template(document_root, framework, python_port)
         
-        # Setup systemd service and nginx configuration using helpers
-        full_domain = f"{subdomain}.{domain}" if subdomain else domain
-        app_name = f"{domain}_{subdomain}" if subdomain else domain
-        app_name = app_name.replace('.', '_').replace('-', '_')
+        # Setup systemd service using helpers, then the nginx proxy vhost
+        app_name = python_app_unit_name(domain, subdomain)
         
         if helpers and os.name != 'nt':  # Only on Linux
             # Setup systemd service
@@ -721,20 +1161,18 @@ def setup_python_environment(site_id, framework, git_repo=None):
                 app_name, document_root, venv_path, python_port
             )
             
-            # Setup nginx configuration
-            nginx_result = helpers.setup_python_nginx_config(
-                full_domain, python_port, document_root
-            )
-            
             if not service_result['success']:
                 return {'success': False, 'message': f'Failed to setup systemd service: {service_result.get("error", "Unknown error")}'}
             
-            if not nginx_result['success']:
-                return {'success': False, 'message': f'Failed to setup nginx config: {nginx_result.get("error", "Unknown error")}'}
+            with sites_db.transaction() as conn:
+                conn.execute('UPDATE sites SET python_wsgi_file = ? WHERE id = ?', (app_name, site_id))
         else:
             # Fallback or Windows - create configs manually
             create_python_service(site_id, domain, subdomain, document_root, venv_path, python_port, framework)
-        configure_webserver_for_python(domain, subdomain, python_port)
+        
+        nginx_result = configure_webserver_for_python(domain, subdomain, python_port, document_root)
+        if not nginx_result['success']:
+            return {'success': False, 'message': f'Failed to setup nginx config: {nginx_result["message"]}'}
         
         return {'success': True, 'message': 'Python environment setup completed'}
         
@@ -919,7 +1357,7 @@ RestartSec=3
 WantedBy=multi-user.target
 """
     
-    service_path = f"/etc/systemd/system/{service_name}.service"
+    service_path = os.path.join(SYSTEMD_UNIT_DIR, f"{service_name}.service")
     
     try:
         with open(service_path, 'w') as f:
@@ -931,129 +1369,182 @@ WantedBy=multi-user.target
         subprocess.run(['systemctl', 'start', service_name], check=True)
         
         # Update database with service name
-        conn = sqlite3.connect(SITES_DB_PATH)
-        cursor = conn.cursor()
-        cursor.execute('''
-            UPDATE sites SET python_wsgi_file = ? WHERE id = ?
-        ''', (service_name, site_id))
-        conn.commit()
-        conn.close()
+        with sites_db.transaction() as conn:
+            conn.execute('''
+                UPDATE sites SET python_wsgi_file = ? WHERE id = ?
+            ''', (service_name, site_id))
         
         return True
     except Exception as e:
         print(f"Error creating service: {e}")
         return False
 
-def configure_webserver_for_python(domain, subdomain, port):
-    """Configure nginx to proxy to Python application"""
-    server_name = domain
-    if subdomain:
-        server_name = f"{subdomain}.{domain}"
-    
-    nginx_config = f"""server {{
-    listen 80;
-    server_name {server_name};
-    
-    location / {{
-        proxy_pass http://127.0.0.1:{port};
-        proxy_set_header Host $host;
-        proxy_set_header X-Real-IP $remote_addr;
-        proxy_set_header X-Forwarded-For $proxy_add_x_forwarded_for;
-        proxy_set_header X-Forwarded-Proto $scheme;
-    }}
-    
-    location /static/ {{
-        alias /var/www/{domain}{('/' + subdomain) if subdomain else ''}/static/;
-        expires 30d;
-        add_header Cache-Control "public, immutable";
-    }}
-    
-    location /media/ {{
-        alias /var/www/{domain}{('/' + subdomain) if subdomain else ''}/media/;
-        expires 30d;
-        add_header Cache-Control "public, immutable";
-    }}
-}}
-"""
+def set_python_service_directory(service_name, working_directory):
+    """Point a Python app's unit at a new WorkingDirectory; True if the unit changed"""
+    service_path = os.path.join(SYSTEMD_UNIT_DIR, f"{service_name}.service")
+    with open(service_path, 'r') as f:
+        content = f.read()
     
-    config_path = f"/etc/nginx/sites-available/{server_name}"
+    lines = content.split('\n')
+    updated = [f"WorkingDirectory={working_directory}" if line.startswith('WorkingDirectory=') else line
+               for line in lines]
+    if updated == lines:
+        return False
     
+    with open(service_path, 'w') as f:
+        f.write('\n'.join(updated))
+    run_systemctl('daemon-reload', [])
+    return True
+
+def configure_webserver_for_python(domain, subdomain, port, document_root=None, txn=None):
+    """Configure nginx to proxy to Python application"""
+    server_name = f"{subdomain}.{domain}" if subdomain else domain
+    return stage_vhost('nginx', server_name, render_python_proxy(server_name, port, document_root), txn)
+
+def run_systemctl(action, units):
+    """Run one systemctl call for one or more units; returns (success, stderr)"""
     try:
-        with open(config_path, 'w') as f:
-            f.write(nginx_config)
-        
-        # Enable site
-        symlink_path = f"/etc/nginx/sites-enabled/{server_name}"
-        if not os.path.exists(symlink_path):
-            os.symlink(config_path, symlink_path)
-        
-        # Test and reload nginx
-        test_result = subprocess.run(['nginx', '-t'], capture_output=True, text=True)
-        if test_result.returncode == 0:
-            subprocess.run(['systemctl', 'reload', 'nginx'])
-            return True
-        else:
-            print(f"Nginx config test failed: {test_result.stderr}")
-            return False
-            
-    except Exception as e:
-        print(f"Error configuring nginx: {e}")
+        result = subprocess.run(
+            ['systemctl', action] + list(units),
+            capture_output=True, text=True, timeout=SYSTEMCTL_TIMEOUT
+        )
+        return result.returncode == 0, result.stderr.strip()
+    except subprocess.TimeoutExpired:
+        return False, f'systemctl {action} timed out after {SYSTEMCTL_TIMEOUT}s'
+    except OSError as e:
+        return False, str(e)
+
+def unit_states(units):
+    """Active state of each unit, from a single systemctl is-active call"""
+    try:
+        result = subprocess.run(
+            ['systemctl', 'is-active'] + list(units),
+            capture_output=True, text=True, timeout=SYSTEMCTL_TIMEOUT
+        )
+    except (subprocess.TimeoutExpired, OSError):
+        return {}
+    return dict(zip(units, result.stdout.split()))
+
+def unit_supports_reload(unit):
+    """True if the unit has an ExecReload and runs gunicorn, which starts fresh workers on HUP
+
+    Units built by the helpers run `python app.py`, which a HUP would kill.
+    """
+    try:
+        result = subprocess.run(
+            ['systemctl', 'show', '-p', 'ExecStart', '-p', 'ExecReload', unit],
+            capture_output=True, text=True, timeout=SYSTEMCTL_TIMEOUT
+        )
+    except (subprocess.TimeoutExpired, OSError):
+        return False
+    if result.returncode != 0:
         return False
+    properties = dict(line.partition('=')[::2] for line in result.stdout.splitlines())
+    return bool(properties.get('ExecReload', '').strip()) and 'gunicorn' in properties.get('ExecStart', '')
 
 def manage_python_app(site_id, action):
     """Manage Python application (start/stop/restart)"""
     try:
-        conn = sqlite3.connect(SITES_DB_PATH)
-        cursor = conn.cursor()
-        
-        cursor.execute('SELECT python_wsgi_file FROM sites WHERE id = ?', (site_id,))
-        result = cursor.fetchone()
-        conn.close()
+        result = sites_db.query_one('SELECT python_wsgi_file FROM sites WHERE id = ?', (site_id,))
         
         if not result or not result[0]:
             return {'success': False, 'message': 'Service not found'}
         
         service_name = result[0]
         
-        if action in ['start', 'stop', 'restart', 'reload']:
-            cmd_result = subprocess.run(
-                ['systemctl', action, service_name],
-                capture_output=True, text=True
-            )
+        if action in SYSTEMCTL_ACTIONS:
+            success, stderr = run_systemctl(action, [service_name])
             
-            if cmd_result.returncode == 0:
+            if success:
                 # Update status in database
-                new_status = 'active' if action in ['start', 'restart'] else 'inactive'
-                conn = sqlite3.connect(SITES_DB_PATH)
-                cursor = conn.cursor()
-                cursor.execute('UPDATE sites SET status = ? WHERE id = ?', (new_status, site_id))
-                conn.commit()
-                conn.close()
+                new_status = 'inactive' if action == 'stop' else 'active'
+                with sites_db.transaction() as conn:
+                    conn.execute('UPDATE sites SET status = ? WHERE id = ?', (new_status, site_id))
                 
                 return {'success': True, 'message': f'Application {action}ed successfully'}
             else:
-                return {'success': False, 'message': f'Failed to {action} application: {cmd_result.stderr}'}
+                return {'success': False, 'message': f'Failed to {action} application: {stderr}'}
         else:
             return {'success': False, 'message': 'Invalid action'}
             
     except Exception as e:
         return {'success': False, 'message': f'Error managing application: {str(e)}'}
 
+def manage_python_apps(site_ids, action):
+    """Start/stop/restart several Python applications with one systemctl call
+
+    Returns a result per site id. If the combined call fails, the units are
+    retried one by one so each site gets its own outcome.
+    """
+    if action not in SYSTEMCTL_ACTIONS:
+        return {site_id: {'success': False, 'message': 'Invalid action'} for site_id in site_ids}
+    
+    placeholders = ','.join('?' * len(site_ids))
+    services = dict(sites_db.query(f'''
+        SELECT id, python_wsgi_file FROM sites
+        WHERE id IN ({placeholders}) AND python_wsgi_file IS NOT NULL AND python_wsgi_file != ''
+    ''', list(site_ids)))
+    
+    results = {site_id: {'success': False, 'message': 'Service not found'}
+               for site_id in site_ids if site_id not in services}
+    if not services:
+        return results
+    
+    success, stderr = run_systemctl(action, list(services.values()))
+    outcomes = {site_id: (True, '') for site_id in services}
+    if not success:
+        # systemctl still acts on the other units when one fails; ask for all
+        # their states at once and only retry the ones that did not get there
+        states = unit_states(list(services.values()))
+        expected = ('inactive', 'failed', 'unknown') if action == 'stop' else ('active',)
+        for site_id, service_name in services.items():
+            if states.get(service_name) not in expected:
+                outcomes[site_id] = run_systemctl(action, [service_name])
+    
+    new_status = 'inactive' if action == 'stop' else 'active'
+    succeeded = [site_id for site_id, (ok, _) in outcomes.items() if ok]
+    if succeeded:
+        with sites_db.transaction() as conn:
+            conn.executemany('UPDATE sites SET status = ? WHERE id = ?',
+                             [(new_status, site_id) for site_id in succeeded])
+    
+    for site_id, (ok, error) in outcomes.items():
+        if ok:
+            results[site_id] = {'success': True, 'message': f'Application {action}ed successfully'}
+        else:
+            results[site_id] = {'success': False, 'message': f'Failed to {action} application: {error}'}
+    return results
+
+def python_app_unit_name(domain, subdomain):
+    """Unit name given to apps whose service was set up by the helpers"""
+    app_name = f"{domain}_{subdomain}" if subdomain else domain
+    return app_name.replace('.', '_').replace('-', '_')
+
+def get_python_app_service(site_id):
+    """systemd unit of a Python application, or None
+
+    Apps set up through the helpers before the unit name was recorded fall
+    back to the name derived from their domain when that unit exists.
+    """
+    result = sites_db.query_one('SELECT python_wsgi_file, domain, subdomain FROM sites WHERE id = ?', (site_id,))
+    if not result:
+        return None
+    service_name, domain, subdomain = result
+    if service_name:
+        return service_name
+    service_name = python_app_unit_name(domain, subdomain)
+    if os.path.exists(os.path.join(SYSTEMD_UNIT_DIR, f"{service_name}.service")):
+        return service_name
+    return None
+
 def get_python_app_logs(site_id):
     """Get logs for Python application"""
     try:
-        conn = sqlite3.connect(SITES_DB_PATH)
-        cursor = conn.cursor()
-        
-        cursor.execute('SELECT python_wsgi_file FROM sites WHERE id = ?', (site_id,))
-        result = cursor.fetchone()
-        conn.close()
+        service_name = get_python_app_service(site_id)
         
-        if not result or not result[0]:
+        if not service_name:
             return {'success': False, 'message': 'Service not found'}
         
-        service_name = result[0]
-        
         # Get systemd logs
         log_result = subprocess.run(
             ['journalctl', '-u', service_name, '--no-pager', '-n', '50'],
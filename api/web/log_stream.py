@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+LOMP Stack v3.0 - Log Streaming
+Incremental tails of log files and systemd journals for the dashboard
+
+Author: Silviu Ilie <neosilviu@gmail.com>
+Company: aemdPC
+Version: 3.0.0
+Copyright © 2025 aemdPC. All rights reserved.
+License: MIT License
+
+Repository: https://github.com/aemdPC/lomp-stack-v3
+Documentation: https://docs.aemdpc.com/lomp-stack
+Support: https://support.aemdpc.com
+"""
+
+import os
+import re
+import json
+import time
+import select
+import subprocess
+from datetime import datetime
+from typing import Iterator, List, Optional, Pattern, Tuple
+
+from log_tail import TAIL_CHUNK_SIZE, tail_lines
+
+# Seconds between keep-alive comments on an idle stream
+HEARTBEAT_INTERVAL = 15
+
+#########################################################################
+# Filters and formatting
+#########################################################################
+
+def compile_filter(grep: Optional[str]) -> Optional[Pattern]:
+    """Case-insensitive regex for a grep parameter; invalid regexes match literally"""
+    if not grep:
+        return None
+    try:
+        return re.compile(grep, re.IGNORECASE)
+    except re.error:
+        return re.compile(re.escape(grep), re.IGNORECASE)
+
+def sse_event(data, event: Optional[str] = None, event_id=None) -> str:
+    """Format one server-sent event"""
+    lines = []
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    if event:
+        lines.append(f'event: {event}')
+    payload = data if isinstance(data, str) else json.dumps(data)
+    lines.extend(f'data: {part}' for part in payload.split('\n'))
+    return '\n'.join(lines) + '\n\n'
+
+#########################################################################
+# Log files
+#########################################################################
+
+def follow_file(path: str, offset: int, pattern: Optional[Pattern] = None,
+                poll_interval: float = 1.0) -> Iterator[Optional[Tuple[int, str]]]:
+    """Yield (offset, line) for each complete line appended after `offset`
+
+    Yields None when idle so callers can send keep-alives. A truncated or
+    rotated file is picked up again from its start.
+    """
+    f = None
+    inode = None
+    buffer = b''
+    try:
+        while True:
+            if f is None:
+                try:
+                    f = open(path, 'rb')
+                except FileNotFoundError:
+                    yield None
+                    time.sleep(poll_interval)
+                    continue
+                stat = os.fstat(f.fileno())
+                if inode is not None and stat.st_ino != inode:
+                    offset = 0
+                inode = stat.st_ino
+                if stat.st_size < offset:
+                    offset = 0
+                f.seek(offset)
+                buffer = b''
+
+            chunk = f.read(TAIL_CHUNK_SIZE)
+            if chunk:
+                buffer += chunk
+                *complete, buffer = buffer.split(b'\n')
+                for raw in complete:
+                    offset += len(raw) + 1
+                    line = raw.decode('utf-8', errors='replace').rstrip('\r')
+                    if line and (pattern is None or pattern.search(line)):
+                        yield offset, line
+                continue
+
+            # At the end: check for rotation or truncation before waiting
+            try:
+                stat = os.stat(path)
+                if stat.st_ino != inode or stat.st_size < offset + len(buffer):
+                    f.close()
+                    f = None
+                    continue
+            except FileNotFoundError:
+                pass
+            yield None
+            time.sleep(poll_interval)
+    finally:
+        if f is not None:
+            f.close()
+
+def stream_file(path: str, lines: int = 100, pattern: Optional[Pattern] = None,
+                offset: Optional[int] = None) -> Iterator[str]:
+    """Server-sent events for a log file: the tail first, then new lines as written
+
+    Event ids are file offsets; passing one back as `offset` (e.g. from
+    Last-Event-ID) resumes without repeating lines.
+    """
+    if offset is None:
+        try:
+            page = tail_lines(path, lines, pattern=pattern)
+            tail, offset = page['lines'], page['end']
+        except FileNotFoundError:
+            tail, offset = [], 0
+        for line in tail:
+            yield sse_event(line, 'line')
+        yield sse_event({'offset': offset}, 'ready', offset)
+
+    last_sent = time.monotonic()
+    for item in follow_file(path, offset, pattern):
+        if item is None:
+            if time.monotonic() - last_sent >= HEARTBEAT_INTERVAL:
+                last_sent = time.monotonic()
+                yield ': keep-alive\n\n'
+            continue
+        position, line = item
+        last_sent = time.monotonic()
+        yield sse_event(line, 'line', position)
+
+#########################################################################
+# systemd journal
+#########################################################################
+
+def format_journal_entry(entry: dict) -> str:
+    message = entry.get('MESSAGE', '')
+    if isinstance(message, list):
+        # Non-UTF-8 messages are exported as byte arrays
+        message = bytes(message).decode('utf-8', errors='replace')
+    try:
+        stamp = datetime.fromtimestamp(int(entry['__REALTIME_TIMESTAMP']) / 1e6).strftime('%Y-%m-%d %H:%M:%S')
+    except (KeyError, ValueError):
+        stamp = ''
+    return f'{stamp} {message}'.strip()
+
+def journal_command(unit: str, lines: int = 50, cursor: Optional[str] = None, follow: bool = False) -> List[str]:
+    cmd = ['journalctl', '-u', unit, '-o', 'json', '--no-pager']
+    if cursor:
+        cmd.append(f'--after-cursor={cursor}')
+    else:
+        cmd.extend(['-n', str(lines)])
+    if follow:
+        cmd.append('-f')
+    return cmd
+
+def stream_journal(unit: str, lines: int = 50, pattern: Optional[Pattern] = None,
+                   cursor: Optional[str] = None) -> Iterator[str]:
+    """Server-sent events for a systemd unit's journal
+
+    One journalctl process follows the unit for the lifetime of the stream.
+    Event ids are journal cursors, so a reconnect resumes after the last
+    entry the client saw.
+    """
+    process = subprocess.Popen(journal_command(unit, lines, cursor, follow=True),
+                               stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    try:
+        yield sse_event({'unit': unit}, 'ready')
+        last_sent = time.monotonic()
+        buffer = b''
+        while True:
+            ready, _, _ = select.select([process.stdout], [], [], 1.0)
+            if not ready:
+                if process.poll() is not None:
+                    yield sse_event({'message': 'journalctl exited'}, 'end')
+                    return
+                if time.monotonic() - last_sent >= HEARTBEAT_INTERVAL:
+                    last_sent = time.monotonic()
+                    yield ': keep-alive\n\n'
+                continue
+
+            chunk = os.read(process.stdout.fileno(), TAIL_CHUNK_SIZE)
+            if not chunk:
+                yield sse_event({'message': 'journalctl exited'}, 'end')
+                return
+            buffer += chunk
+            *complete, buffer = buffer.split(b'\n')
+            for raw in complete:
+                try:
+                    entry = json.loads(raw)
+                except ValueError:
+                    continue
+                line = format_journal_entry(entry)
+                if pattern is None or pattern.search(line):
+                    last_sent = time.monotonic()
+                    yield sse_event(line, 'line', entry.get('__CURSOR'))
+    finally:
+        process.kill()
+        process.wait()
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+LOMP Stack v3.0 - Log Tail Reader
+Bounded reads of the newest lines of large log files, with backward paging
+
+Author: Silviu Ilie <neosilviu@gmail.com>
+Company: aemdPC
+Version: 3.0.0
+Copyright © 2025 aemdPC. All rights reserved.
+License: MIT License
+
+Repository: https://github.com/aemdPC/lomp-stack-v3
+Documentation: https://docs.aemdpc.com/lomp-stack
+Support: https://support.aemdpc.com
+"""
+
+import os
+import mmap
+from typing import Dict, Iterator, List, Optional, Pattern, Sequence
+
+# Bytes read per step when seeking backwards from the end of a file
+TAIL_CHUNK_SIZE = 64 * 1024
+
+# Bytes searched per step by the mmap scanner
+SCAN_WINDOW_SIZE = 1024 * 1024
+
+# Level markers written by the stack's loggers, e.g. "[ERROR]"
+LOG_LEVELS = ['INFO', 'SUCCESS', 'WARNING', 'ERROR']
+
+#########################################################################
+# Pages
+#########################################################################
+
+def _page(lines: List[str], start: int, end: int) -> Dict:
+    """A window of lines; pass `start` back as `before` for the next older page"""
+    return {'lines': lines, 'start': start, 'end': end, 'has_more': start > 0}
+
+def _decode(raw: bytes) -> str:
+    return raw.decode('utf-8', errors='replace').rstrip('\r')
+
+def _file_end(f, before: Optional[int]) -> int:
+    f.seek(0, os.SEEK_END)
+    size = f.tell()
+    return size if before is None else max(0, min(before, size))
+
+#########################################################################
+# Block tail
+#########################################################################
+
+def tail_lines(path: str, lines: int = 100, before: Optional[int] = None,
+               pattern: Optional[Pattern] = None) -> Dict:
+    """The last `lines` lines ending at offset `before` (default: end of file)
+
+    Reads fixed-size blocks backwards from the end, so the cost depends on
+    the size of the window returned, not of the file. `pattern` is an
+    optional regex the returned lines must match.
+    """
+    with open(path, 'rb') as f:
+        end = _file_end(f, before)
+        position = end
+        start = end
+        found: List[str] = []
+        remainder = b''
+
+        while position > 0 and len(found) < lines:
+            step = min(TAIL_CHUNK_SIZE, position)
+            position -= step
+            f.seek(position)
+            block = f.read(step) + remainder
+            parts = block.split(b'\n')
+            # The first part may continue in the previous block
+            remainder = parts.pop(0) if position > 0 else b''
+            line_end = position + len(block)
+            for raw in reversed(parts):
+                line_start = line_end - len(raw)
+                line_end = line_start - 1
+                line = _decode(raw)
+                if not line or (pattern and not pattern.search(line)):
+                    start = line_start
+                    continue
+                found.append(line)
+                start = line_start
+                if len(found) >= lines:
+                    break
+            else:
+                if position == 0:
+                    start = 0
+
+    found.reverse()
+    return _page(found, start, end)
+
+#########################################################################
+# mmap scanner
+#########################################################################
+
+def level_needles(levels: Sequence[str]) -> List[bytes]:
+    """Byte markers for the given levels, e.g. b'[ERROR]'"""
+    return [f'[{level.upper()}]'.encode() for level in levels if level.upper() in LOG_LEVELS]
+
+def _find_backwards(mm, needles: List[bytes], end: int, fold: bool) -> Iterator[int]:
+    """Offsets where any needle starts, from `end` towards the start of the file
+
+    Works one SCAN_WINDOW_SIZE window at a time. With `fold`, the window is
+    lowercased first (one bounded copy) so the search is case-insensitive.
+    """
+    overlap = max(len(needle) for needle in needles) - 1
+    window_end = end
+    while window_end > 0:
+        window_start = max(0, window_end - SCAN_WINDOW_SIZE)
+        limit = min(end, window_end + overlap)
+        haystack, base = (mm[window_start:limit].lower(), window_start) if fold else (mm, 0)
+        positions = []
+        for needle in needles:
+            position = limit - base
+            while True:
+                position = haystack.rfind(needle, window_start - base, position)
+                if position == -1 or position + base < window_start:
+                    break
+                if position + base < window_end:
+                    positions.append(position + base)
+                position += len(needle) - 1
+                if position + base <= window_start:
+                    break
+        yield from sorted(positions, reverse=True)
+        window_end = window_start
+
+def scan_lines(path: str, lines: int = 100, before: Optional[int] = None,
+               levels: Optional[Sequence[str]] = None, keyword: Optional[str] = None) -> Dict:
+    """The last `lines` lines matching a level and/or keyword filter
+
+    The file is memory-mapped and searched backwards for the filter's
+    bytes, so non-matching regions are skipped without being split into
+    lines or decoded. The keyword is case-insensitive; with both filters the
+    level markers are searched and the keyword is checked per line.
+    """
+    needles = level_needles(levels or [])
+    keyword_bytes = keyword.lower().encode() if keyword else None
+    if not needles and not keyword_bytes:
+        return tail_lines(path, lines, before)
+
+    fold = not needles
+    if fold:
+        needles = [keyword_bytes]
+    check = keyword_bytes if not fold else None
+
+    with open(path, 'rb') as f:
+        end = _file_end(f, before)
+        if end == 0:
+            return _page([], 0, 0)
+        found: List[str] = []
+        start = end
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for position in _find_backwards(mm, needles, end, fold):
+                line_start = mm.rfind(b'\n', 0, position) + 1
+                if found and line_start >= start:
+                    continue  # Another match on a line already taken
+                line_end = mm.find(b'\n', position, end)
+                if line_end == -1:
+                    line_end = end
+                raw = mm[line_start:line_end]
+                if check and check not in raw.lower():
+                    continue
+                found.append(_decode(raw))
+                start = line_start
+                if len(found) >= lines:
+                    break
+
+    if len(found) < lines:
+        start = 0
+    found.reverse()
+    return _page(found, start, end)
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+LOMP Stack v3.0 - Port Allocator
+Collision-free local port assignment for Python apps and edge functions
+
+Author: Silviu Ilie <neosilviu@gmail.com>
+Company: aemdPC
+Version: 3.0.0
+Copyright © 2025 aemdPC. All rights reserved.
+License: MIT License
+
+Repository: https://github.com/aemdPC/lomp-stack-v3
+Documentation: https://docs.aemdpc.com/lomp-stack
+Support: https://support.aemdpc.com
+"""
+
+import os
+import sys
+import time
+import sqlite3
+import argparse
+import threading
+from typing import List, Set
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from db_pool import get_pool
+
+# Seconds a reserved port is held before the service using it has to be listening or registered
+LEASE_SECONDS = 300
+
+# TCP state code of listening sockets in /proc/net/tcp
+TCP_LISTEN = '0A'
+
+class PortAllocationError(Exception):
+    """No free port left in the range"""
+
+def create_port_tables(conn: sqlite3.Connection) -> None:
+    """Lease table shared by every allocator (and process) using the database"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS port_leases (
+            port INTEGER PRIMARY KEY,
+            owner TEXT,
+            expires_at REAL NOT NULL
+        )
+    ''')
+
+def has_sites_table(conn: sqlite3.Connection) -> bool:
+    """False on databases without the hosting tables, where no port is registered"""
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sites'").fetchone() is not None
+
+def listening_ports(proc_root: str = '/proc') -> Set[int]:
+    """Local TCP ports in LISTEN state, from one read of /proc/net/tcp and tcp6"""
+    ports = set()
+    for name in ('tcp', 'tcp6'):
+        try:
+            with open(os.path.join(proc_root, 'net', name), 'r') as f:
+                next(f, None)  # header
+                for line in f:
+                    fields = line.split()
+                    if len(fields) > 3 and fields[3] == TCP_LISTEN:
+                        ports.add(int(fields[1].rsplit(':', 1)[1], 16))
+        except (FileNotFoundError, ValueError):
+            continue
+    return ports
+
+#########################################################################
+# Allocator
+#########################################################################
+
+class PortAllocator:
+    """Hands out ports in [start, end] that no site, lease or socket uses
+
+    Used ports are kept in a bitmap with one byte per port, and a cursor
+    moves through it, so finding a candidate is a single bytearray search
+    instead of probing ports one by one. Reservations are rows in
+    port_leases (port is the primary key), which makes a reservation atomic
+    across threads and processes. A lease ends when the port is confirmed
+    in sites.python_port (itself uniquely indexed), when it is released or
+    when it expires. Ports that are never registered to a site, such as
+    those of edge functions, are held with a long lease under a named owner.
+    """
+
+    def __init__(self, pool, start: int = 8000, end: int = 9000, lease_seconds: int = LEASE_SECONDS,
+                 proc_root: str = '/proc'):
+        self.pool = pool
+        self.start = start
+        self.end = end
+        self.lease_seconds = lease_seconds
+        self.proc_root = proc_root
+        self._used = None
+        self._cursor = 0
+        self._lock = threading.Lock()
+
+    def _rebuild(self) -> None:
+        """Reload the bitmap from registered ports and live leases"""
+        used = bytearray(self.end - self.start + 1)
+        with self.pool.transaction() as conn:
+            create_port_tables(conn)
+            rows = conn.execute('''
+                SELECT port FROM port_leases WHERE expires_at >= ? AND port BETWEEN ? AND ?
+            ''', (time.time(), self.start, self.end)).fetchall()
+            if has_sites_table(conn):
+                rows += conn.execute('''
+                    SELECT python_port FROM sites WHERE python_port BETWEEN ? AND ?
+                ''', (self.start, self.end)).fetchall()
+        for (port,) in rows:
+            used[port - self.start] = 1
+        self._used = used
+
+    def _next_candidate(self) -> int:
+        index = self._used.find(0, self._cursor)
+        if index == -1:
+            index = self._used.find(0, 0, self._cursor)
+        if index == -1:
+            return -1
+        self._used[index] = 1
+        self._cursor = (index + 1) % len(self._used)
+        return self.start + index
+
+    def _reserve(self, port: int, owner: str, lease_seconds: int) -> bool:
+        now = time.time()
+        try:
+            with self.pool.transaction() as conn:
+                conn.execute('DELETE FROM port_leases WHERE port = ? AND expires_at < ?', (port, now))
+                conn.execute('INSERT INTO port_leases (port, owner, expires_at) VALUES (?, ?, ?)',
+                             (port, owner, now + lease_seconds))
+                # Registered by another process since the bitmap was loaded
+                if has_sites_table(conn) and \
+                        conn.execute('SELECT 1 FROM sites WHERE python_port = ?', (port,)).fetchone():
+                    raise sqlite3.IntegrityError(f'Port {port} is registered')
+        except sqlite3.IntegrityError:
+            return False
+        return True
+
+    def allocate(self, owner: str = '', lease_seconds: int = None) -> int:
+        """Reserve a free port and return it"""
+        lease_seconds = self.lease_seconds if lease_seconds is None else lease_seconds
+        with self._lock:
+            if self._used is None:
+                self._rebuild()
+            listening = listening_ports(self.proc_root)
+
+            for _ in range(2):
+                while True:
+                    port = self._next_candidate()
+                    if port == -1:
+                        break
+                    if port not in listening and self._reserve(port, owner, lease_seconds):
+                        return port
+                # Every bit is set: reclaim ports released by deleted sites or expired leases
+                self._rebuild()
+
+        raise PortAllocationError(f'No free port between {self.start} and {self.end}')
+
+    def confirm(self, port: int) -> None:
+        """End the lease of a port that is now registered to its site"""
+        with self.pool.transaction() as conn:
+            create_port_tables(conn)
+            conn.execute('DELETE FROM port_leases WHERE port = ?', (port,))
+
+    def release(self, port: int) -> None:
+        """Return a port to the pool (failed provisioning or a deleted app)"""
+        self.confirm(port)
+        self._free([port])
+
+    def release_owner(self, owner: str) -> List[int]:
+        """Release every port leased to an owner and return them"""
+        with self.pool.transaction() as conn:
+            create_port_tables(conn)
+            ports = [port for (port,) in conn.execute(
+                'SELECT port FROM port_leases WHERE owner = ?', (owner,)).fetchall()]
+            conn.execute('DELETE FROM port_leases WHERE owner = ?', (owner,))
+        self._free(ports)
+        return ports
+
+    def _free(self, ports: List[int]) -> None:
+        with self._lock:
+            if self._used is None:
+                return
+            for port in ports:
+                if self.start <= port <= self.end:
+                    self._used[port - self.start] = 0
+
+#########################################################################
+# Command line (used by the shell managers)
+#########################################################################
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Reserve a free local TCP port')
+    parser.add_argument('action', choices=['allocate', 'release'])
+    parser.add_argument('--db', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sites.db'))
+    parser.add_argument('--start', type=int, default=8000)
+    parser.add_argument('--end', type=int, default=9000)
+    parser.add_argument('--owner', default='')
+    parser.add_argument('--lease', type=int, default=LEASE_SECONDS)
+    parser.add_argument('--port', type=int)
+    args = parser.parse_args(argv)
+
+    allocator = PortAllocator(get_pool(args.db), args.start, args.end, args.lease)
+    try:
+        if args.action == 'release':
+            if args.port is not None:
+                allocator.release(args.port)
+            elif args.owner:
+                allocator.release_owner(args.owner)
+            else:
+                parser.error('release needs --port or --owner')
+            return 0
+        print(allocator.allocate(args.owner))
+    except (PortAllocationError, sqlite3.Error) as e:
+        print(str(e), file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
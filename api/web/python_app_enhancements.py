@@ -15,9 +15,7 @@ Support: https://support.aemdpc.com
 """
 
 import os
-import json
-import sqlite3
-import subprocess
+import shutil
 import secrets
 import logging
 from datetime import datetime
@@ -26,12 +24,43 @@ from functools import wraps
 
 # Import from hosting management
 from hosting_management import (
-    app, require_auth, SITES_DB_PATH, helpers,
-    get_python_apps, create_python_app, setup_python_environment
+    app, require_auth, sites_db, helpers,
+    get_python_apps, create_python_app, setup_python_environment,
+    PYTHON_CACHE_DIR, venv_cache,
+    get_python_app_service, run_systemctl, set_python_service_directory,
+    python_app_unit_name, unit_supports_reload
 )
+from app_metrics import AppMetricsCollector
+from app_prober import ResponseProber
+from python_packages import PackageManager
+from releases import GitReleases, DeployError
+from env_store import EnvStore, needs_restart
 
 logger = logging.getLogger(__name__)
 
+# Shared sampler for every Python app's CPU, memory and IO figures
+app_metrics = AppMetricsCollector(interval=5)
+
+# Shared health prober for every Python app's response times
+app_prober = ResponseProber(interval=10)
+
+# Batch installer and package listings, sharing the template wheelhouse
+python_packages = PackageManager(os.path.join(PYTHON_CACHE_DIR, 'pip'), find_links=venv_cache.wheelhouse)
+
+# Parsed .env files of every Python app
+env_store = EnvStore()
+
+def start_app_probes():
+    """Register every Python app that has a port and start the prober"""
+    if not app_prober.running:
+        rows = sites_db.query('''
+            SELECT id, python_port FROM sites
+            WHERE site_type = 'python' AND python_port IS NOT NULL
+        ''')
+        for site_id, python_port in rows:
+            app_prober.register(site_id, python_port)
+        app_prober.start()
+
 #########################################################################
 # Enhanced Python Application Management
 #########################################################################
@@ -77,6 +106,34 @@ def api_deploy_python_from_git():
         logger.error(f"Error deploying Python app from Git: {str(e)}")
         return jsonify({'success': False, 'message': f'Error: {str(e)}'}), 500
 
+@app.route('/api/python-apps/<int:site_id>/releases', methods=['GET'])
+@require_auth
+def api_get_python_releases(site_id):
+    """List Git releases of a Python application"""
+    try:
+        row = sites_db.query_one('SELECT document_root FROM sites WHERE id = ?', (site_id,))
+        if not row:
+            return jsonify({'success': False, 'message': 'Site not found'}), 404
+        
+        return jsonify({'success': True, 'releases': GitReleases(row[0]).list_releases()})
+        
+    except Exception as e:
+        logger.error(f"Error listing Python releases: {str(e)}")
+        return jsonify({'success': False, 'message': f'Error: {str(e)}'}), 500
+
+@app.route('/api/python-apps/<int:site_id>/rollback', methods=['POST'])
+@require_auth
+def api_rollback_python_release(site_id):
+    """Roll a Python application back to an earlier release"""
+    try:
+        data = request.get_json(silent=True) or {}
+        result = rollback_python_release(site_id, data.get('release'))
+        return jsonify(result), (200 if result['success'] else 400)
+        
+    except Exception as e:
+        logger.error(f"Error rolling back Python app: {str(e)}")
+        return jsonify({'success': False, 'message': f'Error: {str(e)}'}), 500
+
 @app.route('/api/python-apps/<int:site_id>/environment', methods=['GET'])
 @require_auth
 def api_get_python_environment(site_id):
@@ -182,109 +239,148 @@ def deploy_from_git_repository(site_id, git_repo, git_branch='main'):
     """Deploy Python application from Git repository"""
     try:
         # Get site info
-        conn = sqlite3.connect(SITES_DB_PATH)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT document_root, python_venv_path, domain, subdomain, python_framework
+        row = sites_db.query_one('''
+            SELECT document_root, python_venv_path, domain, subdomain, python_framework, python_port
             FROM sites WHERE id = ?
         ''', (site_id,))
         
-        row = cursor.fetchone()
-        conn.close()
-        
         if not row:
             return {'success': False, 'message': 'Site not found'}
         
-        document_root, venv_path, domain, subdomain, framework = row
-        
-        # Clone repository
-        clone_result = subprocess.run([
-            'git', 'clone', '-b', git_branch, git_repo, f"{document_root}/src"
-        ], capture_output=True, text=True)
-        
-        if clone_result.returncode != 0:
-            return {'success': False, 'message': f'Git clone failed: {clone_result.stderr}'}
-        
-        # Copy application files
-        src_dir = f"{document_root}/src"
+        document_root, venv_path, domain, subdomain, framework, python_port = row
+        releases = GitReleases(document_root)
         
-        # Install dependencies if requirements.txt exists
-        requirements_file = os.path.join(src_dir, 'requirements.txt')
-        if os.path.exists(requirements_file):
-            # Copy requirements.txt to root
-            subprocess.run(['cp', requirements_file, document_root])
+        with releases.locked():
+            # Fetch into the persistent cache and build a release from it
+            commit = releases.fetch(git_repo, git_branch)
+            release = releases.build(commit, git_repo, git_branch)
             
-            # Install dependencies
-            pip_path = f"{venv_path}/bin/pip" if os.name != 'nt' else f"{venv_path}\\Scripts\\pip"
-            pip_result = subprocess.run([
-                pip_path, 'install', '-r', requirements_file
-            ], capture_output=True, text=True)
+            # Reinstall dependencies only when requirements.txt changed
+            requirements_result = sync_release_requirements(releases, release, venv_path)
+            if not requirements_result['success']:
+                releases.discard(release['id'])
+                return requirements_result
             
-            if pip_result.returncode != 0:
-                return {'success': False, 'message': f'Dependency installation failed: {pip_result.stderr}'}
-        
-        # Copy application files
-        for item in os.listdir(src_dir):
-            if item not in ['.git', '.gitignore', 'README.md']:
-                src_path = os.path.join(src_dir, item)
-                dest_path = os.path.join(document_root, item)
-                if os.path.isdir(src_path):
-                    subprocess.run(['cp', '-r', src_path, dest_path])
-                else:
-                    subprocess.run(['cp', src_path, dest_path])
+            releases.activate(release['id'])
         
-        # Update database with Git info
-        conn = sqlite3.connect(SITES_DB_PATH)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            UPDATE sites 
-            SET python_requirements_file = ?, updated_at = CURRENT_TIMESTAMP
-            WHERE id = ?
-        ''', (f"{document_root}/requirements.txt", site_id))
+        switch_result = restart_release_service(site_id, releases)
+        if not switch_result['success']:
+            return switch_result
         
-        conn.commit()
-        conn.close()
+        # Update database with Git info
+        with sites_db.transaction() as conn:
+            conn.execute('''
+                UPDATE sites 
+                SET python_requirements_file = ?, updated_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            ''', (f"{document_root}/requirements.txt", site_id))
+        
+        # Compare tail latency of the new release against the previous one
+        if python_port:
+            app_prober.register(site_id, python_port)
+            app_prober.mark_deploy(site_id)
         
         return {
             'success': True, 
             'message': 'Application deployed successfully from Git',
             'git_repo': git_repo,
-            'git_branch': git_branch
+            'git_branch': git_branch,
+            'release': release,
+            'requirements_installed': requirements_result['installed']
         }
         
+    except DeployError as e:
+        return {'success': False, 'message': str(e)}
     except Exception as e:
         return {'success': False, 'message': f'Deployment failed: {str(e)}'}
 
+def sync_release_requirements(releases, release, venv_path):
+    """Install a release's requirements into the app venv if they differ from what is installed"""
+    requirements_hash = release['requirements_hash']
+    if not requirements_hash or requirements_hash == releases.installed_requirements():
+        return {'success': True, 'installed': False}
+    
+    requirements_file = os.path.join(releases.release_path(release['id']), 'requirements.txt')
+    result = python_packages.install_requirements(venv_path, requirements_file)
+    if not result['success']:
+        return result
+    
+    releases.set_installed_requirements(requirements_hash)
+    # Keep the app's top-level requirements.txt in step with the live release
+    shutil.copyfile(requirements_file, os.path.join(releases.document_root, 'requirements.txt'))
+    return {'success': True, 'installed': True}
+
+def restart_release_service(site_id, releases):
+    """Run the app from `current` and restart it on the newly activated release"""
+    service_name = get_python_app_service(site_id)
+    if not service_name:
+        return {'success': False, 'message': 'Release activated but the application has no systemd service to restart'}
+    
+    try:
+        set_python_service_directory(service_name, releases.current)
+    except OSError as e:
+        return {'success': False, 'message': f'Failed to update service {service_name}: {str(e)}'}
+    
+    # The server resolves its working directory at start, so the new release needs a restart
+    ok, error = run_systemctl('restart', [service_name])
+    if not ok:
+        return {'success': False, 'message': f'Release activated but {service_name} failed to restart: {error}'}
+    return {'success': True}
+
+def rollback_python_release(site_id, release_id=None):
+    """Switch a Git-deployed app back to an earlier release (default: the previous one)"""
+    try:
+        row = sites_db.query_one('''
+            SELECT document_root, python_venv_path, python_port FROM sites WHERE id = ?
+        ''', (site_id,))
+        
+        if not row:
+            return {'success': False, 'message': 'Site not found'}
+        
+        document_root, venv_path, python_port = row
+        releases = GitReleases(document_root)
+        
+        with releases.locked():
+            release = releases.get_release(release_id, offset=-1)
+            if not release or not os.path.isdir(releases.release_path(release['id'])):
+                return {'success': False, 'message': 'No release to roll back to'}
+            
+            requirements_result = sync_release_requirements(releases, release, venv_path)
+            if not requirements_result['success']:
+                return requirements_result
+            
+            releases.activate(release['id'])
+        
+        switch_result = restart_release_service(site_id, releases)
+        if not switch_result['success']:
+            return switch_result
+        
+        if python_port:
+            app_prober.register(site_id, python_port)
+            app_prober.mark_deploy(site_id)
+        
+        return {'success': True, 'message': f"Rolled back to release {release['id']}", 'release': release}
+        
+    except DeployError as e:
+        return {'success': False, 'message': str(e)}
+    except Exception as e:
+        return {'success': False, 'message': f'Rollback failed: {str(e)}'}
+
 def get_python_environment_variables(site_id):
     """Get environment variables for Python application"""
     try:
         # Get site info
-        conn = sqlite3.connect(SITES_DB_PATH)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
+        row = sites_db.query_one('''
             SELECT document_root FROM sites WHERE id = ?
         ''', (site_id,))
         
-        row = cursor.fetchone()
-        conn.close()
-        
         if not row:
             return {}
         
         document_root = row[0]
         env_file = os.path.join(document_root, '.env')
         
-        env_vars = {}
-        if os.path.exists(env_file):
-            with open(env_file, 'r') as f:
-                for line in f:
-                    line = line.strip()
-                    if line and not line.startswith('#') and '=' in line:
-                        key, value = line.split('=', 1)
-                        env_vars[key.strip()] = value.strip()
+        env_vars = env_store.read(env_file)
         
         return env_vars
         
@@ -296,43 +392,42 @@ def update_python_environment_variables(site_id, env_vars):
     """Update environment variables for Python application"""
     try:
         # Get site info
-        conn = sqlite3.connect(SITES_DB_PATH)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT document_root, domain, subdomain FROM sites WHERE id = ?
+        row = sites_db.query_one('''
+            SELECT document_root, domain, subdomain, python_framework FROM sites WHERE id = ?
         ''', (site_id,))
         
-        row = cursor.fetchone()
-        conn.close()
-        
         if not row:
             return {'success': False, 'message': 'Site not found'}
         
-        document_root, domain, subdomain = row
+        document_root, domain, subdomain, framework = row
         env_file = os.path.join(document_root, '.env')
         
         # Write environment variables to .env file
-        with open(env_file, 'w') as f:
-            f.write(f"# Environment variables for {domain}\n")
-            f.write(f"# Generated on {datetime.now().isoformat()}\n\n")
-            
-            for key, value in env_vars.items():
-                f.write(f"{key}={value}\n")
+        changes = env_store.write(env_file, env_vars,
+                                  f"Environment variables for {domain}\nGenerated on {datetime.now().isoformat()}")
+        if not changes['modified']:
+            return {'success': True, 'message': 'Environment variables unchanged', 'changes': changes}
         
-        # Restart the application service if using systemd
-        app_name = f"{domain}_{subdomain}" if subdomain else domain
-        app_name = app_name.replace('.', '_').replace('-', '_')
+        # Gunicorn units with an ExecReload re-read .env in fresh workers on HUP; any
+        # other server, or a change to settings read at start, needs a restart
+        service_name = get_python_app_service(site_id) or python_app_unit_name(domain, subdomain)
+        action = 'restart'
         
         if helpers and os.name != 'nt':
-            restart_result = subprocess.run([
-                'systemctl', 'restart', f"{app_name}.service"
-            ], capture_output=True, text=True)
+            if framework != 'fastapi' and not needs_restart(changes) and unit_supports_reload(service_name):
+                action = 'reload'
+            ok, error = run_systemctl(action, [service_name])
+            
+            if not ok and action == 'reload':
+                logger.warning(f"Failed to reload service {service_name}, restarting it: {error}")
+                action = 'restart'
+                ok, error = run_systemctl(action, [service_name])
             
-            if restart_result.returncode != 0:
-                logger.warning(f"Failed to restart service {app_name}: {restart_result.stderr}")
+            if not ok:
+                logger.warning(f"Failed to {action} service {service_name}: {error}")
         
-        return {'success': True, 'message': 'Environment variables updated successfully'}
+        changes['action'] = action
+        return {'success': True, 'message': 'Environment variables updated successfully', 'changes': changes}
         
     except Exception as e:
         return {'success': False, 'message': f'Error updating environment: {str(e)}'}
@@ -341,31 +436,17 @@ def get_python_dependencies(site_id):
     """Get installed Python dependencies"""
     try:
         # Get site info
-        conn = sqlite3.connect(SITES_DB_PATH)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
+        row = sites_db.query_one('''
             SELECT python_venv_path FROM sites WHERE id = ?
         ''', (site_id,))
         
-        row = cursor.fetchone()
-        conn.close()
-        
         if not row:
             return []
         
         venv_path = row[0]
-        pip_path = f"{venv_path}/bin/pip" if os.name != 'nt' else f"{venv_path}\\Scripts\\pip"
         
-        # Get installed packages
-        result = subprocess.run([
-            pip_path, 'list', '--format=json'
-        ], capture_output=True, text=True)
-        
-        if result.returncode == 0:
-            return json.loads(result.stdout)
-        else:
-            return []
+        # Get installed packages (cached until the venv changes)
+        return python_packages.list_packages(venv_path)
             
     except Exception as e:
         logger.error(f"Error getting dependencies: {str(e)}")
@@ -375,41 +456,17 @@ def install_python_dependencies(site_id, packages):
     """Install Python dependencies"""
     try:
         # Get site info
-        conn = sqlite3.connect(SITES_DB_PATH)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
+        row = sites_db.query_one('''
             SELECT python_venv_path, document_root FROM sites WHERE id = ?
         ''', (site_id,))
         
-        row = cursor.fetchone()
-        conn.close()
-        
         if not row:
             return {'success': False, 'message': 'Site not found'}
         
         venv_path, document_root = row
-        pip_path = f"{venv_path}/bin/pip" if os.name != 'nt' else f"{venv_path}\\Scripts\\pip"
-        
-        # Install packages
-        for package in packages:
-            install_result = subprocess.run([
-                pip_path, 'install', package
-            ], capture_output=True, text=True)
-            
-            if install_result.returncode != 0:
-                return {'success': False, 'message': f'Failed to install {package}: {install_result.stderr}'}
-        
-        # Update requirements.txt
-        freeze_result = subprocess.run([
-            pip_path, 'freeze'
-        ], capture_output=True, text=True)
-        
-        if freeze_result.returncode == 0:
-            with open(f"{document_root}/requirements.txt", 'w') as f:
-                f.write(freeze_result.stdout)
         
-        return {'success': True, 'message': f'Successfully installed {len(packages)} packages'}
+        # Install all packages in one resolve and pin them in requirements.txt
+        return python_packages.install(venv_path, packages, f"{document_root}/requirements.txt")
         
     except Exception as e:
         return {'success': False, 'message': f'Error installing dependencies: {str(e)}'}
@@ -418,22 +475,18 @@ def get_python_performance_metrics(site_id):
     """Get performance metrics for Python application"""
     try:
         # Get site info
-        conn = sqlite3.connect(SITES_DB_PATH)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT domain, subdomain, python_port FROM sites WHERE id = ?
+        row = sites_db.query_one('''
+            SELECT domain, subdomain, document_root, python_wsgi_file, python_port
+            FROM sites WHERE id = ?
         ''', (site_id,))
         
-        row = cursor.fetchone()
-        conn.close()
-        
         if not row:
             return {}
         
-        domain, subdomain, python_port = row
-        app_name = f"{domain}_{subdomain}" if subdomain else domain
-        app_name = app_name.replace('.', '_').replace('-', '_')
+        domain, subdomain, document_root, service_name, python_port = row
+        if not service_name:
+            app_name = f"{domain}_{subdomain}" if subdomain else domain
+            service_name = app_name.replace('.', '_').replace('-', '_')
         
         metrics = {
             'cpu_usage': 0,
@@ -445,28 +498,22 @@ def get_python_performance_metrics(site_id):
         }
         
         if os.name != 'nt':  # Linux only
-            # Get service status
-            status_result = subprocess.run([
-                'systemctl', 'is-active', f"{app_name}.service"
-            ], capture_output=True, text=True)
-            
-            metrics['status'] = status_result.stdout.strip() if status_result.returncode == 0 else 'inactive'
-            
-            # Get basic process info if service is active
-            if metrics['status'] == 'active':
-                # This is a simplified version - in production you'd use proper monitoring tools
-                ps_result = subprocess.run([
-                    'ps', 'aux'
-                ], capture_output=True, text=True)
-                
-                if ps_result.returncode == 0:
-                    for line in ps_result.stdout.split('\n'):
-                        if app_name in line and 'python' in line:
-                            parts = line.split()
-                            if len(parts) >= 11:
-                                metrics['cpu_usage'] = float(parts[2])
-                                metrics['memory_usage'] = float(parts[3])
-                            break
+            # Sampled in the background for all apps; until the first sample
+            # of a newly registered app lands the placeholders are returned
+            app_metrics.register(site_id, service_name, document_root)
+            app_metrics.start()
+            sample = app_metrics.get(site_id)
+            if sample:
+                metrics.update(sample)
+            else:
+                metrics['status'] = 'collecting'
+        
+        if python_port:
+            start_app_probes()
+            app_prober.register(site_id, python_port)
+            latency = app_prober.get(site_id)
+            metrics['response_time'] = latency['p50']
+            metrics['latency'] = latency
         
         return metrics
         
@@ -478,16 +525,10 @@ def setup_python_database(site_id, db_type, db_name=None):
     """Setup database for Python application"""
     try:
         # Get site info
-        conn = sqlite3.connect(SITES_DB_PATH)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
+        row = sites_db.query_one('''
             SELECT domain, subdomain FROM sites WHERE id = ?
         ''', (site_id,))
         
-        row = cursor.fetchone()
-        conn.close()
-        
         if not row:
             return {'success': False, 'message': 'Site not found'}
         
@@ -540,16 +581,10 @@ def setup_python_ssl_certificate(site_id, email=None):
     """Setup SSL certificate for Python application"""
     try:
         # Get site info
-        conn = sqlite3.connect(SITES_DB_PATH)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
+        row = sites_db.query_one('''
             SELECT domain, subdomain FROM sites WHERE id = ?
         ''', (site_id,))
         
-        row = cursor.fetchone()
-        conn.close()
-        
         if not row:
             return {'success': False, 'message': 'Site not found'}
         
@@ -562,17 +597,12 @@ def setup_python_ssl_certificate(site_id, email=None):
             
             if ssl_result['success']:
                 # Update database to mark SSL as enabled
-                conn = sqlite3.connect(SITES_DB_PATH)
-                cursor = conn.cursor()
-                
-                cursor.execute('''
-                    UPDATE sites 
-                    SET ssl_enabled = 1, updated_at = CURRENT_TIMESTAMP
-                    WHERE id = ?
-                ''', (site_id,))
-                
-                conn.commit()
-                conn.close()
+                with sites_db.transaction() as conn:
+                    conn.execute('''
+                        UPDATE sites 
+                        SET ssl_enabled = 1, updated_at = CURRENT_TIMESTAMP
+                        WHERE id = ?
+                    ''', (site_id,))
                 
                 return {
                     'success': True,
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+LOMP Stack v3.0 - Python Package Management
+Batch dependency installs and cached package listings for Python apps
+
+Author: Silviu Ilie <neosilviu@gmail.com>
+Company: aemdPC
+Version: 3.0.0
+Copyright © 2025 aemdPC. All rights reserved.
+License: MIT License
+
+Repository: https://github.com/aemdPC/lomp-stack-v3
+Documentation: https://docs.aemdpc.com/lomp-stack
+Support: https://support.aemdpc.com
+"""
+
+import os
+import re
+import glob
+import json
+import threading
+import subprocess
+from typing import Dict, List, Optional, Tuple
+
+PIP_TIMEOUT = 1800
+
+# Name part of a requirement line such as "Flask[async]>=2.3 ; python_version > '3.8'"
+REQUIREMENT_NAME = re.compile(r'^\s*([A-Za-z0-9][A-Za-z0-9._-]*)\s*(\[[^\]]*\])?\s*($|[<>=!~;@])')
+
+#########################################################################
+# Requirements
+#########################################################################
+
+def normalize_name(name: str) -> str:
+    """PEP 503 normalized project name"""
+    return re.sub(r'[-_.]+', '-', name).lower()
+
+def requirement_name(line: str) -> Optional[str]:
+    """Normalized project name of a requirement line, None for comments and options"""
+    line = line.split('#', 1)[0].strip()
+    if not line or line.startswith('-'):
+        return None
+    match = REQUIREMENT_NAME.match(line)
+    return normalize_name(match.group(1)) if match else None
+
+def pin_requirement(line: str, version: str) -> str:
+    """The requirement pinned to `version`, keeping its name, extras and marker"""
+    requirement = line.split('#', 1)[0].strip()
+    match = REQUIREMENT_NAME.match(requirement)
+    pinned = f"{match.group(1)}{match.group(2) or ''}=={version}"
+    if ';' in requirement:
+        pinned += f" ; {requirement.split(';', 1)[1].strip()}"
+    return pinned
+
+def update_requirements(path: str, requested: List[str], installed: Dict[str, str]) -> None:
+    """Pin newly installed packages in a requirements file, leaving other lines as they are
+
+    `installed` maps normalized names to versions. A package that already
+    has a line is re-pinned in place; new ones are appended as requested.
+    """
+    try:
+        with open(path, 'r') as f:
+            lines = f.read().splitlines()
+    except FileNotFoundError:
+        lines = []
+
+    remaining = {requirement_name(spec): spec for spec in requested}
+    remaining = {name: spec for name, spec in remaining.items() if name in installed}
+    for index, line in enumerate(lines):
+        name = requirement_name(line)
+        if name in remaining:
+            remaining.pop(name)
+            lines[index] = pin_requirement(line, installed[name])
+    lines.extend(pin_requirement(spec, installed[name]) for name, spec in remaining.items())
+
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+    os.replace(temp_path, path)
+
+#########################################################################
+# Package manager
+#########################################################################
+
+def venv_pip(venv_path: str) -> str:
+    return f"{venv_path}/bin/pip" if os.name != 'nt' else f"{venv_path}\\Scripts\\pip"
+
+def site_packages(venv_path: str) -> List[str]:
+    if os.name == 'nt':
+        return [os.path.join(venv_path, 'Lib', 'site-packages')]
+    return sorted(glob.glob(os.path.join(venv_path, 'lib', 'python*', 'site-packages')))
+
+class PackageManager:
+    """Installs packages into app venvs and caches what each venv contains
+
+    All packages of a request go to one pip process, so they are resolved
+    together and the interpreter starts once. Downloads go through a shared
+    pip cache and the template wheelhouse. Listings are cached per venv and
+    dropped on install, or when site-packages changes outside the dashboard.
+    """
+
+    def __init__(self, cache_dir: str, find_links: Optional[str] = None):
+        self.cache_dir = cache_dir
+        self.find_links = find_links
+        self._listings: Dict[str, Tuple[Tuple, List[Dict]]] = {}
+        self._lock = threading.Lock()
+
+    def _stamp(self, venv_path: str) -> Tuple:
+        """Changes whenever a distribution is added to or removed from the venv"""
+        stamp = []
+        for path in site_packages(venv_path):
+            try:
+                stamp.append(os.stat(path).st_mtime_ns)
+            except OSError:
+                stamp.append(None)
+        return tuple(stamp)
+
+    def invalidate(self, venv_path: str) -> None:
+        with self._lock:
+            self._listings.pop(venv_path, None)
+
+    def list_packages(self, venv_path: str) -> List[Dict]:
+        """Installed packages as reported by `pip list --format=json`"""
+        stamp = self._stamp(venv_path)
+        with self._lock:
+            cached = self._listings.get(venv_path)
+        if cached and cached[0] == stamp:
+            return cached[1]
+
+        result = subprocess.run([venv_pip(venv_path), 'list', '--format=json', '--disable-pip-version-check'],
+                                capture_output=True, text=True, timeout=PIP_TIMEOUT)
+        if result.returncode != 0:
+            return []
+        packages = json.loads(result.stdout)
+        with self._lock:
+            self._listings[venv_path] = (stamp, packages)
+        return packages
+
+    def _pip_install(self, venv_path: str, args: List[str]) -> subprocess.CompletedProcess:
+        cmd = [venv_pip(venv_path), 'install', '--disable-pip-version-check', '--cache-dir', self.cache_dir]
+        if self.find_links and os.path.isdir(self.find_links):
+            cmd.extend(['--find-links', self.find_links])
+        try:
+            return subprocess.run(cmd + args, capture_output=True, text=True, timeout=PIP_TIMEOUT)
+        finally:
+            self.invalidate(venv_path)
+
+    def install_requirements(self, venv_path: str, requirements_file: str) -> Dict:
+        """Install a requirements file into a venv"""
+        result = self._pip_install(venv_path, ['-r', requirements_file])
+        if result.returncode != 0:
+            return {'success': False, 'message': f'Dependency installation failed: {result.stderr}'}
+        return {'success': True, 'message': 'Requirements installed'}
+
+    def install(self, venv_path: str, packages: List[str], requirements_file: Optional[str] = None) -> Dict:
+        """Install all `packages` with one pip run and pin them in requirements_file"""
+        packages = [package.strip() for package in packages if package and package.strip()]
+        if not packages:
+            return {'success': False, 'message': 'No packages given'}
+        names = [requirement_name(package) for package in packages]
+        invalid = [package for package, name in zip(packages, names) if name is None]
+        if invalid:
+            return {'success': False, 'message': f"Invalid package specifier: {', '.join(invalid)}"}
+
+        install_result = self._pip_install(venv_path, packages)
+
+        if install_result.returncode != 0:
+            return {'success': False, 'message': f'Failed to install packages: {install_result.stderr}'}
+
+        installed = {normalize_name(package['name']): package['version']
+                     for package in self.list_packages(venv_path)}
+        if requirements_file:
+            update_requirements(requirements_file, packages, installed)
+
+        return {'success': True, 'message': f'Successfully installed {len(packages)} packages',
+                'installed': {name: installed.get(name) for name in names}}
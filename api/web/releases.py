@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+"""
+LOMP Stack v3.0 - Git Release Deployment
+Release directories built from a cached shallow fetch and switched atomically
+
+Author: Silviu Ilie <neosilviu@gmail.com>
+Company: aemdPC
+Version: 3.0.0
+Copyright © 2025 aemdPC. All rights reserved.
+License: MIT License
+
+Repository: https://github.com/aemdPC/lomp-stack-v3
+Documentation: https://docs.aemdpc.com/lomp-stack
+Support: https://support.aemdpc.com
+"""
+
+import os
+import json
+import time
+import errno
+import shutil
+import hashlib
+import subprocess
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: release deploys are not used there
+    fcntl = None
+
+GIT_TIMEOUT = 600
+KEEP_RELEASES = 5
+RELEASE_MANIFEST = '.lomp-release.json'
+
+# Files kept in the document root and linked into every release
+SHARED_FILES = ['.env']
+
+# Release directories exposed at a fixed path in the document root (nginx serves /static/)
+LINKED_DIRS = ['static']
+
+class DeployError(Exception):
+    """A deploy step failed; the message is shown to the user"""
+
+def file_hash(path: str) -> Optional[str]:
+    try:
+        with open(path, 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except FileNotFoundError:
+        return None
+
+def replace_symlink(target: str, link_path: str) -> None:
+    """Point link_path at target with a single rename, so readers never see it missing"""
+    temp_path = f"{link_path}.tmp-{os.getpid()}"
+    if os.path.lexists(temp_path):
+        os.unlink(temp_path)
+    os.symlink(target, temp_path)
+    os.replace(temp_path, link_path)
+
+#########################################################################
+# Releases
+#########################################################################
+
+class GitReleases:
+    """Releases of one app's git repository under its document root
+
+    Layout:
+        .deploy/repo.git     bare repository, fetched with --depth=1
+        .deploy/state.json   releases, current release, installed requirements
+        releases/<id>/       one checkout per deploy
+        current -> releases/<id>
+
+    A release only writes the blobs that changed since the current release;
+    every other file is a hardlink into it. Releases must therefore be
+    treated as read-only.
+    """
+
+    def __init__(self, document_root: str, keep: int = KEEP_RELEASES):
+        self.document_root = document_root
+        self.keep = keep
+        self.deploy_dir = os.path.join(document_root, '.deploy')
+        self.cache = os.path.join(self.deploy_dir, 'repo.git')
+        self.state_file = os.path.join(self.deploy_dir, 'state.json')
+        self.releases_dir = os.path.join(document_root, 'releases')
+        self.current = os.path.join(document_root, 'current')
+
+    @contextmanager
+    def locked(self):
+        """Serialize deploys and rollbacks of this app"""
+        if fcntl is None:
+            raise DeployError('Release deploys are not supported on this platform')
+        os.makedirs(self.deploy_dir, exist_ok=True)
+        with open(os.path.join(self.deploy_dir, 'lock'), 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            yield
+
+    # State
+
+    def load_state(self) -> Dict:
+        try:
+            with open(self.state_file, 'r') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {'releases': [], 'current': None, 'installed_requirements': None}
+
+    def save_state(self, state: Dict) -> None:
+        temp_path = f"{self.state_file}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(state, f, indent=2)
+        os.replace(temp_path, self.state_file)
+
+    def release_path(self, release_id: str) -> str:
+        return os.path.join(self.releases_dir, release_id)
+
+    def list_releases(self) -> List[Dict]:
+        state = self.load_state()
+        return [dict(release, current=release['id'] == state['current']) for release in state['releases']]
+
+    # Git
+
+    def _git(self, args: List[str], **kwargs) -> subprocess.CompletedProcess:
+        result = subprocess.run(['git', '--git-dir', self.cache] + args,
+                                capture_output=True, timeout=GIT_TIMEOUT, **kwargs)
+        if result.returncode != 0:
+            stderr = result.stderr if isinstance(result.stderr, str) else result.stderr.decode(errors='replace')
+            raise DeployError(f"git {args[0]} failed: {stderr.strip()}")
+        return result
+
+    def fetch(self, repo: str, branch: str) -> str:
+        """Fetch the branch tip into the cache and return its commit
+
+        Only the newest commit is fetched, and objects already in the cache
+        from earlier deploys are not transferred again.
+        """
+        if not branch or branch.startswith('-'):
+            raise DeployError(f'Invalid branch: {branch}')
+        if not os.path.isdir(self.cache):
+            result = subprocess.run(['git', 'init', '--bare', '-q', self.cache], capture_output=True, text=True)
+            if result.returncode != 0:
+                raise DeployError(f'Failed to create repository cache: {result.stderr.strip()}')
+        self._git(['config', 'remote.origin.url', repo], text=True)
+        self._git(['fetch', '--depth=1', '--no-tags', '-q', 'origin',
+                   f'+refs/heads/{branch}:refs/remotes/origin/{branch}'], text=True)
+        return self._git(['rev-parse', f'refs/remotes/origin/{branch}^{{commit}}'], text=True).stdout.strip()
+
+    def _tree(self, commit: str) -> Dict[str, List[str]]:
+        """path -> [mode, blob] for every file and symlink in the commit"""
+        output = self._git(['ls-tree', '-r', '-z', '--full-tree', commit]).stdout
+        entries = {}
+        for record in output.split(b'\0'):
+            if not record:
+                continue
+            meta, path = record.split(b'\t', 1)
+            mode, kind, blob = meta.decode().split()
+            if kind == 'blob':  # submodules are not deployed
+                entries[path.decode('utf-8', errors='surrogateescape')] = [mode, blob]
+        return entries
+
+    # Build
+
+    def build(self, commit: str, repo: str, branch: str) -> Dict:
+        """Create a release directory for a fetched commit"""
+        state = self.load_state()
+        tree = self._tree(commit)
+
+        previous = None
+        if state['current'] and os.path.isdir(self.release_path(state['current'])):
+            previous = self.release_path(state['current'])
+            try:
+                with open(os.path.join(previous, RELEASE_MANIFEST), 'r') as f:
+                    previous_tree = json.load(f)['files']
+            except (FileNotFoundError, ValueError, KeyError):
+                previous = None
+        if previous is None:
+            previous_tree = {}
+
+        release_id = f"{time.strftime('%Y%m%d%H%M%S')}-{commit[:12]}"
+        path = self.release_path(release_id)
+        staging = f"{path}.build-{os.getpid()}"
+        shutil.rmtree(staging, ignore_errors=True)
+        os.makedirs(staging)
+
+        linked = 0
+        changed = []
+        try:
+            for name, (mode, blob) in tree.items():
+                target = os.path.join(staging, name)
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                if previous_tree.get(name) == [mode, blob] and mode != '120000':
+                    try:
+                        os.link(os.path.join(previous, name), target)
+                        linked += 1
+                        continue
+                    except OSError as e:
+                        if e.errno not in (errno.EXDEV, errno.EMLINK, errno.EPERM, errno.ENOENT):
+                            raise
+                changed.append((name, mode, blob))
+            self._write_blobs(staging, changed)
+
+            for name in SHARED_FILES:
+                if name not in tree:
+                    os.symlink(os.path.join('..', '..', name), os.path.join(staging, name))
+
+            with open(os.path.join(staging, RELEASE_MANIFEST), 'w') as f:
+                json.dump({'commit': commit, 'files': tree}, f)
+            os.rename(staging, path)
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+
+        release = {
+            'id': release_id,
+            'commit': commit,
+            'repo': repo,
+            'branch': branch,
+            'requirements_hash': file_hash(os.path.join(path, 'requirements.txt')),
+            'created_at': time.time(),
+            'files': len(tree),
+            'linked': linked,
+            'written': len(changed)
+        }
+        state['releases'].append(release)
+        self.save_state(state)
+        return release
+
+    def _write_blobs(self, root: str, entries: List) -> None:
+        """Write blob contents with one `git cat-file --batch` process"""
+        if not entries:
+            return
+        process = subprocess.Popen(['git', '--git-dir', self.cache, 'cat-file', '--batch'],
+                                   stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        try:
+            for name, mode, blob in entries:
+                process.stdin.write(f"{blob}\n".encode())
+                process.stdin.flush()
+                header = process.stdout.readline().split()
+                if len(header) != 3:
+                    raise DeployError(f'Object {blob} for {name} is missing from the repository cache')
+                data = process.stdout.read(int(header[2]))
+                process.stdout.read(1)  # trailing newline
+
+                target = os.path.join(root, name)
+                if mode == '120000':
+                    os.symlink(data.decode('utf-8', errors='surrogateescape'), target)
+                    continue
+                with open(target, 'wb') as f:
+                    f.write(data)
+                os.chmod(target, 0o755 if mode == '100755' else 0o644)
+        finally:
+            process.stdin.close()
+            process.wait()
+
+    def discard(self, release_id: str) -> None:
+        """Remove a release that never went live"""
+        state = self.load_state()
+        state['releases'] = [release for release in state['releases'] if release['id'] != release_id]
+        self.save_state(state)
+        shutil.rmtree(self.release_path(release_id), ignore_errors=True)
+
+    # Switch
+
+    def get_release(self, release_id: Optional[str] = None, offset: int = 0) -> Optional[Dict]:
+        """A release by id, or relative to the current one (offset=-1: the one before it)"""
+        state = self.load_state()
+        releases = state['releases']
+        if release_id:
+            return next((release for release in releases if release['id'] == release_id), None)
+        ids = [release['id'] for release in releases]
+        if state['current'] not in ids:
+            return None
+        index = ids.index(state['current']) + offset
+        return releases[index] if 0 <= index < len(releases) else None
+
+    def activate(self, release_id: str) -> None:
+        """Make a release current with an atomic symlink swap"""
+        state = self.load_state()
+        replace_symlink(os.path.join('releases', release_id), self.current)
+
+        # Fixed paths in the document root that resolve through `current`
+        for name in LINKED_DIRS:
+            link_path = os.path.join(self.document_root, name)
+            if not os.path.isdir(os.path.join(self.release_path(release_id), name)) or os.path.islink(link_path):
+                continue
+            if os.path.lexists(link_path):
+                os.replace(link_path, os.path.join(self.deploy_dir, f"{name}-before-releases"))
+            replace_symlink(os.path.join('current', name), link_path)
+
+        state['current'] = release_id
+        self.save_state(state)
+        self.prune()
+
+    def set_installed_requirements(self, requirements_hash: Optional[str]) -> None:
+        state = self.load_state()
+        state['installed_requirements'] = requirements_hash
+        self.save_state(state)
+
+    def installed_requirements(self) -> Optional[str]:
+        return self.load_state().get('installed_requirements')
+
+    def prune(self) -> None:
+        """Keep the newest `keep` releases, never removing the current one"""
+        state = self.load_state()
+        releases = state['releases']
+        removable = [release for release in releases[:-self.keep] if release['id'] != state['current']]
+        for release in removable:
+            shutil.rmtree(self.release_path(release['id']), ignore_errors=True)
+        removed = {release['id'] for release in removable}
+        state['releases'] = [release for release in releases if release['id'] not in removed]
+        self.save_state(state)
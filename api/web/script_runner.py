@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+"""
+LOMP Stack v3.0 - Script Runner
+Bounded, streaming execution of helper scripts with timeouts and resource limits
+
+Author: Silviu Ilie <neosilviu@gmail.com>
+Company: aemdPC
+Version: 3.0.0
+Copyright © 2025 aemdPC. All rights reserved.
+License: MIT License
+
+Repository: https://github.com/aemdPC/lomp-stack-v3
+Documentation: https://docs.aemdpc.com/lomp-stack
+Support: https://support.aemdpc.com
+"""
+
+import os
+import re
+import time
+import uuid
+import signal
+import logging
+import selectors
+import threading
+import subprocess
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Limits per script class: wall clock seconds, CPU seconds and address space (MiB) per process.
+# CPU and memory are rlimits, so they apply to every process a script starts, not to the sum.
+SCRIPT_CLASSES = {
+    'quick': {'timeout': 120, 'cpu': 60, 'memory_mb': 1024, 'log': False},
+    'default': {'timeout': 900, 'cpu': None, 'memory_mb': None, 'log': False},
+    'backup': {'timeout': 6 * 3600, 'cpu': None, 'memory_mb': 4096, 'log': True},
+    'install': {'timeout': 2 * 3600, 'cpu': None, 'memory_mb': None, 'log': True}
+}
+
+# Lines kept per run; older output is only in the run's log file
+RING_SIZE = 500
+
+# Longer lines are cut, so a script printing without newlines cannot grow the buffer
+MAX_LINE_BYTES = 8192
+
+# Seconds between SIGTERM and SIGKILL when a run is stopped
+KILL_GRACE = 5
+
+# "42%" or "[3/10]" anywhere in a line
+PROGRESS_PATTERN = re.compile(r'(?:(\d{1,3})(?:\.\d+)?\s?%|\[(\d+)\s*/\s*(\d+)\])')
+
+def limit_prefix(limits: Dict) -> List[str]:
+    """bash wrapper that applies a class's rlimits before exec'ing the command"""
+    settings = []
+    if limits.get('cpu'):
+        settings.append(f"ulimit -t {int(limits['cpu'])}")
+    if limits.get('memory_mb'):
+        settings.append(f"ulimit -v {int(limits['memory_mb']) * 1024}")
+    if not settings or os.name == 'nt':
+        return []
+    return ['bash', '-c', f"{' 2>/dev/null; '.join(settings)} 2>/dev/null; exec \"$@\"", 'lomp-run']
+
+def parse_progress(line: str) -> Optional[float]:
+    match = PROGRESS_PATTERN.search(line)
+    if not match:
+        return None
+    if match.group(1) is not None:
+        value = float(match.group(1))
+    else:
+        total = int(match.group(3))
+        value = int(match.group(2)) * 100.0 / total if total else None
+    return value if value is not None and 0 <= value <= 100 else None
+
+#########################################################################
+# Run
+#########################################################################
+
+class ScriptRun:
+    """State and recent output of one script execution"""
+
+    def __init__(self, command: List[str], script_class: str, log_path: Optional[str] = None):
+        self.id = uuid.uuid4().hex[:16]
+        self.command = command
+        self.script_class = script_class
+        self.log_path = log_path
+        self.status = 'running'
+        self.returncode = None
+        self.error = None
+        self.progress = None
+        self.lines = deque(maxlen=RING_SIZE)
+        self.line_count = 0
+        self.byte_count = 0
+        self.started_at = time.time()
+        self.finished_at = None
+        self.changed = threading.Condition()
+
+    @property
+    def done(self) -> bool:
+        return self.finished_at is not None
+
+    def add_line(self, stream: str, line: str) -> None:
+        progress = parse_progress(line)
+        with self.changed:
+            self.line_count += 1
+            self.lines.append((self.line_count, stream, line))
+            if progress is not None:
+                self.progress = progress
+            self.changed.notify_all()
+
+    def finish(self, status: str, returncode: Optional[int], error: Optional[str] = None) -> None:
+        with self.changed:
+            self.status = status
+            self.returncode = returncode
+            self.error = error
+            self.finished_at = time.time()
+            if status == 'completed':
+                self.progress = 100.0
+            self.changed.notify_all()
+
+    def output(self, stream: str) -> str:
+        """Retained lines of one stream"""
+        with self.changed:
+            return ''.join(f"{line}\n" for _, name, line in self.lines if name == stream)
+
+    def snapshot(self, since: int = 0) -> Dict:
+        with self.changed:
+            lines = [{'seq': seq, 'stream': stream, 'line': line}
+                     for seq, stream, line in self.lines if seq > since]
+            return {
+                'run_id': self.id,
+                'script_class': self.script_class,
+                'status': self.status,
+                'returncode': self.returncode,
+                'error': self.error,
+                'progress': self.progress,
+                'lines': lines,
+                'line_count': self.line_count,
+                'bytes': self.byte_count,
+                'truncated': self.line_count > len(self.lines),
+                'log_path': self.log_path,
+                'started_at': self.started_at,
+                'finished_at': self.finished_at,
+                'next': self.line_count
+            }
+
+    def wait(self, since: int, timeout: float) -> None:
+        """Block until there is output past `since` or the run finishes"""
+        with self.changed:
+            if self.line_count <= since and not self.done:
+                self.changed.wait(timeout)
+
+#########################################################################
+# Runner
+#########################################################################
+
+class ScriptRunner:
+    """Runs commands with per-class limits, keeping only a tail of their output
+
+    Output is read line by line from both pipes as it is produced, kept in
+    a RING_SIZE ring buffer and, for classes with 'log', appended to a log
+    file. Memory per run is therefore bounded whatever the script prints.
+    On timeout the whole process group gets SIGTERM, then SIGKILL.
+    """
+
+    def __init__(self, log_dir: Optional[str] = None, retention: float = 3600, max_runs: int = 200):
+        self.log_dir = log_dir
+        self.retention = retention
+        self.max_runs = max_runs
+        self._runs: Dict[str, ScriptRun] = {}
+        self._lock = threading.Lock()
+
+    def _limits(self, script_class: str) -> Dict:
+        return SCRIPT_CLASSES.get(script_class, SCRIPT_CLASSES['default'])
+
+    def _register(self, command: List[str], script_class: str) -> ScriptRun:
+        run = ScriptRun(command, script_class)
+        if self._limits(script_class)['log'] and self.log_dir:
+            os.makedirs(self.log_dir, exist_ok=True)
+            run.log_path = os.path.join(self.log_dir, f"{time.strftime('%Y%m%d-%H%M%S')}-{run.id}.log")
+        with self._lock:
+            self._prune()
+            self._runs[run.id] = run
+        return run
+
+    def run(self, command: List[str], script_class: str = 'default', cwd: Optional[str] = None,
+            timeout: Optional[float] = None, on_line: Optional[Callable[[str, str], None]] = None) -> ScriptRun:
+        """Run a command to completion and return its run"""
+        run = self._register(command, script_class)
+        self._execute(run, cwd, timeout, on_line)
+        return run
+
+    def start(self, command: List[str], script_class: str = 'default', cwd: Optional[str] = None,
+              timeout: Optional[float] = None, on_line: Optional[Callable[[str, str], None]] = None) -> ScriptRun:
+        """Run a command in the background; poll or wait on the returned run"""
+        run = self._register(command, script_class)
+        threading.Thread(target=self._execute, args=(run, cwd, timeout, on_line),
+                         name=f'script-run-{run.id}', daemon=True).start()
+        return run
+
+    def get(self, run_id: str) -> Optional[ScriptRun]:
+        with self._lock:
+            return self._runs.get(run_id)
+
+    def list_runs(self) -> List[Dict]:
+        with self._lock:
+            runs = sorted(self._runs.values(), key=lambda run: run.started_at, reverse=True)
+        return [{key: value for key, value in run.snapshot(run.line_count).items() if key != 'lines'}
+                for run in runs]
+
+    def _execute(self, run: ScriptRun, cwd: Optional[str], timeout: Optional[float],
+                 on_line: Optional[Callable[[str, str], None]]) -> None:
+        limits = self._limits(run.script_class)
+        timeout = limits['timeout'] if timeout is None else timeout
+        log_file = open(run.log_path, 'a', encoding='utf-8') if run.log_path else None
+        try:
+            process = subprocess.Popen(limit_prefix(limits) + run.command, cwd=cwd,
+                                       stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                                       stderr=subprocess.PIPE, start_new_session=True)
+        except OSError as e:
+            if log_file:
+                log_file.close()
+            run.finish('failed', None, str(e))
+            return
+
+        selector = selectors.DefaultSelector()
+        buffers = {}
+        for stream, pipe in (('stdout', process.stdout), ('stderr', process.stderr)):
+            selector.register(pipe, selectors.EVENT_READ, stream)
+            buffers[stream] = b''
+
+        def emit(stream: str, raw: bytes) -> None:
+            line = raw.decode('utf-8', errors='replace').rstrip('\r')
+            run.add_line(stream, line)
+            if log_file:
+                log_file.write(f"[{stream}] {line}\n")
+            if on_line:
+                try:
+                    on_line(stream, line)
+                except Exception as e:
+                    logger.warning(f"Script run {run.id} line callback failed: {str(e)}")
+
+        deadline = time.monotonic() + timeout if timeout else None
+        timed_out = False
+        try:
+            while selector.get_map():
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    timed_out = True
+                    break
+                for key, _ in selector.select(remaining):
+                    stream = key.data
+                    chunk = os.read(key.fileobj.fileno(), 65536)
+                    if not chunk:
+                        selector.unregister(key.fileobj)
+                        if buffers[stream]:
+                            emit(stream, buffers[stream][:MAX_LINE_BYTES])
+                        continue
+                    run.byte_count += len(chunk)
+                    *lines, rest = (buffers[stream] + chunk).split(b'\n')
+                    for raw in lines:
+                        emit(stream, raw[:MAX_LINE_BYTES])
+                    if len(rest) > MAX_LINE_BYTES:
+                        # No newline in sight: keep the start of the line, drop the rest
+                        emit(stream, rest[:MAX_LINE_BYTES])
+                        rest = b''
+                    buffers[stream] = rest
+
+            if timed_out:
+                self._kill_group(process)
+                run.finish('timeout', process.returncode, f'Timed out after {timeout}s')
+            else:
+                returncode = process.wait()
+                run.finish('completed' if returncode == 0 else 'failed', returncode)
+        except Exception as e:
+            self._kill_group(process)
+            run.finish('failed', process.returncode, str(e))
+        finally:
+            selector.close()
+            process.stdout.close()
+            process.stderr.close()
+            if log_file:
+                log_file.write(f"[exit] {run.status} {run.returncode}\n")
+                log_file.close()
+
+    def _kill_group(self, process: subprocess.Popen) -> None:
+        if os.name == 'nt':
+            process.kill()
+            process.wait()
+            return
+        try:
+            os.killpg(process.pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+        try:
+            process.wait(KILL_GRACE)
+        except subprocess.TimeoutExpired:
+            pass
+        # Children can outlive the leader, so the group is killed either way
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        process.wait()
+
+    def _prune(self) -> None:
+        """Forget finished runs past retention, and the oldest ones past max_runs"""
+        now = time.time()
+        for run_id in [run_id for run_id, run in self._runs.items()
+                       if run.done and now - run.finished_at > self.retention]:
+            del self._runs[run_id]
+        finished = sorted((run for run in self._runs.values() if run.done), key=lambda run: run.finished_at)
+        while len(self._runs) >= self.max_runs and finished:
+            del self._runs[finished.pop(0).id]
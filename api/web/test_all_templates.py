@@ -39,6 +39,9 @@ def test_all_templates():
                 'created_at': '2025-01-01 12:00:00'
             }
         ],
+        'site_counts': {'total': 1, 'active': 1, 'wp': 1, 'ssl': 1},
+        'pagination': {'page': 1, 'per_page': 50, 'total': 1, 'pages': 1},
+        'filters': {},
         'config': {
             'api': {
                 'host': 'localhost',
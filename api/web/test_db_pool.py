@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+test_db_pool.py - Part of LOMP Stack v3.0
+Part of LOMP Stack v3.0
+
+Author: Silviu Ilie <neosilviu@gmail.com>
+Company: aemdPC
+Version: 3.0.0
+Copyright © 2025 aemdPC. All rights reserved.
+License: MIT License
+
+Repository: https://github.com/aemdPC/lomp-stack-v3
+Documentation: https://docs.aemdpc.com/lomp-stack
+Support: https://support.aemdpc.com
+"""
+
+
+"""
+LOMP Stack v3.0 - SQLite Connection Pool Test
+Transactions, nesting and per-thread connections of SQLitePool
+"""
+
+import os
+import sys
+import sqlite3
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from db_pool import SQLitePool, get_pool
+
+@pytest.fixture
+def pool(tmp_path):
+    pool = SQLitePool(str(tmp_path / 'test.db'))
+    with pool.transaction() as conn:
+        conn.execute('CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT UNIQUE)')
+    yield pool
+    pool.close_all()
+
+def test_connection_uses_wal(pool):
+    assert pool.query_one('PRAGMA journal_mode')[0] == 'wal'
+
+def test_transaction_commits(pool, tmp_path):
+    with pool.transaction() as conn:
+        conn.execute("INSERT INTO items (name) VALUES ('a')")
+
+    # Visible to a connection that is not part of the pool
+    other = sqlite3.connect(str(tmp_path / 'test.db'))
+    try:
+        assert other.execute('SELECT name FROM items').fetchall() == [('a',)]
+    finally:
+        other.close()
+
+def test_transaction_rolls_back_on_exception(pool):
+    with pytest.raises(RuntimeError):
+        with pool.transaction() as conn:
+            conn.execute("INSERT INTO items (name) VALUES ('a')")
+            raise RuntimeError('boom')
+
+    assert pool.query('SELECT name FROM items') == []
+    assert not pool.connection().in_transaction
+
+    # The pool is usable again afterwards
+    with pool.transaction() as conn:
+        conn.execute("INSERT INTO items (name) VALUES ('b')")
+    assert pool.query('SELECT name FROM items') == [('b',)]
+
+def test_nested_transaction_joins_outer(pool):
+    with pool.transaction() as outer:
+        outer.execute("INSERT INTO items (name) VALUES ('a')")
+        with pool.transaction() as inner:
+            assert inner is outer
+            inner.execute("INSERT INTO items (name) VALUES ('b')")
+        # The inner block did not commit on its own
+        assert outer.in_transaction
+
+    assert pool.query('SELECT name FROM items ORDER BY name') == [('a',), ('b',)]
+
+def test_nested_failure_rolls_back_outer(pool):
+    with pytest.raises(sqlite3.IntegrityError):
+        with pool.transaction() as outer:
+            outer.execute("INSERT INTO items (name) VALUES ('a')")
+            with pool.transaction() as inner:
+                inner.execute("INSERT INTO items (name) VALUES ('a')")
+
+    assert pool.query('SELECT name FROM items') == []
+
+def test_connections_are_per_thread(pool):
+    main_conn = pool.connection()
+    assert pool.connection() is main_conn
+
+    seen = {}
+
+    def worker(name):
+        conn = pool.connection()
+        seen[name] = (conn, pool.connection() is conn)
+        with pool.transaction() as txn:
+            txn.execute('INSERT INTO items (name) VALUES (?)', (name,))
+
+    threads = [threading.Thread(target=worker, args=(f'thread-{i}',)) for i in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    connections = [conn for conn, _ in seen.values()]
+    assert all(same for _, same in seen.values())
+    assert len({id(conn) for conn in connections}) == 3
+    assert main_conn not in connections
+    assert len(pool.query('SELECT name FROM items')) == 3
+
+def test_get_pool_is_shared_per_file(tmp_path):
+    path = str(tmp_path / 'shared.db')
+    assert get_pool(path) is get_pool(os.path.join(str(tmp_path), '.', 'shared.db'))
+    assert get_pool(path) is not get_pool(str(tmp_path / 'other.db'))
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+test_log_tail.py - Part of LOMP Stack v3.0
+Part of LOMP Stack v3.0
+
+Author: Silviu Ilie <neosilviu@gmail.com>
+Company: aemdPC
+Version: 3.0.0
+Copyright © 2025 aemdPC. All rights reserved.
+License: MIT License
+
+Repository: https://github.com/aemdPC/lomp-stack-v3
+Documentation: https://docs.aemdpc.com/lomp-stack
+Support: https://support.aemdpc.com
+"""
+
+
+"""
+LOMP Stack v3.0 - Log Tail Test
+Paging backwards through logs with the block reader and the mmap scanner
+"""
+
+import os
+import re
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import log_tail
+from log_tail import scan_lines, tail_lines
+
+LEVELS = ['INFO', 'WARNING', 'ERROR']
+
+@pytest.fixture(params=[log_tail.TAIL_CHUNK_SIZE, 7], ids=['default-chunks', 'tiny-chunks'])
+def small_blocks(request, monkeypatch):
+    """Run with the real block sizes and with blocks smaller than one line"""
+    monkeypatch.setattr(log_tail, 'TAIL_CHUNK_SIZE', request.param)
+    monkeypatch.setattr(log_tail, 'SCAN_WINDOW_SIZE', max(request.param, 16))
+
+def write_log(tmp_path, count=25, trailing_newline=True):
+    lines = [f'2025-07-01 10:00:{i:02d} [{LEVELS[i % 3]}] message {i}' for i in range(count)]
+    path = tmp_path / 'stack.log'
+    path.write_bytes(('\n'.join(lines) + ('\n' if trailing_newline else '')).encode())
+    return str(path), lines
+
+def read_all_pages(reader, path, page_size, **filters):
+    pages = []
+    before = None
+    while True:
+        page = reader(path, page_size, before, **filters)
+        pages.append(page)
+        if not page['has_more']:
+            return pages
+        before = page['start']
+
+def test_tail_returns_last_lines(tmp_path, small_blocks):
+    path, lines = write_log(tmp_path)
+    page = tail_lines(path, 5)
+
+    assert page['lines'] == lines[-5:]
+    assert page['end'] == os.path.getsize(path)
+    assert page['has_more']
+
+def test_tail_pages_cover_file_without_gaps(tmp_path, small_blocks):
+    path, lines = write_log(tmp_path)
+    pages = read_all_pages(tail_lines, path, 4)
+
+    collected = [line for page in reversed(pages) for line in page['lines']]
+    assert collected == lines
+    # Each page ends where the newer one started
+    for newer, older in zip(pages, pages[1:]):
+        assert older['end'] == newer['start']
+    assert pages[-1]['start'] == 0
+
+def test_tail_partial_last_line(tmp_path, small_blocks):
+    path, lines = write_log(tmp_path, trailing_newline=False)
+
+    assert tail_lines(path, 2)['lines'] == lines[-2:]
+    collected = [line for page in reversed(read_all_pages(tail_lines, path, 3)) for line in page['lines']]
+    assert collected == lines
+
+def test_tail_pattern_filter(tmp_path, small_blocks):
+    path, lines = write_log(tmp_path)
+    page = tail_lines(path, 3, pattern=re.compile(r'\[ERROR\]'))
+
+    assert page['lines'] == [line for line in lines if '[ERROR]' in line][-3:]
+
+def test_tail_empty_file(tmp_path):
+    path = tmp_path / 'empty.log'
+    path.write_bytes(b'')
+    assert tail_lines(str(path), 10) == {'lines': [], 'start': 0, 'end': 0, 'has_more': False}
+
+def test_scan_level_pages(tmp_path, small_blocks):
+    path, lines = write_log(tmp_path)
+    errors = [line for line in lines if '[ERROR]' in line]
+
+    pages = read_all_pages(scan_lines, path, 3, levels=['error'])
+    assert [line for page in reversed(pages) for line in page['lines']] == errors
+    assert pages[0]['lines'] == errors[-3:]
+
+def test_scan_keyword_is_case_insensitive(tmp_path, small_blocks):
+    path, lines = write_log(tmp_path)
+    page = scan_lines(path, 10, keyword='MESSAGE 2')
+
+    assert page['lines'] == [line for line in lines if 'message 2' in line]
+    assert not page['has_more']
+
+def test_scan_level_and_keyword(tmp_path, small_blocks):
+    path, lines = write_log(tmp_path)
+    page = scan_lines(path, 10, levels=['warning'], keyword='message 1')
+
+    assert page['lines'] == [line for line in lines if '[WARNING]' in line and 'message 1' in line]
+
+def test_scan_partial_last_line(tmp_path, small_blocks):
+    path, lines = write_log(tmp_path, trailing_newline=False)
+    level = lines[-1].split('[')[1].split(']')[0]
+
+    assert scan_lines(path, 1, levels=[level])['lines'] == [lines[-1]]
+
+def test_scan_line_with_two_matches_is_returned_once(tmp_path, small_blocks):
+    path = tmp_path / 'stack.log'
+    path.write_bytes(b'[ERROR] first [ERROR] again\n[INFO] ok\n[ERROR] last\n')
+
+    page = scan_lines(str(path), 10, levels=['ERROR'])
+    assert page['lines'] == ['[ERROR] first [ERROR] again', '[ERROR] last']
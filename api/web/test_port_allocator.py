@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+test_port_allocator.py - Part of LOMP Stack v3.0
+Part of LOMP Stack v3.0
+
+Author: Silviu Ilie <neosilviu@gmail.com>
+Company: aemdPC
+Version: 3.0.0
+Copyright © 2025 aemdPC. All rights reserved.
+License: MIT License
+
+Repository: https://github.com/aemdPC/lomp-stack-v3
+Documentation: https://docs.aemdpc.com/lomp-stack
+Support: https://support.aemdpc.com
+"""
+
+
+"""
+LOMP Stack v3.0 - Port Allocator Test
+Leases shared through one database never hand out the same port twice
+"""
+
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import port_allocator
+from db_pool import SQLitePool
+from port_allocator import PortAllocationError, PortAllocator
+
+@pytest.fixture
+def proc_root(tmp_path):
+    """A /proc with no listening sockets"""
+    net = tmp_path / 'proc' / 'net'
+    net.mkdir(parents=True)
+    header = '  sl  local_address rem_address   st\n'
+    (net / 'tcp').write_text(header)
+    (net / 'tcp6').write_text(header)
+    return str(tmp_path / 'proc')
+
+def make_allocator(db_path, proc_root, start=8000, end=8009):
+    # A pool per allocator, as two processes sharing the file would have
+    return PortAllocator(SQLitePool(db_path), start, end, proc_root=proc_root)
+
+def test_two_allocators_never_share_a_port(tmp_path, proc_root):
+    db_path = str(tmp_path / 'sites.db')
+    first = make_allocator(db_path, proc_root, 8000, 8039)
+    second = make_allocator(db_path, proc_root, 8000, 8039)
+    ports = []
+    lock = threading.Lock()
+
+    def allocate(allocator):
+        for _ in range(10):
+            port = allocator.allocate('test')
+            with lock:
+                ports.append(port)
+
+    threads = [threading.Thread(target=allocate, args=(allocator,))
+               for allocator in (first, second, first, second)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(ports) == 40
+    assert len(set(ports)) == 40
+    with pytest.raises(PortAllocationError):
+        second.allocate('test')
+
+def test_registered_and_listening_ports_are_skipped(tmp_path, proc_root):
+    db_path = str(tmp_path / 'sites.db')
+    pool = SQLitePool(db_path)
+    with pool.transaction() as conn:
+        conn.execute('CREATE TABLE sites (id INTEGER PRIMARY KEY, python_port INTEGER)')
+        conn.execute('INSERT INTO sites (python_port) VALUES (8000)')
+    # 8001 in LISTEN state (0A)
+    with open(os.path.join(proc_root, 'net', 'tcp'), 'a') as f:
+        f.write('   0: 00000000:1F41 00000000:0000 0A\n')
+
+    allocator = PortAllocator(pool, 8000, 8009, proc_root=proc_root)
+    assert allocator.allocate('test') == 8002
+
+def test_database_without_sites_table(tmp_path, proc_root):
+    allocator = make_allocator(str(tmp_path / 'empty.db'), proc_root)
+    assert allocator.allocate('test') == 8000
+
+def test_expired_lease_is_reused(tmp_path, proc_root):
+    allocator = make_allocator(str(tmp_path / 'sites.db'), proc_root, 8000, 8000)
+    assert allocator.allocate('old', lease_seconds=-1) == 8000
+    assert allocator.allocate('new') == 8000
+
+def test_release_owner_frees_only_its_ports(tmp_path, proc_root):
+    db_path = str(tmp_path / 'sites.db')
+    allocator = make_allocator(db_path, proc_root, 8000, 8002)
+    edge_ports = [allocator.allocate('edge:api'), allocator.allocate('edge:api')]
+    other = allocator.allocate('edge:other')
+    with pytest.raises(PortAllocationError):
+        allocator.allocate('edge:third')
+
+    assert sorted(allocator.release_owner('edge:api')) == sorted(edge_ports)
+    assert allocator.release_owner('edge:api') == []
+
+    # Another allocator on the same database sees the released ports
+    fresh = make_allocator(db_path, proc_root, 8000, 8002)
+    assert sorted([fresh.allocate('edge:new'), fresh.allocate('edge:new')]) == sorted(edge_ports)
+    assert other not in edge_ports
+
+def test_cli_allocates_and_releases(tmp_path, capsys, monkeypatch):
+    monkeypatch.setattr(port_allocator, 'listening_ports', lambda proc_root='/proc': set())
+    db_path = str(tmp_path / 'sites.db')
+    args = ['--db', db_path, '--start', '3000', '--end', '3000']
+
+    assert port_allocator.main(['allocate', '--owner', 'edge:fn'] + args) == 0
+    assert capsys.readouterr().out.strip() == '3000'
+    assert port_allocator.main(['allocate', '--owner', 'edge:other'] + args) == 1
+
+    assert port_allocator.main(['release', '--owner', 'edge:fn'] + args) == 0
+    assert port_allocator.main(['allocate', '--owner', 'edge:other'] + args) == 0
+
+def test_cli_reports_database_errors(tmp_path, capsys):
+    bad_db = tmp_path / 'bad.db'
+    bad_db.write_text('not a database')
+
+    assert port_allocator.main(['allocate', '--db', str(bad_db)]) == 1
+    assert 'not a database' in capsys.readouterr().err
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+test_python_env.py - Part of LOMP Stack v3.0
+Part of LOMP Stack v3.0
+
+Author: Silviu Ilie <neosilviu@gmail.com>
+Company: aemdPC
+Version: 3.0.0
+Copyright © 2025 aemdPC. All rights reserved.
+License: MIT License
+
+Repository: https://github.com/aemdPC/lomp-stack-v3
+Documentation: https://docs.aemdpc.com/lomp-stack
+Support: https://support.aemdpc.com
+"""
+
+
+"""
+LOMP Stack v3.0 - Environment Variables Update Test
+A .env change must reach the app through a reload or a restart
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import python_app_enhancements
+from db_pool import SQLitePool
+from hosting_management import _create_sites_tables
+
+def make_app(tmp_path, monkeypatch, reloadable, reload_ok=True):
+    """Scratch Flask app with a fake systemctl; returns its id and the systemctl calls"""
+    pool = SQLitePool(str(tmp_path / 'sites.db'))
+    document_root = tmp_path / 'app'
+    document_root.mkdir()
+    with pool.transaction() as conn:
+        _create_sites_tables(conn)
+        site_id = conn.execute('''
+            INSERT INTO sites (domain, subdomain, document_root, site_type, python_framework)
+            VALUES ('example.com', 'api', ?, 'python', 'flask')
+        ''', (str(document_root),)).lastrowid
+
+    calls = []
+
+    def fake_systemctl(action, units):
+        calls.append((action, list(units)))
+        return action != 'reload' or reload_ok, ''
+
+    monkeypatch.setattr(python_app_enhancements, 'sites_db', pool)
+    monkeypatch.setattr(python_app_enhancements, 'helpers', object())
+    monkeypatch.setattr(python_app_enhancements, 'get_python_app_service', lambda site_id: 'example_com_api')
+    monkeypatch.setattr(python_app_enhancements, 'unit_supports_reload', lambda unit: reloadable)
+    monkeypatch.setattr(python_app_enhancements, 'run_systemctl', fake_systemctl)
+    return site_id, calls
+
+def test_gunicorn_unit_is_reloaded(tmp_path, monkeypatch):
+    site_id, calls = make_app(tmp_path, monkeypatch, reloadable=True)
+
+    result = python_app_enhancements.update_python_environment_variables(site_id, {'FEATURE': 'on'})
+
+    assert result['changes']['action'] == 'reload'
+    assert calls == [('reload', ['example_com_api'])]
+
+def test_unit_without_reload_is_restarted(tmp_path, monkeypatch):
+    site_id, calls = make_app(tmp_path, monkeypatch, reloadable=False)
+
+    result = python_app_enhancements.update_python_environment_variables(site_id, {'FEATURE': 'on'})
+
+    assert result['changes']['action'] == 'restart'
+    assert calls == [('restart', ['example_com_api'])]
+
+def test_failed_reload_falls_back_to_restart(tmp_path, monkeypatch):
+    site_id, calls = make_app(tmp_path, monkeypatch, reloadable=True, reload_ok=False)
+
+    result = python_app_enhancements.update_python_environment_variables(site_id, {'FEATURE': 'on'})
+
+    assert result['changes']['action'] == 'restart'
+    assert calls == [('reload', ['example_com_api']), ('restart', ['example_com_api'])]
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+test_python_releases.py - Part of LOMP Stack v3.0
+Part of LOMP Stack v3.0
+
+Author: Silviu Ilie <neosilviu@gmail.com>
+Company: aemdPC
+Version: 3.0.0
+Copyright © 2025 aemdPC. All rights reserved.
+License: MIT License
+
+Repository: https://github.com/aemdPC/lomp-stack-v3
+Documentation: https://docs.aemdpc.com/lomp-stack
+Support: https://support.aemdpc.com
+"""
+
+
+"""
+LOMP Stack v3.0 - Git Release Switch Test
+Activating a release must point the app's unit at `current` and restart it
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import hosting_management
+import python_app_enhancements
+from db_pool import SQLitePool
+from releases import GitReleases
+
+def make_site(tmp_path, monkeypatch, python_wsgi_file=None):
+    """Scratch sites database with one Python app, a unit directory and a fake systemctl"""
+    pool = SQLitePool(str(tmp_path / 'sites.db'))
+    with pool.transaction() as conn:
+        hosting_management._create_sites_tables(conn)
+        cursor = conn.execute('''
+            INSERT INTO sites (domain, subdomain, document_root, site_type, python_wsgi_file)
+            VALUES (?, ?, ?, 'python', ?)
+        ''', ('example.com', 'api', str(tmp_path / 'app'), python_wsgi_file))
+        site_id = cursor.lastrowid
+
+    unit_dir = tmp_path / 'units'
+    unit_dir.mkdir()
+    calls = []
+
+    def fake_systemctl(action, units):
+        calls.append((action, list(units)))
+        return True, ''
+
+    monkeypatch.setattr(hosting_management, 'sites_db', pool)
+    monkeypatch.setattr(hosting_management, 'SYSTEMD_UNIT_DIR', str(unit_dir))
+    monkeypatch.setattr(hosting_management, 'run_systemctl', fake_systemctl)
+    monkeypatch.setattr(python_app_enhancements, 'run_systemctl', fake_systemctl)
+    return site_id, unit_dir, calls
+
+def write_unit(unit_dir, name):
+    (unit_dir / f'{name}.service').write_text(
+        '[Service]\nWorkingDirectory=/srv/old\nExecStart=/venv/bin/python app.py\n')
+
+def test_release_switches_helper_built_unit(tmp_path, monkeypatch):
+    """Units created by the helpers are found by their domain-derived name"""
+    site_id, unit_dir, calls = make_site(tmp_path, monkeypatch)
+    write_unit(unit_dir, 'example_com_api')
+    releases = GitReleases(str(tmp_path / 'app'))
+
+    result = python_app_enhancements.restart_release_service(site_id, releases)
+
+    assert result['success'], result
+    unit = (unit_dir / 'example_com_api.service').read_text()
+    assert f'WorkingDirectory={releases.current}' in unit
+    assert ('daemon-reload', []) in calls
+    assert calls[-1] == ('restart', ['example_com_api'])
+
+def test_release_switches_recorded_unit(tmp_path, monkeypatch):
+    """A unit name stored in sites.python_wsgi_file takes precedence"""
+    site_id, unit_dir, calls = make_site(tmp_path, monkeypatch, 'python-example.com-api')
+    write_unit(unit_dir, 'python-example.com-api')
+    releases = GitReleases(str(tmp_path / 'app'))
+
+    result = python_app_enhancements.restart_release_service(site_id, releases)
+
+    assert result['success'], result
+    assert f'WorkingDirectory={releases.current}' in (unit_dir / 'python-example.com-api.service').read_text()
+    assert calls[-1] == ('restart', ['python-example.com-api'])
+
+def test_release_without_unit_fails(tmp_path, monkeypatch):
+    """No unit to restart means the new release is not being served"""
+    site_id, unit_dir, calls = make_site(tmp_path, monkeypatch)
+
+    result = python_app_enhancements.restart_release_service(site_id, GitReleases(str(tmp_path / 'app')))
+
+    assert not result['success']
+    assert calls == []
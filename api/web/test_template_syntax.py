@@ -53,6 +53,9 @@ def test_sites_template():
         # Render the template
         rendered = template.render(
             sites=test_sites,
+            site_counts={'total': 2, 'active': 1, 'wp': 1, 'ssl': 1},
+            pagination={'page': 1, 'per_page': 50, 'total': 2, 'pages': 1},
+            filters={},
             session={'admin_id': 1, 'username': 'admin'},
             request=type('obj', (object,), {'endpoint': 'sites'})(),
             get_flashed_messages=lambda with_categories=False: []
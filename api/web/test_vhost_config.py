@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+test_vhost_config.py - Part of LOMP Stack v3.0
+Part of LOMP Stack v3.0
+
+Author: Silviu Ilie <neosilviu@gmail.com>
+Company: aemdPC
+Version: 3.0.0
+Copyright © 2025 aemdPC. All rights reserved.
+License: MIT License
+
+Repository: https://github.com/aemdPC/lomp-stack-v3
+Documentation: https://docs.aemdpc.com/lomp-stack
+Support: https://support.aemdpc.com
+"""
+
+
+"""
+LOMP Stack v3.0 - Vhost Transaction Test
+A failed config test puts back every file of the transaction
+"""
+
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from vhost_config import VhostConfigError, VhostManager
+
+pytestmark = pytest.mark.skipif(os.name == 'nt', reason='vhost transactions need POSIX renames and symlinks')
+
+def make_manager(tmp_path, failing_test=None, reload_delay=0.0):
+    """Two servers under tmp_path whose tests and reloads are shell commands"""
+    reload_log = tmp_path / 'reloads.log'
+    servers = {}
+    for server in ('nginx', 'apache'):
+        root = tmp_path / server
+        (root / 'sites-available').mkdir(parents=True)
+        (root / 'sites-enabled').mkdir()
+        servers[server] = {
+            'config_root': str(root),
+            'available': 'sites-available/{name}',
+            'enabled': 'sites-enabled/{name}',
+            'test': ['sh', '-c', 'echo syntax error >&2; exit 1'] if server == failing_test else ['true'],
+            'reload': ['sh', '-c', f'echo {server} >> "{reload_log}"']
+        }
+    manager = VhostManager(servers, reload_delay=reload_delay, lock_path=str(tmp_path / 'vhosts.lock'))
+    return manager, reload_log
+
+def available(tmp_path, server, name):
+    return tmp_path / server / 'sites-available' / name
+
+def enabled(tmp_path, server, name):
+    return tmp_path / server / 'sites-enabled' / name
+
+def install_existing(manager):
+    with manager.transaction(reload='none') as txn:
+        for server in ('nginx', 'apache'):
+            txn.write(server, 'changed.example.com', f'{server} original')
+            txn.write(server, 'removed.example.com', f'{server} removed')
+
+def snapshot(tmp_path):
+    """Every file and symlink under the server config roots"""
+    state = {}
+    for server in ('nginx', 'apache'):
+        for root, dirs, files in os.walk(tmp_path / server):
+            for name in files:
+                path = os.path.join(root, name)
+                state[path] = os.readlink(path) if os.path.islink(path) else open(path).read()
+    return state
+
+def test_commit_writes_and_links(tmp_path):
+    manager, reload_log = make_manager(tmp_path)
+
+    with manager.transaction(reload='now') as txn:
+        txn.write('nginx', 'site.example.com', 'server {}')
+
+    assert txn.result['success']
+    assert available(tmp_path, 'nginx', 'site.example.com').read_text() == 'server {}'
+    assert os.readlink(enabled(tmp_path, 'nginx', 'site.example.com')) == \
+        str(available(tmp_path, 'nginx', 'site.example.com'))
+    assert reload_log.read_text().split() == ['nginx']
+
+def test_failed_test_restores_every_file(tmp_path):
+    manager, reload_log = make_manager(tmp_path, failing_test='apache')
+    install_existing(manager)
+    before = snapshot(tmp_path)
+
+    with manager.transaction(reload='now') as txn:
+        for server in ('nginx', 'apache'):
+            txn.write(server, 'changed.example.com', f'{server} updated')
+            txn.remove(server, 'removed.example.com')
+            txn.write(server, 'new.example.com', f'{server} new')
+
+    assert not txn.result['success']
+    assert txn.result['server'] == 'apache'
+    assert 'syntax error' in txn.result['message']
+    # nginx passed its test, but its part of the transaction is undone too
+    assert snapshot(tmp_path) == before
+    assert not os.path.lexists(enabled(tmp_path, 'nginx', 'new.example.com'))
+    assert not reload_log.exists()
+    # No staging directories are left in the config roots
+    assert [name for name in os.listdir(tmp_path / 'nginx') if name.startswith('.lomp-staging-')] == []
+
+def test_removal_deletes_file_and_link(tmp_path):
+    manager, _ = make_manager(tmp_path)
+    install_existing(manager)
+
+    with manager.transaction(reload='none') as txn:
+        txn.remove('nginx', 'removed.example.com')
+
+    assert txn.result['servers']['nginx'] == {'written': 0, 'removed': 1, 'reload': 'skipped'}
+    assert not available(tmp_path, 'nginx', 'removed.example.com').exists()
+    assert not os.path.lexists(enabled(tmp_path, 'nginx', 'removed.example.com'))
+
+def test_debounced_commits_share_one_reload(tmp_path):
+    manager, reload_log = make_manager(tmp_path, reload_delay=0.2)
+
+    for i in range(5):
+        with manager.transaction() as txn:
+            txn.write('nginx', f'site{i}.example.com', 'server {}')
+        assert txn.result['servers']['nginx']['reload'] == 'scheduled'
+
+    deadline = time.time() + 5
+    while not reload_log.exists() and time.time() < deadline:
+        time.sleep(0.05)
+    time.sleep(0.3)
+    assert reload_log.read_text().split() == ['nginx']
+
+def test_invalid_names_are_rejected(tmp_path):
+    manager, _ = make_manager(tmp_path)
+    with pytest.raises(VhostConfigError):
+        with manager.transaction() as txn:
+            txn.write('nginx', '../escape', 'server {}')
+    with pytest.raises(VhostConfigError):
+        with manager.transaction() as txn:
+            txn.write('lighttpd', 'site.example.com', 'server {}')
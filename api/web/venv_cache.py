@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+LOMP Stack v3.0 - Python Environment Cache
+Prebuilt per-framework virtualenv templates and a local wheelhouse
+
+Author: Silviu Ilie <neosilviu@gmail.com>
+Company: aemdPC
+Version: 3.0.0
+Copyright © 2025 aemdPC. All rights reserved.
+License: MIT License
+
+Repository: https://github.com/aemdPC/lomp-stack-v3
+Documentation: https://docs.aemdpc.com/lomp-stack
+Support: https://support.aemdpc.com
+"""
+
+import os
+import json
+import time
+import errno
+import shutil
+import hashlib
+import logging
+import subprocess
+from typing import Dict, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: templates are not used there
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# ioctl that shares a file's extents with another file (btrfs, XFS, bcachefs)
+FICLONE = 0x40049409
+
+TEMPLATE_MARKER = '.lomp-template.json'
+PIP_TIMEOUT = 1800
+
+#########################################################################
+# File cloning
+#########################################################################
+
+def reflink_file(src: str, dst: str) -> None:
+    """Copy-on-write clone of one file; raises OSError where unsupported"""
+    with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+        try:
+            fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+        except OSError:
+            fdst.close()
+            os.unlink(dst)
+            raise
+    shutil.copystat(src, dst)
+
+def _link_file(src: str, dst: str, mode: str) -> None:
+    if mode == 'reflink':
+        reflink_file(src, dst)
+    elif mode == 'hardlink':
+        os.link(src, dst)
+    else:
+        shutil.copy2(src, dst)
+
+def clone_tree(src: str, dst: str, mode: str = 'auto',
+               rewrite: Optional[Dict[str, List[str]]] = None) -> str:
+    """Recreate the directory tree `src` at `dst` without copying file data
+
+    `mode` is 'reflink', 'hardlink', 'copy' or 'auto' (the first of those
+    that works between the two locations). Files listed in `rewrite`
+    (relative path -> [old, new]) are written out with the text replaced
+    instead of being linked. Returns the mode used.
+    """
+    modes = ['reflink', 'hardlink', 'copy'] if mode == 'auto' else [mode]
+    rewrite = rewrite or {}
+
+    for root, dirs, files in os.walk(src):
+        relative = os.path.relpath(root, src)
+        target_dir = os.path.normpath(os.path.join(dst, relative))
+        os.makedirs(target_dir, exist_ok=True)
+        shutil.copymode(root, target_dir)
+
+        for name in dirs + files:
+            source = os.path.join(root, name)
+            target = os.path.join(target_dir, name)
+            relative_name = os.path.normpath(os.path.join(relative, name))
+
+            if os.path.islink(source):
+                os.symlink(os.readlink(source), target)
+                if name in dirs:
+                    dirs.remove(name)
+                continue
+            if name in dirs:
+                continue
+
+            if relative_name in rewrite:
+                old, new = rewrite[relative_name]
+                with open(source, 'rb') as f:
+                    content = f.read().replace(old.encode(), new.encode())
+                with open(target, 'wb') as f:
+                    f.write(content)
+                shutil.copymode(source, target)
+                continue
+
+            while True:
+                try:
+                    _link_file(source, target, modes[0])
+                    break
+                except OSError as e:
+                    if len(modes) == 1 or e.errno not in (errno.EOPNOTSUPP, errno.ENOTTY, errno.EINVAL,
+                                                         errno.EXDEV, errno.EPERM, errno.EMLINK):
+                        raise
+                    # Not supported here: fall back for this and every later file
+                    modes.pop(0)
+    return modes[0]
+
+#########################################################################
+# Template cache
+#########################################################################
+
+def requirements_hash(requirements: str) -> str:
+    """Hash of a requirements list that ignores comments, blank lines and order"""
+    lines = sorted({line.split('#', 1)[0].strip().lower() for line in requirements.splitlines()} - {''})
+    return hashlib.sha256('\n'.join(lines).encode()).hexdigest()[:16]
+
+class VenvTemplateCache:
+    """Per-framework virtualenvs built once and cloned for each new app
+
+    Wheels are kept in a shared wheelhouse, so a template is built without
+    touching the package index once its wheels have been fetched. Templates
+    are keyed by interpreter version and requirements hash, so changing a
+    framework's pinned requirements builds a new template.
+    """
+
+    def __init__(self, cache_dir: str, python: str = 'python3', link_mode: str = 'auto'):
+        self.cache_dir = cache_dir
+        self.wheelhouse = os.path.join(cache_dir, 'wheelhouse')
+        self.templates_dir = os.path.join(cache_dir, 'templates')
+        self.python = python
+        self.link_mode = link_mode
+        self._python_version = None
+
+    def python_version(self) -> str:
+        if self._python_version is None:
+            result = subprocess.run(
+                [self.python, '-c', 'import sys; print("%d.%d" % sys.version_info[:2])'],
+                capture_output=True, text=True, check=True
+            )
+            self._python_version = result.stdout.strip()
+        return self._python_version
+
+    def template_path(self, framework: str, requirements: str) -> str:
+        key = f"{framework}-py{self.python_version()}-{requirements_hash(requirements)}"
+        return os.path.join(self.templates_dir, key)
+
+    def _pip(self, python: str, args: List[str]) -> subprocess.CompletedProcess:
+        return subprocess.run([python, '-m', 'pip', '--disable-pip-version-check'] + args,
+                              capture_output=True, text=True, timeout=PIP_TIMEOUT)
+
+    def fill_wheelhouse(self, requirements_file: str) -> subprocess.CompletedProcess:
+        """Download or build wheels for a requirements file; the only step that needs the index"""
+        os.makedirs(self.wheelhouse, exist_ok=True)
+        return self._pip(self.python, ['wheel', '-r', requirements_file,
+                                       '--wheel-dir', self.wheelhouse, '--find-links', self.wheelhouse])
+
+    def install_offline(self, venv_path: str, requirements_file: str) -> subprocess.CompletedProcess:
+        """Install requirements into a venv from the wheelhouse only"""
+        return self._pip(os.path.join(venv_path, 'bin', 'python'),
+                         ['install', '--no-index', '--find-links', self.wheelhouse, '-r', requirements_file])
+
+    def ensure_template(self, framework: str, requirements: str) -> Dict:
+        """Return the template for a framework, building it first if needed"""
+        template = self.template_path(framework, requirements)
+        if os.path.exists(os.path.join(template, TEMPLATE_MARKER)):
+            return {'success': True, 'template': template, 'built': False}
+
+        os.makedirs(self.templates_dir, exist_ok=True)
+        with open(f"{template}.lock", 'w') as lock:
+            # Concurrent provisioning of the same framework builds the template once
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            if os.path.exists(os.path.join(template, TEMPLATE_MARKER)):
+                return {'success': True, 'template': template, 'built': False}
+
+            build_path = f"{template}.build-{os.getpid()}"
+            shutil.rmtree(build_path, ignore_errors=True)
+            try:
+                result = subprocess.run([self.python, '-m', 'venv', build_path],
+                                        capture_output=True, text=True)
+                if result.returncode != 0:
+                    return {'success': False, 'message': f'Failed to create template venv: {result.stderr}'}
+
+                requirements_file = os.path.join(build_path, 'requirements.txt')
+                with open(requirements_file, 'w') as f:
+                    f.write(requirements)
+
+                result = self.install_offline(build_path, requirements_file)
+                if result.returncode != 0:
+                    # First use of these requirements: fetch the wheels, then retry offline
+                    fetched = self.fill_wheelhouse(requirements_file)
+                    if fetched.returncode != 0:
+                        return {'success': False, 'message': f'Failed to build wheels: {fetched.stderr}'}
+                    result = self.install_offline(build_path, requirements_file)
+                    if result.returncode != 0:
+                        return {'success': False, 'message': f'Failed to install requirements: {result.stderr}'}
+
+                os.remove(requirements_file)
+                with open(os.path.join(build_path, TEMPLATE_MARKER), 'w') as f:
+                    json.dump({'framework': framework, 'build_path': build_path,
+                               'python_version': self.python_version(),
+                               'requirements': requirements, 'created_at': time.time()}, f, indent=2)
+                os.rename(build_path, template)
+            finally:
+                shutil.rmtree(build_path, ignore_errors=True)
+
+        logger.info(f"Built {framework} environment template {template}")
+        return {'success': True, 'template': template, 'built': True}
+
+    def clone(self, template: str, venv_path: str) -> str:
+        """Create venv_path from a template; returns the link mode used"""
+        with open(os.path.join(template, TEMPLATE_MARKER), 'r') as f:
+            build_path = json.load(f)['build_path']
+
+        # Scripts and pyvenv.cfg embed the venv's own path
+        rewrite = {'pyvenv.cfg': [build_path, venv_path]}
+        bin_dir = os.path.join(template, 'bin')
+        for name in os.listdir(bin_dir):
+            if not os.path.islink(os.path.join(bin_dir, name)):
+                rewrite[os.path.join('bin', name)] = [build_path, venv_path]
+
+        staging = f"{venv_path}.clone-{os.getpid()}"
+        shutil.rmtree(staging, ignore_errors=True)
+        try:
+            mode = clone_tree(template, staging, self.link_mode, rewrite)
+            os.remove(os.path.join(staging, TEMPLATE_MARKER))
+            if os.path.exists(venv_path):
+                shutil.rmtree(venv_path)
+            os.rename(staging, venv_path)
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+        return mode
+
+    def provision(self, venv_path: str, framework: str, requirements: str) -> Dict:
+        """Create an app's venv with the framework's requirements installed"""
+        if fcntl is None:
+            return {'success': False, 'message': 'Environment templates are not supported on this platform'}
+        try:
+            result = self.ensure_template(framework, requirements)
+            if not result['success']:
+                return result
+            mode = self.clone(result['template'], venv_path)
+            return {'success': True, 'message': f'Environment cloned from template ({mode})',
+                    'template': result['template'], 'mode': mode, 'built': result['built']}
+        except (OSError, subprocess.SubprocessError) as e:
+            return {'success': False, 'message': f'Error provisioning environment: {str(e)}'}
+
+    def invalidate(self, framework: Optional[str] = None) -> int:
+        """Delete cached templates (all, or one framework's); returns how many"""
+        if not os.path.isdir(self.templates_dir):
+            return 0
+        removed = 0
+        for name in os.listdir(self.templates_dir):
+            path = os.path.join(self.templates_dir, name)
+            if not os.path.isdir(path) or (framework and not name.startswith(f"{framework}-py")):
+                continue
+            shutil.rmtree(path, ignore_errors=True)
+            removed += 1
+        return removed
@@ -0,0 +1,438 @@
+#!/usr/bin/env python3
+"""
+LOMP Stack v3.0 - Virtual Host Configuration
+Python-rendered vhosts written in transactions with one config test and one reload per web server
+
+Author: Silviu Ilie <neosilviu@gmail.com>
+Company: aemdPC
+Version: 3.0.0
+Copyright © 2025 aemdPC. All rights reserved.
+License: MIT License
+
+Repository: https://github.com/aemdPC/lomp-stack-v3
+Documentation: https://docs.aemdpc.com/lomp-stack
+Support: https://support.aemdpc.com
+"""
+
+import os
+import re
+import shutil
+import atexit
+import logging
+import tempfile
+import threading
+import subprocess
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: web server configs are not managed there
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Where each server keeps its vhosts, how its configuration is tested and how it is reloaded.
+# OpenLiteSpeed has no config test; a graceful restart skips a broken vhost and keeps serving.
+SERVERS = {
+    'nginx': {
+        'config_root': '/etc/nginx',
+        'available': 'sites-available/{name}',
+        'enabled': 'sites-enabled/{name}',
+        'test': ['nginx', '-t'],
+        'reload': ['systemctl', 'reload', 'nginx']
+    },
+    'apache': {
+        'config_root': '/etc/apache2',
+        'available': 'sites-available/{name}.conf',
+        'enabled': 'sites-enabled/{name}.conf',
+        'test': ['apachectl', 'configtest'],
+        'reload': ['systemctl', 'reload', 'apache2']
+    },
+    'ols': {
+        'config_root': '/usr/local/lsws/conf',
+        'available': 'vhosts/{name}/vhconf.conf',
+        'enabled': None,
+        'test': None,
+        'reload': ['/usr/local/lsws/bin/lswsctrl', 'restart']
+    }
+}
+
+# Seconds reload requests are collected before the server is reloaded once
+RELOAD_DELAY = 2.0
+
+# Upper bound for a config test or reload command
+COMMAND_TIMEOUT = 90
+
+VHOST_NAME = re.compile(r'^[A-Za-z0-9_-][A-Za-z0-9._-]*$')
+
+class VhostConfigError(Exception):
+    """A vhost change was rejected before anything was written"""
+
+#########################################################################
+# Templates
+#########################################################################
+
+def php_socket(php_version: str) -> str:
+    return f"/run/php/php{php_version}-fpm.sock"
+
+def render_php_vhost(server: str, domain: str, document_root: str, php_version: str = '8.1') -> str:
+    """Virtual host serving a PHP site from document_root"""
+    if server == 'nginx':
+        return f"""server {{
+    listen 80;
+    server_name {domain};
+    root {document_root};
+    index index.php index.html index.htm;
+
+    access_log /var/log/nginx/{domain}_access.log;
+    error_log /var/log/nginx/{domain}_error.log;
+
+    location / {{
+        try_files $uri $uri/ /index.php$is_args$args;
+    }}
+
+    location ~ \\.php$ {{
+        include snippets/fastcgi-php.conf;
+        fastcgi_pass unix:{php_socket(php_version)};
+        fastcgi_param SCRIPT_FILENAME $document_root$fastcgi_script_name;
+        include fastcgi_params;
+    }}
+
+    location ~* \\.(js|css|png|jpg|jpeg|gif|ico|svg)$ {{
+        expires max;
+        log_not_found off;
+    }}
+}}
+"""
+    if server == 'apache':
+        return f"""<VirtualHost *:80>
+    ServerName {domain}
+    DocumentRoot {document_root}
+    <Directory {document_root}>
+        AllowOverride All
+        Require all granted
+    </Directory>
+    <FilesMatch \\.php$>
+        SetHandler "proxy:unix:{php_socket(php_version)}|fcgi://localhost"
+    </FilesMatch>
+    ErrorLog "/var/log/apache2/{domain}_error.log"
+    CustomLog "/var/log/apache2/{domain}_access.log" combined
+</VirtualHost>
+"""
+    if server == 'ols':
+        lsphp = f"lsphp{php_version.replace('.', '')}"
+        return f"""docRoot                   {document_root}
+vhDomain                  {domain}
+adminEmails               admin@{domain}
+
+index  {{
+  useServer               0
+  indexFiles              index.php, index.html
+}}
+
+errorlog /usr/local/lsws/logs/{domain}_error.log {{
+  useServer               0
+  logLevel                WARN
+  rollingSize             10M
+}}
+
+accesslog /usr/local/lsws/logs/{domain}_access.log {{
+  useServer               0
+  rollingSize             10M
+}}
+
+scriptHandler  {{
+  add                     lsapi:{lsphp} php
+}}
+
+extProcessor {lsphp} {{
+  type                    lsapi
+  address                 uds://tmp/lshttpd/{lsphp}.sock
+  maxConns                35
+  env                     PHP_LSAPI_CHILDREN=35
+  initTimeout             60
+  retryTimeout            0
+  persistConn             1
+  respBuffer              0
+  autoStart               1
+  path                    /usr/local/lsws/{lsphp}/bin/lsphp
+  backlog                 100
+  instances               1
+  memSoftLimit            2047M
+  memHardLimit            2047M
+  procSoftLimit           400
+  procHardLimit           500
+}}
+
+rewrite  {{
+  enable                  1
+  autoLoadHtaccess        1
+}}
+"""
+    raise VhostConfigError(f'Unsupported web server: {server}')
+
+def render_python_proxy(domain: str, port: int, document_root: Optional[str] = None) -> str:
+    """nginx server block proxying to a Python app on a local port"""
+    config = f"""server {{
+    listen 80;
+    server_name {domain};
+
+    location / {{
+        proxy_pass http://127.0.0.1:{int(port)};
+        proxy_set_header Host $host;
+        proxy_set_header X-Real-IP $remote_addr;
+        proxy_set_header X-Forwarded-For $proxy_add_x_forwarded_for;
+        proxy_set_header X-Forwarded-Proto $scheme;
+        proxy_connect_timeout 60s;
+        proxy_send_timeout 60s;
+        proxy_read_timeout 60s;
+    }}
+"""
+    if document_root:
+        for location in ('static', 'media'):
+            config += f"""
+    location /{location}/ {{
+        alias {document_root}/{location}/;
+        expires 30d;
+        add_header Cache-Control "public, immutable";
+    }}
+"""
+    return config + "}\n"
+
+#########################################################################
+# Transactions
+#########################################################################
+
+class VhostTransaction:
+    """Vhost writes and removals applied together by commit()"""
+
+    def __init__(self, manager: 'VhostManager'):
+        self.manager = manager
+        self.changes: Dict[tuple, Optional[str]] = {}
+        self.result = None
+
+    def _key(self, server: str, name: str) -> tuple:
+        if server not in self.manager.servers:
+            raise VhostConfigError(f'Unsupported web server: {server}')
+        if not VHOST_NAME.match(name or ''):
+            raise VhostConfigError(f'Invalid vhost name: {name}')
+        return (server, name)
+
+    def write(self, server: str, name: str, content: str) -> None:
+        """Stage the full content of a vhost; a later write of the same vhost wins"""
+        self.changes[self._key(server, name)] = content
+
+    def remove(self, server: str, name: str) -> None:
+        self.changes[self._key(server, name)] = None
+
+    def commit(self, reload: str = 'debounced') -> Dict:
+        """Apply every change, test each touched server once and reload it
+
+        `reload` is 'debounced' (coalesced with other commits), 'now' or 'none'.
+        """
+        self.result = self.manager.apply(self.changes, reload)
+        self.changes = {}
+        return self.result
+
+class VhostManager:
+    """Applies vhost transactions and coalesces web server reloads
+
+    A commit renders nothing itself: the staged contents are written to a
+    temporary directory inside each server's config root (so the later
+    rename stays on one filesystem), the previous files are kept as
+    backups, and the new files are renamed into place. Each touched server
+    then gets a single config test. If any test fails, every file of the
+    transaction is put back and nothing is reloaded. The servers only read
+    their configuration on reload, so they see the whole transaction or
+    none of it.
+
+    Reload requests within RELOAD_DELAY of each other share one reload.
+    """
+
+    def __init__(self, servers: Dict = None, reload_delay: float = RELOAD_DELAY, lock_path: Optional[str] = None):
+        self.servers = servers or SERVERS
+        self.reload_delay = reload_delay
+        self.lock_path = lock_path or os.path.join(tempfile.gettempdir(), 'lomp-vhosts.lock')
+        self._lock = threading.Lock()
+        self._timers: Dict[str, threading.Timer] = {}
+        self._timers_lock = threading.Lock()
+        self.reloads: Dict[str, Dict] = {}
+        atexit.register(self.flush)
+
+    @contextmanager
+    def transaction(self, reload: str = 'debounced'):
+        """Collect changes in the block and commit them when it exits cleanly"""
+        txn = VhostTransaction(self)
+        yield txn
+        txn.commit(reload)
+
+    @contextmanager
+    def _locked(self):
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            with open(self.lock_path, 'a') as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                yield
+
+    def _path(self, server: str, key: str, name: str) -> Optional[str]:
+        pattern = self.servers[server][key]
+        if not pattern:
+            return None
+        return os.path.join(self.servers[server]['config_root'], pattern.format(name=name))
+
+    def _run(self, command: List[str]) -> tuple:
+        try:
+            result = subprocess.run(command, capture_output=True, text=True, timeout=COMMAND_TIMEOUT)
+            return result.returncode == 0, (result.stderr or result.stdout).strip()
+        except subprocess.TimeoutExpired:
+            return False, f"{' '.join(command)} timed out after {COMMAND_TIMEOUT}s"
+        except OSError as e:
+            return False, str(e)
+
+    def apply(self, changes: Dict[tuple, Optional[str]], reload: str = 'debounced') -> Dict:
+        if not changes:
+            return {'success': True, 'message': 'No vhost changes', 'servers': {}}
+        if os.name == 'nt':
+            return {'success': False, 'message': 'Web server configuration is not supported on Windows'}
+
+        by_server: Dict[str, Dict[str, Optional[str]]] = {}
+        for (server, name), content in changes.items():
+            by_server.setdefault(server, {})[name] = content
+
+        with self._locked():
+            undo = []
+            staging = {}
+            try:
+                for server, vhosts in by_server.items():
+                    staging[server] = tempfile.mkdtemp(prefix='.lomp-staging-',
+                                                       dir=self.servers[server]['config_root'])
+                    self._stage(server, vhosts, staging[server])
+                for server, vhosts in by_server.items():
+                    self._swap(server, vhosts, staging[server], undo)
+
+                for server in by_server:
+                    if not self.servers[server]['test']:
+                        continue
+                    ok, output = self._run(self.servers[server]['test'])
+                    if not ok:
+                        self._rollback(undo)
+                        return {'success': False,
+                                'message': f'{server} configuration test failed: {output}',
+                                'server': server}
+            except Exception as e:
+                self._rollback(undo)
+                logger.error(f"Vhost transaction failed: {str(e)}")
+                return {'success': False, 'message': f'Error writing vhost configuration: {str(e)}'}
+            finally:
+                for directory in staging.values():
+                    shutil.rmtree(directory, ignore_errors=True)
+
+        servers = {}
+        for server, vhosts in by_server.items():
+            written = sum(1 for content in vhosts.values() if content is not None)
+            servers[server] = {'written': written, 'removed': len(vhosts) - written,
+                               'reload': self.request_reload(server, reload)}
+        return {'success': True, 'message': f'{len(changes)} vhost changes applied', 'servers': servers}
+
+    def _stage(self, server: str, vhosts: Dict[str, Optional[str]], staging: str) -> None:
+        for name, content in vhosts.items():
+            if content is None:
+                continue
+            with open(os.path.join(staging, name), 'w') as f:
+                f.write(content)
+                f.flush()
+                os.fsync(f.fileno())
+            os.chmod(os.path.join(staging, name), 0o644)
+
+    def _swap(self, server: str, vhosts: Dict[str, Optional[str]], staging: str, undo: List) -> None:
+        """Move staged files into place, recording how to undo each step"""
+        backups = os.path.join(staging, '.backup')
+        os.makedirs(backups, exist_ok=True)
+        for name, content in vhosts.items():
+            target = self._path(server, 'available', name)
+            link = self._path(server, 'enabled', name)
+
+            backup = None
+            if os.path.exists(target):
+                backup = os.path.join(backups, name)
+                shutil.copy2(target, backup)
+            if content is None:
+                if link and os.path.islink(link):
+                    undo.append(('link', link, os.readlink(link)))
+                    os.unlink(link)
+                if backup:
+                    undo.append(('file', target, backup))
+                    os.unlink(target)
+                continue
+
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            undo.append(('file', target, backup))
+            os.replace(os.path.join(staging, name), target)
+            if link and not os.path.lexists(link):
+                undo.append(('link', link, None))
+                os.symlink(target, link)
+
+    def _rollback(self, undo: List) -> None:
+        for kind, path, previous in reversed(undo):
+            try:
+                if kind == 'file':
+                    if previous:
+                        os.replace(previous, path)
+                    elif os.path.exists(path):
+                        os.unlink(path)
+                else:
+                    if os.path.lexists(path):
+                        os.unlink(path)
+                    if previous:
+                        os.symlink(previous, path)
+            except OSError as e:
+                logger.error(f"Could not restore {path}: {str(e)}")
+        undo.clear()
+
+    #########################################################################
+    # Reloads
+    #########################################################################
+
+    def request_reload(self, server: str, mode: str = 'debounced') -> str:
+        """Reload a server now, or once for every request made within the reload delay"""
+        if mode == 'none':
+            return 'skipped'
+        if mode == 'now' or self.reload_delay <= 0:
+            with self._timers_lock:
+                timer = self._timers.pop(server, None)
+            if timer:
+                timer.cancel()
+            return 'done' if self._reload(server) else 'failed'
+
+        with self._timers_lock:
+            if server not in self._timers:
+                timer = threading.Timer(self.reload_delay, self._reload_pending, args=(server,))
+                timer.daemon = True
+                self._timers[server] = timer
+                timer.start()
+        return 'scheduled'
+
+    def _reload_pending(self, server: str) -> None:
+        # Dropped before reloading, so changes written during the reload schedule another one
+        with self._timers_lock:
+            self._timers.pop(server, None)
+        self._reload(server)
+
+    def _reload(self, server: str) -> bool:
+        ok, output = self._run(self.servers[server]['reload'])
+        if not ok:
+            logger.error(f"Reloading {server} failed: {output}")
+        self.reloads[server] = {'success': ok, 'output': output}
+        return ok
+
+    def flush(self) -> None:
+        """Run pending reloads now"""
+        with self._timers_lock:
+            pending = list(self._timers.items())
+            self._timers = {}
+        for server, timer in pending:
+            timer.cancel()
+            self._reload(server)
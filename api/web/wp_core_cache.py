@@ -0,0 +1,556 @@
+#!/usr/bin/env python3
+"""
+LOMP Stack v3.0 - WordPress Core Cache
+Versioned, checksum-verified WordPress core shared between sites through hardlinks or reflinks
+
+Author: Silviu Ilie <neosilviu@gmail.com>
+Company: aemdPC
+Version: 3.0.0
+Copyright © 2025 aemdPC. All rights reserved.
+License: MIT License
+
+Repository: https://github.com/aemdPC/lomp-stack-v3
+Documentation: https://docs.aemdpc.com/lomp-stack
+Support: https://support.aemdpc.com
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import errno
+import shutil
+import hashlib
+import logging
+import tarfile
+import argparse
+import contextlib
+from typing import Dict, List, Optional
+
+import requests
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from venv_cache import clone_tree, reflink_file
+
+try:
+    import fcntl
+except ImportError:  # Windows: WordPress sites are not hosted there
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+WP_CORE_CACHE_DIR = '/var/cache/lomp/wordpress'
+VERSION_CHECK_URL = 'https://api.wordpress.org/core/version-check/1.7/'
+RELEASE_URL = 'https://downloads.wordpress.org/release/wordpress-{version}.tar.gz'
+CHECKSUMS_URL = 'https://api.wordpress.org/core/checksums/1.0/?version={version}&locale=en_US'
+DOWNLOAD_TIMEOUT = 300
+
+# Seconds the latest release number is trusted before asking wordpress.org again
+VERSION_TTL = 3600
+
+CORE_MARKER = '.lomp-core.json'
+VERSION_PATTERN = re.compile(r'^\d+\.\d+(?:\.\d+)?$')
+WP_VERSION_LINE = re.compile(r"^\$wp_version\s*=\s*'([^']+)'", re.MULTILINE)
+
+class CoreCacheError(Exception):
+    """A release could not be fetched, verified or unpacked"""
+
+def version_key(version: str) -> tuple:
+    return tuple(int(part) for part in version.split('.'))
+
+def file_digest(path: str, algorithm: str = 'md5') -> str:
+    digest = hashlib.new(algorithm)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def installed_version(document_root: str) -> Optional[str]:
+    """WordPress version of a site, from wp-includes/version.php"""
+    try:
+        with open(os.path.join(document_root, 'wp-includes', 'version.php'), 'r', errors='replace') as f:
+            match = WP_VERSION_LINE.search(f.read())
+    except FileNotFoundError:
+        return None
+    return match.group(1) if match else None
+
+def _core_files(core: str) -> List[str]:
+    files = []
+    for root, _, names in os.walk(core):
+        for name in names:
+            files.append(os.path.relpath(os.path.join(root, name), core))
+    return files
+
+#########################################################################
+# Cache
+#########################################################################
+
+class WordPressCoreCache:
+    """One unpacked, verified copy of each WordPress release
+
+    Layout, per release under versions/<version>/:
+      core/      every file of the release except wp-content
+      content/   the release's wp-content (themes, plugins, index.php)
+      .lomp-core.json  checksum and size summary, written last
+
+    Downloads (wordpress-<version>.tar.gz, its .sha1 and the per-file
+    checksums) live in downloads/. Copying those files there seeds a cache
+    that never goes online. Sites get core/ through clone_tree (reflinks
+    where the filesystem has them, else hardlinks, else copies) and their
+    own copy of content/, since wp-content is theirs to change.
+
+    Hardlinked core files stay owned by the cache's owner and are not
+    writable by site users, so one site cannot change another's core.
+    Core updates of such sites go through update_site, which swaps in the
+    new release's links file by file.
+    """
+
+    def __init__(self, cache_dir: str = WP_CORE_CACHE_DIR, link_mode: str = 'auto', offline: bool = False):
+        self.cache_dir = cache_dir
+        self.downloads_dir = os.path.join(cache_dir, 'downloads')
+        self.versions_dir = os.path.join(cache_dir, 'versions')
+        self.registry_path = os.path.join(cache_dir, 'sites.json')
+        self.link_mode = link_mode
+        self.offline = offline
+        self._latest = None
+
+    @contextlib.contextmanager
+    def locked(self):
+        if fcntl is None:
+            raise CoreCacheError('The WordPress core cache is not supported on this platform')
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with open(os.path.join(self.cache_dir, '.lock'), 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            yield
+
+    def _version_dir(self, version: str) -> str:
+        if not VERSION_PATTERN.match(version or ''):
+            raise CoreCacheError(f'Invalid WordPress version: {version}')
+        return os.path.join(self.versions_dir, version)
+
+    def cached_versions(self) -> List[str]:
+        """Unpacked releases, newest first"""
+        try:
+            names = os.listdir(self.versions_dir)
+        except FileNotFoundError:
+            return []
+        versions = [name for name in names if VERSION_PATTERN.match(name)
+                    and os.path.exists(os.path.join(self.versions_dir, name, CORE_MARKER))]
+        return sorted(versions, key=version_key, reverse=True)
+
+    def _seeded_versions(self) -> List[str]:
+        try:
+            names = os.listdir(self.downloads_dir)
+        except FileNotFoundError:
+            return []
+        versions = []
+        for name in names:
+            match = re.match(r'^wordpress-(\d+\.\d+(?:\.\d+)?)\.tar\.gz$', name)
+            if match:
+                versions.append(match.group(1))
+        return versions
+
+    def latest_version(self) -> str:
+        """Current release from wordpress.org, or the newest release available locally"""
+        if self._latest and time.time() - self._latest[1] < VERSION_TTL:
+            return self._latest[0]
+        if not self.offline:
+            try:
+                response = requests.get(VERSION_CHECK_URL, timeout=10)
+                response.raise_for_status()
+                version = response.json()['offers'][0]['current']
+                if VERSION_PATTERN.match(version):
+                    self._latest = (version, time.time())
+                    return version
+            except (requests.RequestException, ValueError, KeyError, IndexError) as e:
+                logger.info(f"WordPress version check failed, using cached releases: {str(e)}")
+
+        local = set(self.cached_versions()) | set(self._seeded_versions())
+        if not local:
+            raise CoreCacheError('No WordPress release is cached and wordpress.org is unreachable')
+        return max(local, key=version_key)
+
+    #########################################################################
+    # Fetching and unpacking
+    #########################################################################
+
+    def _download(self, url: str, path: str) -> None:
+        if self.offline:
+            raise CoreCacheError(f'{os.path.basename(path)} is not in the cache and the cache is offline')
+        temp_path = f"{path}.part-{os.getpid()}"
+        try:
+            with requests.get(url, stream=True, timeout=DOWNLOAD_TIMEOUT) as response:
+                response.raise_for_status()
+                with open(temp_path, 'wb') as f:
+                    for chunk in response.iter_content(1 << 20):
+                        f.write(chunk)
+            os.replace(temp_path, path)
+        except requests.RequestException as e:
+            raise CoreCacheError(f'Download of {url} failed: {str(e)}')
+        finally:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+
+    def _fetch(self, version: str) -> Dict:
+        """Tarball, verified against its .sha1, and per-file checksums if they can be had"""
+        os.makedirs(self.downloads_dir, exist_ok=True)
+        tarball = os.path.join(self.downloads_dir, f'wordpress-{version}.tar.gz')
+        sha1_path = f'{tarball}.sha1'
+        checksums_path = os.path.join(self.downloads_dir, f'wordpress-{version}.checksums.json')
+
+        if not os.path.exists(tarball):
+            self._download(RELEASE_URL.format(version=version), tarball)
+        if not os.path.exists(sha1_path):
+            self._download(RELEASE_URL.format(version=version) + '.sha1', sha1_path)
+        with open(sha1_path, 'r') as f:
+            fields = f.read().split()
+        expected = fields[0].lower() if fields else ''
+        actual = file_digest(tarball, 'sha1')
+        if actual != expected:
+            os.unlink(tarball)
+            raise CoreCacheError(f'Checksum mismatch for wordpress-{version}.tar.gz: expected {expected}, got {actual}')
+
+        checksums = None
+        if not os.path.exists(checksums_path) and not self.offline:
+            try:
+                response = requests.get(CHECKSUMS_URL.format(version=version), timeout=30)
+                response.raise_for_status()
+                checksums = response.json().get('checksums')
+                if isinstance(checksums, dict) and checksums:
+                    with open(checksums_path, 'w') as f:
+                        json.dump(checksums, f)
+            except (requests.RequestException, ValueError) as e:
+                logger.info(f"Per-file checksums for WordPress {version} unavailable: {str(e)}")
+        if os.path.exists(checksums_path):
+            with open(checksums_path, 'r') as f:
+                checksums = json.load(f)
+        return {'tarball': tarball, 'sha1': actual, 'checksums': checksums if isinstance(checksums, dict) else None}
+
+    def _unpack(self, tarball: str, target: str) -> None:
+        with tarfile.open(tarball, 'r:gz') as archive:
+            members = []
+            for member in archive.getmembers():
+                name = os.path.normpath(member.name)
+                if name.startswith(('/', '..')) or not (name == 'wordpress' or name.startswith('wordpress/')):
+                    raise CoreCacheError(f'Unexpected path in WordPress archive: {member.name}')
+                if not (member.isfile() or member.isdir()):
+                    continue
+                members.append(member)
+            if hasattr(tarfile, 'data_filter'):
+                archive.extractall(target, members=members, filter='data')
+            else:
+                archive.extractall(target, members=members)
+
+    def ensure(self, version: Optional[str] = None) -> Dict:
+        """Make a release available in the cache; downloads it at most once"""
+        version = version or self.latest_version()
+        version_dir = self._version_dir(version)
+        if os.path.exists(os.path.join(version_dir, CORE_MARKER)):
+            return {'success': True, 'version': version, 'path': version_dir, 'built': False}
+
+        with self.locked():
+            if os.path.exists(os.path.join(version_dir, CORE_MARKER)):
+                return {'success': True, 'version': version, 'path': version_dir, 'built': False}
+
+            fetched = self._fetch(version)
+            build = f"{version_dir}.build-{os.getpid()}"
+            shutil.rmtree(build, ignore_errors=True)
+            try:
+                os.makedirs(build)
+                self._unpack(fetched['tarball'], build)
+                release = os.path.join(build, 'wordpress')
+                if installed_version(release) != version:
+                    raise CoreCacheError(f'Archive does not contain WordPress {version}')
+
+                checksums = fetched['checksums']
+                if checksums:
+                    for relative, expected in checksums.items():
+                        path = os.path.join(release, relative)
+                        if not os.path.isfile(path):
+                            # Bundled plugins and themes may be dropped from a release after the list was made
+                            if relative.startswith('wp-content/'):
+                                continue
+                            raise CoreCacheError(f'WordPress {version} is missing {relative}')
+                        if file_digest(path) != expected:
+                            raise CoreCacheError(f'Checksum mismatch for {relative} in WordPress {version}')
+
+                os.rename(os.path.join(release, 'wp-content'), os.path.join(build, 'content'))
+                os.rename(release, os.path.join(build, 'core'))
+                files, size = 0, 0
+                for root, dirs, names in os.walk(build):
+                    for name in dirs:
+                        os.chmod(os.path.join(root, name), 0o755)
+                    for name in names:
+                        path = os.path.join(root, name)
+                        os.chmod(path, 0o644)
+                        if root.startswith(os.path.join(build, 'core')):
+                            files += 1
+                            size += os.path.getsize(path)
+
+                with open(os.path.join(build, CORE_MARKER), 'w') as f:
+                    json.dump({'version': version, 'sha1': fetched['sha1'], 'files': files, 'bytes': size,
+                               'files_verified': bool(checksums), 'created_at': time.time()}, f, indent=2)
+                shutil.rmtree(version_dir, ignore_errors=True)
+                os.rename(build, version_dir)
+            except BaseException:
+                shutil.rmtree(build, ignore_errors=True)
+                raise
+
+        logger.info(f"WordPress {version} added to the core cache")
+        return {'success': True, 'version': version, 'path': version_dir, 'built': True}
+
+    def seed(self, tarball: str, sha1: Optional[str] = None, checksums: Optional[str] = None) -> Dict:
+        """Add a release archive copied from elsewhere, for nodes without internet access"""
+        match = re.search(r'wordpress-(\d+\.\d+(?:\.\d+)?)\.tar\.gz$', os.path.basename(tarball))
+        if not match:
+            raise CoreCacheError('Archive name must be wordpress-<version>.tar.gz')
+        version = match.group(1)
+        os.makedirs(self.downloads_dir, exist_ok=True)
+        target = os.path.join(self.downloads_dir, os.path.basename(tarball))
+        if os.path.abspath(tarball) != os.path.abspath(target):
+            shutil.copy2(tarball, target)
+        if sha1:
+            with open(f'{target}.sha1', 'w') as f:
+                f.write(sha1.strip().lower() + '\n')
+        elif os.path.exists(f'{tarball}.sha1') and os.path.abspath(tarball) != os.path.abspath(target):
+            shutil.copy2(f'{tarball}.sha1', f'{target}.sha1')
+        if checksums:
+            shutil.copy2(checksums, os.path.join(self.downloads_dir, f'wordpress-{version}.checksums.json'))
+        if not os.path.exists(f'{target}.sha1'):
+            raise CoreCacheError(f'No SHA-1 for {os.path.basename(tarball)}; pass it or place a .sha1 file beside it')
+        return self.ensure(version)
+
+    #########################################################################
+    # Sites
+    #########################################################################
+
+    def _read_registry(self) -> Dict[str, Dict]:
+        try:
+            with open(self.registry_path, 'r') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _write_registry(self, registry: Dict[str, Dict]) -> None:
+        temp_path = f"{self.registry_path}.tmp-{os.getpid()}"
+        with open(temp_path, 'w') as f:
+            json.dump(registry, f, indent=2, sort_keys=True)
+        os.replace(temp_path, self.registry_path)
+
+    def _register(self, document_root: str, entry: Optional[Dict]) -> None:
+        with self.locked():
+            registry = self._read_registry()
+            if entry is None:
+                registry.pop(os.path.abspath(document_root), None)
+            else:
+                registry[os.path.abspath(document_root)] = entry
+            self._write_registry(registry)
+
+    def site_entry(self, document_root: str) -> Optional[Dict]:
+        return self._read_registry().get(os.path.abspath(document_root))
+
+    @staticmethod
+    def _chown_tree(path: str, owner: str, skip_files: bool) -> None:
+        user, _, group = owner.partition(':')
+        for root, dirs, files in os.walk(path):
+            shutil.chown(root, user or None, group or None)
+            if not skip_files:
+                for name in files:
+                    shutil.chown(os.path.join(root, name), user or None, group or None)
+
+    def populate(self, document_root: str, version: Optional[str] = None, owner: Optional[str] = None) -> Dict:
+        """Install WordPress core files into a site's document root from the cache
+
+        `owner` ("user:group") gets the directories and wp-content; files
+        shared through hardlinks keep the cache's owner.
+        """
+        try:
+            present = installed_version(document_root)
+            if present:
+                return {'success': True, 'message': f'WordPress {present} already present',
+                        'version': present, 'mode': None}
+
+            cached = self.ensure(version)
+            version, version_dir = cached['version'], cached['path']
+            os.makedirs(document_root, exist_ok=True)
+            mode = clone_tree(os.path.join(version_dir, 'core'), document_root, self.link_mode)
+            content = os.path.join(document_root, 'wp-content')
+            if not os.path.exists(content):
+                shutil.copytree(os.path.join(version_dir, 'content'), content)
+            if owner:
+                self._chown_tree(document_root, owner, skip_files=mode == 'hardlink')
+                self._chown_tree(content, owner, skip_files=False)
+
+            with open(os.path.join(version_dir, CORE_MARKER), 'r') as f:
+                marker = json.load(f)
+            self._register(document_root, {'version': version, 'mode': mode, 'files': marker['files'],
+                                           'bytes': marker['bytes'], 'populated_at': time.time()})
+            return {'success': True, 'message': f'WordPress {version} installed from the core cache ({mode})',
+                    'version': version, 'mode': mode, 'files': marker['files']}
+        except (CoreCacheError, OSError) as e:
+            return {'success': False, 'message': f'WordPress core cache: {str(e)}'}
+
+    def update_site(self, document_root: str, version: Optional[str] = None) -> Dict:
+        """Move a site populated from the cache to another release
+
+        Every core file is linked under a temporary name and renamed over
+        the old one, so the previous release's shared inodes are never
+        written to. Files the new release no longer has are removed.
+        """
+        entry = self.site_entry(document_root)
+        if not entry:
+            return {'success': False, 'message': 'Site was not installed from the core cache'}
+        try:
+            cached = self.ensure(version)
+            version = cached['version']
+            if installed_version(document_root) == version:
+                return {'success': True, 'message': f'WordPress {version} already installed', 'version': version}
+
+            core = os.path.join(cached['path'], 'core')
+            new_files = _core_files(core)
+            mode = entry.get('mode') or 'copy'
+            for relative in new_files:
+                source = os.path.join(core, relative)
+                target = os.path.join(document_root, relative)
+                temp_path = f"{target}.lomp-new"
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                if os.path.lexists(temp_path):
+                    os.unlink(temp_path)
+                try:
+                    if mode == 'hardlink':
+                        os.link(source, temp_path)
+                    elif mode == 'reflink':
+                        reflink_file(source, temp_path)
+                    else:
+                        shutil.copy2(source, temp_path)
+                except OSError as e:
+                    if e.errno not in (errno.EXDEV, errno.EOPNOTSUPP, errno.ENOTTY, errno.EINVAL, errno.EMLINK):
+                        raise
+                    mode = 'copy'
+                    shutil.copy2(source, temp_path)
+                os.replace(temp_path, target)
+
+            old_core = os.path.join(self.versions_dir, entry['version'], 'core')
+            if os.path.isdir(old_core):
+                for relative in set(_core_files(old_core)) - set(new_files):
+                    with contextlib.suppress(FileNotFoundError):
+                        os.unlink(os.path.join(document_root, relative))
+
+            with open(os.path.join(cached['path'], CORE_MARKER), 'r') as f:
+                marker = json.load(f)
+            self._register(document_root, {'version': version, 'mode': mode, 'files': marker['files'],
+                                           'bytes': marker['bytes'], 'populated_at': time.time()})
+            return {'success': True, 'message': f'WordPress core updated to {version}', 'version': version}
+        except (CoreCacheError, OSError) as e:
+            return {'success': False, 'message': f'WordPress core cache: {str(e)}'}
+
+    #########################################################################
+    # Reporting and cleanup
+    #########################################################################
+
+    def dedup_report(self) -> Dict:
+        """Disk used by cached releases and saved by the sites sharing them
+
+        Hardlinked bytes are counted from link counts, so they stay
+        accurate if a site replaced some files. Reflinked sites are counted
+        from the registry: their blocks are shared until a file is changed.
+        """
+        registry = self._read_registry()
+        live = {root: entry for root, entry in registry.items() if os.path.isdir(root)}
+        versions = []
+        total_saved = 0
+        for version in self.cached_versions():
+            core = os.path.join(self.versions_dir, version, 'core')
+            size, files, hardlink_saved = 0, 0, 0
+            for relative in _core_files(core):
+                stat = os.lstat(os.path.join(core, relative))
+                files += 1
+                size += stat.st_size
+                hardlink_saved += stat.st_size * (stat.st_nlink - 1)
+            sites = [entry for entry in live.values() if entry['version'] == version]
+            reflink_saved = sum(entry['bytes'] for entry in sites if entry['mode'] == 'reflink')
+            saved = hardlink_saved + reflink_saved
+            total_saved += saved
+            versions.append({
+                'version': version,
+                'files': files,
+                'bytes': size,
+                'sites': len(sites),
+                'modes': {mode: sum(1 for entry in sites if entry['mode'] == mode)
+                          for mode in sorted({entry['mode'] for entry in sites})},
+                'saved_bytes': saved
+            })
+        return {
+            'success': True,
+            'versions': versions,
+            'sites': len(live),
+            'saved_bytes': total_saved,
+            'saved_mb': round(total_saved / (1024 * 1024), 1)
+        }
+
+    def prune(self, keep: int = 2) -> Dict:
+        """Remove releases no registered site uses, apart from the newest `keep`"""
+        with self.locked():
+            registry = self._read_registry()
+            live = {root: entry for root, entry in registry.items() if os.path.isdir(root)}
+            if live != registry:
+                self._write_registry(live)
+            used = {entry['version'] for entry in live.values()}
+            removed = []
+            for version in self.cached_versions()[keep:]:
+                if version not in used:
+                    shutil.rmtree(os.path.join(self.versions_dir, version), ignore_errors=True)
+                    removed.append(version)
+        return {'success': True, 'removed': removed}
+
+#########################################################################
+# Command line (used by the shell helpers)
+#########################################################################
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Shared WordPress core cache')
+    parser.add_argument('--cache-dir', default=WP_CORE_CACHE_DIR)
+    parser.add_argument('--offline', action='store_true', help='Never contact wordpress.org')
+    commands = parser.add_subparsers(dest='command', required=True)
+    ensure = commands.add_parser('ensure', help='Download and verify a release')
+    ensure.add_argument('--version')
+    seed = commands.add_parser('seed', help='Add a release archive copied from another machine')
+    seed.add_argument('tarball')
+    seed.add_argument('--sha1')
+    seed.add_argument('--checksums', help='checksums JSON from api.wordpress.org/core/checksums')
+    populate = commands.add_parser('populate', help='Install core files into a document root')
+    populate.add_argument('document_root')
+    populate.add_argument('--version')
+    populate.add_argument('--owner', help='user:group for directories and wp-content')
+    update = commands.add_parser('update', help='Move a site installed from the cache to another release')
+    update.add_argument('document_root')
+    update.add_argument('--version')
+    commands.add_parser('report', help='Show disk saved by shared core files')
+    prune = commands.add_parser('prune', help='Remove unused releases')
+    prune.add_argument('--keep', type=int, default=2)
+    args = parser.parse_args(argv)
+
+    cache = WordPressCoreCache(args.cache_dir, offline=args.offline)
+    try:
+        if args.command == 'ensure':
+            result = cache.ensure(args.version)
+        elif args.command == 'seed':
+            result = cache.seed(args.tarball, args.sha1, args.checksums)
+        elif args.command == 'populate':
+            result = cache.populate(args.document_root, args.version, args.owner)
+        elif args.command == 'update':
+            result = cache.update_site(args.document_root, args.version)
+        elif args.command == 'report':
+            result = cache.dedup_report()
+        else:
+            result = cache.prune(args.keep)
+    except (CoreCacheError, OSError) as e:
+        result = {'success': False, 'message': str(e)}
+
+    print(json.dumps(result, indent=2))
+    return 0 if result.get('success') else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+LOMP Stack v3.0 - Webhook Delivery Benchmark
+Measures webhook throughput against a local stub HTTP server
+
+Author: Silviu Ilie <neosilviu@gmail.com>
+Company: aemdPC
+Version: 3.0.0
+Copyright © 2025 aemdPC. All rights reserved.
+License: MIT License
+
+Repository: https://github.com/aemdPC/lomp-stack-v3
+Documentation: https://docs.aemdpc.com/lomp-stack
+Support: https://support.aemdpc.com
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import threading
+import requests
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from webhook_sender import WebhookSender
+
+EVENTS = 200
+ENDPOINTS = 4
+RESPONSE_DELAY = 0.02  # simulated endpoint processing time, seconds
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    received = 0
+    requests = 0
+    bytes_received = 0
+    lock = threading.Lock()
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        time.sleep(RESPONSE_DELAY)
+        with StubHandler.lock:
+            StubHandler.received += int(self.headers.get('X-Webhook-Batch-Size', 1))
+            StubHandler.requests += 1
+            StubHandler.bytes_received += len(body)
+        self.send_response(200)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+def start_stub_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def write_config(path, port, batch=False):
+    webhooks = []
+    for i in range(ENDPOINTS):
+        webhook = {
+            'id': f'bench-{i}',
+            'url': f'http://127.0.0.1:{port}/hook/{i}',
+            'events': ['site.created'],
+            'active': True,
+            'secret': 'bench_secret',
+            'retry_attempts': 3
+        }
+        if batch:
+            webhook.update({
+                'batch': {'enabled': True, 'max_events': 50, 'max_wait': 0.5},
+                'compression': 'gzip',
+                'compact': True
+            })
+        webhooks.append(webhook)
+    with open(path, 'w') as f:
+        json.dump({'webhooks': webhooks, 'dispatch': {'workers': 16, 'max_concurrency': 4}}, f)
+
+def legacy_send(port):
+    """Original behaviour: one requests.post per endpoint per event, in series"""
+    for _ in range(EVENTS):
+        for i in range(ENDPOINTS):
+            requests.post(f'http://127.0.0.1:{port}/hook/{i}', json={'event': 'site.created'}, timeout=30)
+
+def run_benchmark():
+    print("LOMP Stack v3.0 - Webhook Delivery Benchmark")
+    print("=" * 60)
+    print(f"{EVENTS} events x {ENDPOINTS} endpoints, {RESPONSE_DELAY * 1000:.0f} ms per response")
+
+    server = start_stub_server()
+    port = server.server_address[1]
+    work_dir = tempfile.mkdtemp(prefix='lomp_webhook_bench_')
+    deliveries = EVENTS * ENDPOINTS
+
+    try:
+        start = time.perf_counter()
+        legacy_send(port)
+        legacy_time = time.perf_counter() - start
+        print(f"Serial requests.post: {legacy_time:6.2f}s  {deliveries / legacy_time:8.1f} deliveries/s")
+
+        for label, batch in (('Outbox dispatcher:', False), ('Batched + gzip:', True)):
+            config_path = os.path.join(work_dir, f'webhook_config_{int(batch)}.json')
+            write_config(config_path, port, batch)
+            sender = WebhookSender(config_path)
+            StubHandler.received = StubHandler.requests = StubHandler.bytes_received = 0
+
+            start = time.perf_counter()
+            for i in range(EVENTS):
+                sender.send_webhook('site.created', {'site': f'bench{i}.example.com'})
+            enqueue_time = time.perf_counter() - start
+            sender.flush(timeout=120)
+            dispatch_time = time.perf_counter() - start
+            sender.stop()
+
+            assert StubHandler.received == deliveries, f'{StubHandler.received} of {deliveries} delivered'
+            print(f"{label:<21} {dispatch_time:6.2f}s  {deliveries / dispatch_time:8.1f} deliveries/s  "
+                  f"{StubHandler.requests} requests, {StubHandler.bytes_received / 1024:.1f} KiB, "
+                  f"enqueue {enqueue_time * 1000:.1f} ms")
+    finally:
+        server.shutdown()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+if __name__ == '__main__':
+    run_benchmark()
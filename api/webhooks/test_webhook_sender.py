@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+test_webhook_sender.py - Part of LOMP Stack v3.0
+Part of LOMP Stack v3.0
+
+Author: Silviu Ilie <neosilviu@gmail.com>
+Company: aemdPC
+Version: 3.0.0
+Copyright © 2025 aemdPC. All rights reserved.
+License: MIT License
+
+Repository: https://github.com/aemdPC/lomp-stack-v3
+Documentation: https://docs.aemdpc.com/lomp-stack
+Support: https://support.aemdpc.com
+"""
+
+
+"""
+LOMP Stack v3.0 - Webhook Sender Test
+Outbox claim, acknowledge and retry, and the per-endpoint circuit breaker
+"""
+
+import os
+import sys
+import json
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import webhook_sender
+from webhook_sender import CircuitBreaker, WebhookOutbox, WebhookSender
+
+class FakeClock:
+    """Stands in for the time module so schedules and cooldowns pass on demand"""
+
+    def __init__(self, now=1_700_000_000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        time.sleep(seconds)
+
+    def advance(self, seconds):
+        self.now += seconds
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(webhook_sender, 'time', clock)
+    return clock
+
+@pytest.fixture
+def outbox(tmp_path, clock):
+    return WebhookOutbox(str(tmp_path / 'outbox.db'))
+
+#########################################################################
+# Outbox
+#########################################################################
+
+def test_claim_returns_due_deliveries_once(outbox, clock):
+    outbox.enqueue([('hook', 'site.created', '{"n":1}', clock.now),
+                    ('hook', 'site.created', '{"n":2}', clock.now + 60)])
+
+    rows = outbox.claim_due(10)
+    assert [row[3] for row in rows] == ['{"n":1}']
+    # Claimed deliveries are not handed out again
+    assert outbox.claim_due(10) == []
+    assert outbox.counts() == {'sending': 1, 'pending': 1}
+
+    clock.advance(60)
+    assert [row[3] for row in outbox.claim_due(10)] == ['{"n":2}']
+
+def test_complete_removes_deliveries(outbox, clock):
+    outbox.enqueue([('hook', 'site.created', '{}', clock.now)])
+    delivery_id = outbox.claim_due(10)[0][0]
+
+    outbox.complete([delivery_id])
+    assert outbox.counts() == {}
+    assert outbox.next_due_at() is None
+
+def test_reschedule_retries_after_delay(outbox, clock):
+    outbox.enqueue([('hook', 'site.created', '{}', clock.now)])
+    delivery_id = outbox.claim_due(10)[0][0]
+
+    outbox.reschedule([delivery_id], clock.now + 30, 1, 'HTTP 500')
+    assert outbox.claim_due(10) == []
+    assert outbox.next_due_at() == clock.now + 30
+
+    clock.advance(30)
+    rows = outbox.claim_due(10)
+    assert [(row[0], row[4]) for row in rows] == [(delivery_id, 1)]
+
+def test_fail_keeps_delivery_out_of_the_queue(outbox, clock):
+    outbox.enqueue([('hook', 'site.created', '{}', clock.now)])
+    delivery_id = outbox.claim_due(10)[0][0]
+
+    outbox.fail([delivery_id], 3, 'HTTP 500')
+    clock.advance(3600)
+    assert outbox.claim_due(10) == []
+    assert outbox.counts() == {'failed': 1}
+
+def test_claimed_deliveries_are_retried_after_restart(tmp_path, clock):
+    path = str(tmp_path / 'outbox.db')
+    first = WebhookOutbox(path)
+    first.enqueue([('hook', 'site.created', '{}', clock.now)])
+    assert len(first.claim_due(10)) == 1
+
+    # The claiming process died before acknowledging
+    restarted = WebhookOutbox(path)
+    assert len(restarted.claim_due(10)) == 1
+
+#########################################################################
+# Circuit breaker
+#########################################################################
+
+def test_breaker_opens_after_threshold(clock):
+    breaker = CircuitBreaker(threshold=2, cooldown=60)
+    breaker.record_failure()
+    assert breaker.state == 'closed'
+    assert breaker.allow() == 0
+
+    breaker.record_failure()
+    assert breaker.state == 'open'
+    assert breaker.allow() == pytest.approx(60)
+
+    clock.advance(45)
+    assert breaker.allow() == pytest.approx(15)
+
+def test_breaker_half_open_lets_one_trial_through(clock):
+    breaker = CircuitBreaker(threshold=1, cooldown=60)
+    breaker.record_failure()
+    clock.advance(60)
+
+    assert breaker.state == 'half-open'
+    assert breaker.allow() == 0
+    # Only one trial delivery at a time
+    assert breaker.allow() > 0
+
+    breaker.record_success()
+    assert breaker.state == 'closed'
+    assert breaker.allow() == 0
+
+def test_breaker_failed_trial_reopens(clock):
+    breaker = CircuitBreaker(threshold=1, cooldown=60)
+    breaker.record_failure()
+    clock.advance(60)
+    assert breaker.allow() == 0
+
+    breaker.record_failure()
+    assert breaker.state == 'open'
+    assert breaker.allow() == pytest.approx(60)
+
+#########################################################################
+# Sender
+#########################################################################
+
+class FakeResponse:
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+def make_sender(tmp_path, statuses, retry_attempts=3):
+    config = {
+        'webhooks': [{
+            'id': 'hook', 'url': 'https://example.com/hook', 'events': ['site.created'],
+            'active': True, 'secret': 'secret', 'retry_attempts': retry_attempts
+        }],
+        'dispatch': {'workers': 2, 'backoff_base': 2, 'breaker_threshold': 5, 'breaker_cooldown': 60}
+    }
+    config_file = tmp_path / 'webhook_config.json'
+    config_file.write_text(json.dumps(config))
+    sender = WebhookSender(str(config_file), start_dispatcher=False)
+
+    posts = []
+
+    def fake_post(url, data, headers, timeout):
+        posts.append(headers)
+        return FakeResponse(statuses.pop(0))
+
+    sender.session.post = fake_post
+    return sender, posts
+
+def dispatch_and_wait(sender):
+    """Dispatch due deliveries and wait until each outcome is recorded in the outbox"""
+    dispatched = sender.dispatch_due()
+    deadline = time.time() + 5
+    while 'sending' in sender.outbox.counts() and time.time() < deadline:
+        time.sleep(0.01)
+    return dispatched
+
+def test_sender_retries_failed_delivery(tmp_path, clock):
+    sender, posts = make_sender(tmp_path, [500, 200])
+    try:
+        assert sender.send_webhook('site.created', {'domain': 'example.com'}) == 1
+
+        assert dispatch_and_wait(sender) == 1
+        assert sender.outbox.counts() == {'pending': 1}
+        # Backed off by backoff_base ** attempts seconds
+        assert sender.outbox.next_due_at() == clock.now + 2
+        assert dispatch_and_wait(sender) == 0
+
+        clock.advance(2)
+        assert dispatch_and_wait(sender) == 1
+        assert sender.outbox.counts() == {}
+        assert len(posts) == 2
+        assert posts[0]['X-Webhook-Signature'].startswith('sha256=')
+    finally:
+        sender.stop()
+
+def test_sender_gives_up_after_retry_attempts(tmp_path, clock):
+    sender, posts = make_sender(tmp_path, [500, 500], retry_attempts=2)
+    try:
+        sender.send_webhook('site.created', {})
+        dispatch_and_wait(sender)
+        clock.advance(2)
+        dispatch_and_wait(sender)
+
+        assert sender.outbox.counts() == {'failed': 1}
+        assert len(posts) == 2
+    finally:
+        sender.stop()
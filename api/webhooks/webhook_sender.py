@@ -15,87 +15,489 @@ Support: https://support.aemdpc.com
 """
 
 
+import os
+import gzip
 import json
+import sqlite3
 import requests
 import hashlib
 import hmac
 import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from requests.adapters import HTTPAdapter
+
+#########################################################################
+# Durable Outbox
+#########################################################################
+
+class WebhookOutbox:
+    """SQLite-backed queue of pending webhook deliveries
+
+    Events are written here before any network I/O, so deliveries and their
+    retry schedule survive a restart of the sending process.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                webhook_id TEXT NOT NULL,
+                event_type TEXT NOT NULL,
+                body TEXT NOT NULL,
+                attempts INTEGER DEFAULT 0,
+                next_attempt_at REAL NOT NULL,
+                status TEXT DEFAULT 'pending',
+                last_error TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        self._conn.execute('''
+            CREATE INDEX IF NOT EXISTS idx_outbox_due ON outbox (status, next_attempt_at)
+        ''')
+        self._conn.execute('''
+            CREATE INDEX IF NOT EXISTS idx_outbox_webhook ON outbox (webhook_id, status, next_attempt_at)
+        ''')
+        # Deliveries claimed by a process that died are retried
+        self._conn.execute("UPDATE outbox SET status = 'pending' WHERE status = 'sending'")
+        self._conn.commit()
+
+    def enqueue(self, deliveries):
+        """Add (webhook_id, event_type, body, next_attempt_at) tuples in one transaction"""
+        with self._lock:
+            self._conn.executemany('''
+                INSERT INTO outbox (webhook_id, event_type, body, next_attempt_at)
+                VALUES (?, ?, ?, ?)
+            ''', deliveries)
+            self._conn.commit()
+
+    def claim_due(self, limit):
+        """Mark up to `limit` due deliveries as sending and return them"""
+        with self._lock:
+            cursor = self._conn.execute('''
+                SELECT id, webhook_id, event_type, body, attempts FROM outbox
+                WHERE status = 'pending' AND next_attempt_at <= ?
+                ORDER BY next_attempt_at LIMIT ?
+            ''', (time.time(), limit))
+            rows = cursor.fetchall()
+            if rows:
+                self._conn.executemany("UPDATE outbox SET status = 'sending' WHERE id = ?",
+                                       [(row[0],) for row in rows])
+                self._conn.commit()
+        return rows
+
+    def claim_batch(self, webhook_id, limit, window):
+        """Claim pending deliveries for one webhook that fall due within `window` seconds"""
+        with self._lock:
+            cursor = self._conn.execute('''
+                SELECT id, webhook_id, event_type, body, attempts FROM outbox
+                WHERE webhook_id = ? AND status = 'pending' AND next_attempt_at <= ?
+                ORDER BY id LIMIT ?
+            ''', (webhook_id, time.time() + window, limit))
+            rows = cursor.fetchall()
+            if rows:
+                self._conn.executemany("UPDATE outbox SET status = 'sending' WHERE id = ?",
+                                       [(row[0],) for row in rows])
+                self._conn.commit()
+        return rows
+
+    def make_due(self, webhook_id):
+        """Release a webhook's waiting batch without waiting out its window"""
+        with self._lock:
+            self._conn.execute('''
+                UPDATE outbox SET next_attempt_at = ?
+                WHERE webhook_id = ? AND status = 'pending' AND attempts = 0
+            ''', (time.time(), webhook_id))
+            self._conn.commit()
+
+    def next_due_at(self):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT MIN(next_attempt_at) FROM outbox WHERE status = 'pending'"
+            ).fetchone()
+        return row[0]
+
+    def complete(self, delivery_ids):
+        with self._lock:
+            self._conn.executemany('DELETE FROM outbox WHERE id = ?',
+                                   [(delivery_id,) for delivery_id in delivery_ids])
+            self._conn.commit()
+
+    def reschedule(self, delivery_ids, next_attempt_at, attempts, error=None):
+        with self._lock:
+            self._conn.executemany('''
+                UPDATE outbox SET status = 'pending', next_attempt_at = ?, attempts = ?, last_error = ?
+                WHERE id = ?
+            ''', [(next_attempt_at, attempts, error, delivery_id) for delivery_id in delivery_ids])
+            self._conn.commit()
+
+    def fail(self, delivery_ids, attempts, error):
+        """Keep deliveries that exhausted their retries for inspection"""
+        with self._lock:
+            self._conn.executemany('''
+                UPDATE outbox SET status = 'failed', attempts = ?, last_error = ? WHERE id = ?
+            ''', [(attempts, error, delivery_id) for delivery_id in delivery_ids])
+            self._conn.commit()
+
+    def counts(self):
+        with self._lock:
+            rows = self._conn.execute('SELECT status, COUNT(*) FROM outbox GROUP BY status').fetchall()
+        return dict(rows)
+
+#########################################################################
+# Circuit Breaker
+#########################################################################
+
+class CircuitBreaker:
+    """Stops sending to an endpoint after repeated failures
+
+    After `threshold` consecutive failures the circuit opens for `cooldown`
+    seconds. Once the cooldown passes a single trial delivery is let
+    through; success closes the circuit, failure opens it again.
+    """
+
+    def __init__(self, threshold=5, cooldown=60):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Return 0 if a delivery may go out, else seconds until it may"""
+        with self._lock:
+            if self.opened_at is None:
+                return 0
+            remaining = self.opened_at + self.cooldown - time.time()
+            if remaining > 0:
+                return remaining
+            if self._trial_in_flight:
+                return self.cooldown
+            self._trial_in_flight = True
+            return 0
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.failures >= self.threshold:
+                self.opened_at = time.time()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        return 'half-open' if time.time() >= self.opened_at + self.cooldown else 'open'
+
+#########################################################################
+# Webhook Sender
+#########################################################################
 
 class WebhookSender:
-    def __init__(self, config_file='webhook_config.json'):
+    def __init__(self, config_file='webhook_config.json', start_dispatcher=True):
         with open(config_file, 'r') as f:
             self.config = json.load(f)
-    
+
+        dispatch = self.config.get('dispatch', {})
+        self.workers = dispatch.get('workers', 8)
+        self.timeout = dispatch.get('timeout', 30)
+        self.poll_interval = dispatch.get('poll_interval', 1.0)
+        self.backoff_base = dispatch.get('backoff_base', 2)
+        self.backoff_max = dispatch.get('backoff_max', 3600)
+        self.default_concurrency = dispatch.get('max_concurrency', 4)
+
+        outbox_path = dispatch.get('outbox_path', 'webhook_outbox.db')
+        if not os.path.isabs(outbox_path):
+            outbox_path = os.path.join(os.path.dirname(os.path.abspath(config_file)), outbox_path)
+        self.outbox = WebhookOutbox(outbox_path)
+
+        self.webhooks = {webhook['id']: webhook for webhook in self.config.get('webhooks', [])}
+        self.breakers = {
+            webhook_id: CircuitBreaker(
+                dispatch.get('breaker_threshold', 5),
+                dispatch.get('breaker_cooldown', 60)
+            )
+            for webhook_id in self.webhooks
+        }
+        self._in_flight = {webhook_id: 0 for webhook_id in self.webhooks}
+        self._in_flight_lock = threading.Lock()
+
+        # Events queued per batching webhook since its last batch went out
+        self._batch_pending = {webhook_id: 0 for webhook_id in self.webhooks}
+        self._batch_lock = threading.Lock()
+
+        # One keep-alive connection pool per host, shared by all workers
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max(len(self.webhooks), 1),
+                              pool_maxsize=self.workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='webhook')
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._dispatcher = None
+        if start_dispatcher:
+            self.start()
+
+    @staticmethod
+    def _batch_config(webhook):
+        """Return the batch settings of a webhook, or None if it sends events one by one"""
+        batch = webhook.get('batch') or {}
+        if not batch.get('enabled', False):
+            return None
+        return {
+            'max_events': max(int(batch.get('max_events', 100)), 1),
+            'max_wait': float(batch.get('max_wait', 2.0))
+        }
+
+    @staticmethod
+    def _serialize(payload, webhook):
+        if webhook.get('compact', False):
+            return json.dumps(payload, separators=(',', ':'))
+        return json.dumps(payload)
+
     def send_webhook(self, event_type, data):
-        """Send webhook to all registered endpoints for this event"""
-        webhooks = self.config.get('webhooks', [])
-        
-        for webhook in webhooks:
+        """Queue the event for all registered endpoints and return immediately"""
+        now = time.time()
+        timestamp = datetime.utcnow().isoformat()
+        deliveries = []
+        full_batches = []
+        for webhook in self.webhooks.values():
             if not webhook.get('active', False):
                 continue
-                
+
             if event_type in webhook.get('events', []):
-                self._send_to_endpoint(webhook, event_type, data)
-    
-    def _send_to_endpoint(self, webhook, event_type, data):
-        """Send webhook to specific endpoint with retry logic"""
-        payload = {
-            'event': event_type,
-            'data': data,
-            'timestamp': datetime.utcnow().isoformat(),
-            'webhook_id': webhook['id']
-        }
-        
+                payload = {
+                    'event': event_type,
+                    'data': data,
+                    'timestamp': timestamp,
+                    'webhook_id': webhook['id']
+                }
+                # Batched events wait out the window unless the batch fills first
+                batch = self._batch_config(webhook)
+                due_at = now + batch['max_wait'] if batch else now
+                deliveries.append((webhook['id'], event_type, self._serialize(payload, webhook), due_at))
+
+                if batch:
+                    with self._batch_lock:
+                        self._batch_pending[webhook['id']] += 1
+                        if self._batch_pending[webhook['id']] >= batch['max_events']:
+                            full_batches.append(webhook['id'])
+
+        if deliveries:
+            self.outbox.enqueue(deliveries)
+            for webhook_id in full_batches:
+                self.outbox.make_due(webhook_id)
+            self._wakeup.set()
+        return len(deliveries)
+
+    #####################################################################
+    # Dispatch loop
+    #####################################################################
+
+    def start(self):
+        if self._dispatcher is None:
+            self._dispatcher = threading.Thread(target=self._dispatch_loop, name='webhook-dispatcher',
+                                                daemon=True)
+            self._dispatcher.start()
+
+    def stop(self, wait=True):
+        self._stop.set()
+        self._wakeup.set()
+        if self._dispatcher is not None:
+            self._dispatcher.join()
+            self._dispatcher = None
+        self._pool.shutdown(wait=wait)
+
+    def _dispatch_loop(self):
+        while not self._stop.is_set():
+            dispatched = self.dispatch_due()
+            if not dispatched:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+
+    def dispatch_due(self):
+        """Hand due deliveries to the worker pool, respecting endpoint limits"""
+        units = []
+        batched = {}
+        for row in self.outbox.claim_due(self.workers * 4):
+            delivery_id, webhook_id, event_type, body, attempts = row
+            webhook = self.webhooks.get(webhook_id)
+            if webhook is None:
+                self.outbox.fail([delivery_id], attempts, 'Webhook no longer configured')
+            elif self._batch_config(webhook):
+                batched.setdefault(webhook_id, []).append(row)
+            else:
+                units.append((webhook, [delivery_id], body, attempts, 1))
+
+        for webhook_id, rows in batched.items():
+            units.extend(self._build_batches(self.webhooks[webhook_id], rows))
+
+        dispatched = 0
+        for webhook, delivery_ids, body, attempts, count in units:
+            webhook_id = webhook['id']
+            wait = self.breakers[webhook_id].allow()
+            if wait:
+                # Circuit is open: defer without spending a retry attempt
+                self.outbox.reschedule(delivery_ids, time.time() + wait, attempts, 'Circuit open')
+                continue
+
+            limit = webhook.get('max_concurrency', self.default_concurrency)
+            with self._in_flight_lock:
+                if self._in_flight[webhook_id] >= limit:
+                    # Stay due; the next completion wakes the dispatcher
+                    self.outbox.reschedule(delivery_ids, time.time(), attempts)
+                    continue
+                self._in_flight[webhook_id] += 1
+
+            self._pool.submit(self._deliver, webhook, delivery_ids, body, attempts, count)
+            dispatched += 1
+        return dispatched
+
+    def _build_batches(self, webhook, rows):
+        """Group claimed deliveries for a batching webhook into envelopes
+
+        Events still inside their window are pulled forward to fill the
+        batch. Each event body was serialised once at enqueue time and is
+        spliced into the envelope as is.
+        """
+        batch = self._batch_config(webhook)
+        max_events = batch['max_events']
+        missing = max_events - len(rows) % max_events
+        if missing < max_events:
+            rows = rows + self.outbox.claim_batch(webhook['id'], missing, batch['max_wait'])
+
+        with self._batch_lock:
+            self._batch_pending[webhook['id']] = max(self._batch_pending[webhook['id']] - len(rows), 0)
+
+        units = []
+        for start in range(0, len(rows), max_events):
+            chunk = rows[start:start + max_events]
+            envelope = {
+                'batch': True,
+                'webhook_id': webhook['id'],
+                'timestamp': datetime.utcnow().isoformat(),
+                'count': len(chunk)
+            }
+            head = json.dumps(envelope, separators=(',', ':'))[:-1]
+            body = head + ',"events":[' + ','.join(row[3] for row in chunk) + ']}'
+            attempts = max(row[4] for row in chunk)
+            units.append((webhook, [row[0] for row in chunk], body, attempts, len(chunk)))
+        return units
+
+    def _encode_body(self, webhook, body):
+        """Encode a delivery body once; the result is both signed and sent"""
+        data = body.encode('utf-8')
         headers = {
             'Content-Type': 'application/json',
             'User-Agent': 'LOMP-Stack-Webhook/1.0'
         }
-        
-        # Add signature if secret is provided
-        if webhook.get('secret'):
-            signature = self._generate_signature(json.dumps(payload), webhook['secret'])
-            headers['X-Webhook-Signature'] = f'sha256={signature}'
-        
-        max_attempts = webhook.get('retry_attempts', 3)
-        
-        for attempt in range(max_attempts):
-            try:
-                response = requests.post(
-                    webhook['url'],
-                    json=payload,
-                    headers=headers,
-                    timeout=30
-                )
-                
-                if response.status_code == 200:
-                    print(f"Webhook sent successfully to {webhook['url']}")
-                    break
-                else:
-                    print(f"Webhook failed with status {response.status_code}")
-                    
-            except Exception as e:
-                print(f"Webhook attempt {attempt + 1} failed: {str(e)}")
-                if attempt < max_attempts - 1:
-                    time.sleep(2 ** attempt)  # Exponential backoff
-    
+        if webhook.get('compression') == 'gzip':
+            data = gzip.compress(data, compresslevel=6)
+            headers['Content-Encoding'] = 'gzip'
+        return data, headers
+
+    def _deliver(self, webhook, delivery_ids, body, attempts, count=1):
+        """Make a single delivery attempt and record the outcome"""
+        webhook_id = webhook['id']
+        error = None
+        try:
+            data, headers = self._encode_body(webhook, body)
+            if self._batch_config(webhook):
+                headers['X-Webhook-Batch-Size'] = str(count)
+
+            # Sign exactly the bytes that are sent
+            if webhook.get('secret'):
+                signature = self._generate_signature(data, webhook['secret'])
+                headers['X-Webhook-Signature'] = f'sha256={signature}'
+
+            response = self.session.post(
+                webhook['url'],
+                data=data,
+                headers=headers,
+                timeout=webhook.get('timeout', self.timeout)
+            )
+
+            if 200 <= response.status_code < 300:
+                self.breakers[webhook_id].record_success()
+                self.outbox.complete(delivery_ids)
+                return
+            error = f'HTTP {response.status_code}'
+
+        except Exception as e:
+            error = str(e)
+
+        finally:
+            with self._in_flight_lock:
+                self._in_flight[webhook_id] -= 1
+            self._wakeup.set()
+
+        self.breakers[webhook_id].record_failure()
+        attempts += 1
+        if attempts >= webhook.get('retry_attempts', 3):
+            print(f"Webhook to {webhook['url']} failed after {attempts} attempts: {error}")
+            self.outbox.fail(delivery_ids, attempts, error)
+        else:
+            delay = min(self.backoff_base ** attempts, self.backoff_max)
+            self.outbox.reschedule(delivery_ids, time.time() + delay, attempts, error)
+
+    def flush(self, timeout=None):
+        """Send waiting batches, then wait until no delivery is due or in flight
+
+        Returns True if the sender went idle before the timeout.
+        """
+        for webhook in self.webhooks.values():
+            if self._batch_config(webhook):
+                self.outbox.make_due(webhook['id'])
+
+        deadline = time.time() + timeout if timeout is not None else None
+        while True:
+            with self._in_flight_lock:
+                in_flight = sum(self._in_flight.values())
+            next_due = self.outbox.next_due_at()
+            if not in_flight and (next_due is None or next_due > time.time()):
+                return True
+            if deadline is not None and time.time() >= deadline:
+                return False
+            self._wakeup.set()
+            time.sleep(0.01)
+
     def _generate_signature(self, payload, secret):
         """Generate HMAC signature for webhook"""
+        if isinstance(payload, str):
+            payload = payload.encode('utf-8')
         return hmac.new(
             secret.encode('utf-8'),
-            payload.encode('utf-8'),
+            payload,
             hashlib.sha256
         ).hexdigest()
 
 if __name__ == '__main__':
     import sys
-    
+
     if len(sys.argv) < 3:
         print("Usage: webhook_sender.py <event_type> <data_json>")
         sys.exit(1)
-    
+
     event_type = sys.argv[1]
     data = json.loads(sys.argv[2])
-    
+
     sender = WebhookSender()
     sender.send_webhook(event_type, data)
+    # Deliver what is due now; retries stay in the outbox for the next run
+    sender.flush(timeout=sender.timeout)
+    sender.stop()
@@ -34,6 +34,9 @@ export EDGE_LOG_FILE="/var/log/lomp_edge_computing.log"
 EDGE_DATA_DIR="/opt/lomp/edge"
 EDGE_CACHE_DIR="$EDGE_DATA_DIR/cache"
 EDGE_NODES_DIR="$EDGE_DATA_DIR/nodes"
+EDGE_PORT_RANGE=(--start 3000 --end 3999)
+# Edge functions are not registered as sites, so their ports are leased until removal
+EDGE_PORT_LEASE=$((10 * 365 * 24 * 3600))
 
 # Edge Computing Functions
 
@@ -488,20 +491,44 @@ EOF
     # Build and deploy
     cd "$function_dir" || return 1
     docker build -t "edge-function-$function_name" .
-    docker run -d --name "$function_name" -p "$(get_available_port):3000" \
+    local port
+    if ! port=$(get_available_port "$function_name"); then
+        log_message "ERROR" "No port available for edge function $function_name"
+        return 1
+    fi
+    if ! docker run -d --name "$function_name" -p "$port:3000" \
         -e "FUNCTION_NAME=$function_name" \
-        "edge-function-$function_name"
+        "edge-function-$function_name"; then
+        python3 "$STACK_ROOT/api/web/port_allocator.py" release "${EDGE_PORT_RANGE[@]}" --port "$port"
+        log_message "ERROR" "Failed to start edge function $function_name"
+        return 1
+    fi
+    
+    log_message "INFO" "Edge function $function_name deployed successfully on port $port"
+}
+
+# Remove an edge function and release its port
+remove_edge_function() {
+    local function_name="$1"
+    
+    if [[ -z "$function_name" || "$function_name" == */* || "$function_name" == .* ]]; then
+        log_message "ERROR" "A valid function name is required"
+        return 1
+    fi
     
-    log_message "INFO" "Edge function $function_name deployed successfully"
+    docker rm -f "$function_name" >/dev/null 2>&1
+    docker rmi "edge-function-$function_name" >/dev/null 2>&1
+    rm -rf "${EDGE_DATA_DIR:?}/functions/$function_name"
+    python3 "$STACK_ROOT/api/web/port_allocator.py" release "${EDGE_PORT_RANGE[@]}" \
+        --owner "edge:$function_name" || return 1
+    
+    log_message "INFO" "Edge function $function_name removed"
 }
 
-# Get available port
+# Get available port (leased through the shared port allocator until the function is removed)
 get_available_port() {
-    local port=3000
-    while netstat -ln | grep ":$port " > /dev/null 2>&1; do
-        ((port++))
-    done
-    echo $port
+    python3 "$STACK_ROOT/api/web/port_allocator.py" allocate "${EDGE_PORT_RANGE[@]}" \
+        --owner "edge:${1:-function}" --lease "$EDGE_PORT_LEASE"
 }
 
 # Monitor edge performance
@@ -735,6 +762,9 @@ main() {
             shift
             deploy_edge_function "$@"
             ;;
+        "remove")
+            remove_edge_function "$2"
+            ;;
         "monitor")
             monitor_edge_performance
             ;;
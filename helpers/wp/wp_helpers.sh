@@ -72,6 +72,17 @@ wp_download_and_install_files() {
   local webroot="$1"
   local username="$2"
   
+  # Core din cache-ul local (fiecare versiune descărcată și verificată o singură dată).
+  # Fișierele core pot fi hardlink-uri comune tuturor site-urilor: nu le face chown/chmod.
+  local core_cache="$SCRIPT_DIR/../../api/web/wp_core_cache.py"
+  if [ -f "$core_cache" ] && command -v python3 >/dev/null 2>&1; then
+    if sudo python3 "$core_cache" populate "$webroot" ${username:+--owner "$username:www-data"} >/dev/null; then
+      log_info "WordPress instalat din cache-ul local" "green"
+      return 0
+    fi
+    log_warning "Cache-ul WordPress nu este disponibil, descarc direct"
+  fi
+  
   log_info "Descărcarea WordPress..." "cyan"
   cd /tmp || { log_error "Nu pot accesa /tmp"; return 1; }
   